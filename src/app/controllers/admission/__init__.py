@@ -0,0 +1,3 @@
+from app.controllers.admission.admission_controller import manager
+
+__all__ = ["manager"]
@@ -0,0 +1,87 @@
+from typing import Optional
+import logging
+import math
+import os
+
+from app.controllers.loop_lag import probe as loop_lag_probe
+from app.controllers.loop_lag.probe import LoopLagProbe
+from app.controllers.metrics import ADMISSION_REJECTIONS
+from app.controllers.websockets import manager as ws_manager
+from app.controllers.websockets import spectator_manager
+from app.models.admission import AdmissionRejection
+
+logger = logging.getLogger(__name__)
+
+# Smoothed event loop lag (seconds) above which new players are turned away
+MAX_LOOP_LAG = 0.25
+# Open rooms above which no new room is created, 0 for no limit
+MAX_ROOMS = 0
+# Open player and spectator connections above which nobody new is let in, 0 for no limit
+MAX_CONNECTIONS = 0
+# Seconds a turned away client is told to wait before trying again
+RETRY_AFTER = 5
+# The hint grows with the overload, up to this many times RETRY_AFTER
+MAX_RETRY_FACTOR = 6
+
+
+class AdmissionController:
+    """
+    Decides whether a new connection is let in. Under a spike it is better to
+    turn new players away than to slow down every table already playing, so
+    once the event loop lags or the server holds too many rooms or
+    connections, new rooms and joins are refused with a retry-after hint.
+    Players resuming a seat in a game in progress are never refused.
+    """
+
+    def __init__(
+        self,
+        probe: LoopLagProbe,
+        max_loop_lag: float = MAX_LOOP_LAG,
+        max_rooms: int = MAX_ROOMS,
+        max_connections: int = MAX_CONNECTIONS,
+        retry_after: int = RETRY_AFTER,
+    ):
+        self.probe = probe
+        self.max_loop_lag = max_loop_lag
+        self.max_rooms = max_rooms
+        self.max_connections = max_connections
+        self.retry_after = retry_after
+
+    def check(self, creates_room: bool) -> Optional[AdmissionRejection]:
+        """Get the reason to refuse a new connection, None to let it in"""
+        rejection = None
+        if self.max_loop_lag and self.probe.lag > self.max_loop_lag:
+            rejection = self._reject("loop_lag", self.probe.lag / self.max_loop_lag)
+        elif self.max_connections and self.connection_count() >= self.max_connections:
+            rejection = self._reject("connections")
+        elif (
+            creates_room
+            and self.max_rooms
+            and len(ws_manager.active_rooms) >= self.max_rooms
+        ):
+            rejection = self._reject("rooms")
+
+        if rejection:
+            ADMISSION_REJECTIONS.inc(1, rejection.reason)
+        return rejection
+
+    @staticmethod
+    def connection_count() -> int:
+        """Count the open player and spectator connections"""
+        return len(ws_manager.connection_rooms) + len(spectator_manager.spectator_rooms)
+
+    def _reject(self, reason: str, overload: float = 1.0) -> AdmissionRejection:
+        factor = min(max(overload, 1.0), MAX_RETRY_FACTOR)
+        return AdmissionRejection(
+            reason=reason, retry_after=math.ceil(self.retry_after * factor)
+        )
+
+
+# Create a singleton instance
+manager = AdmissionController(
+    loop_lag_probe,
+    max_loop_lag=float(os.getenv("ADMISSION_MAX_LOOP_LAG_MS", "250")) / 1000,
+    max_rooms=int(os.getenv("ADMISSION_MAX_ROOMS", str(MAX_ROOMS))),
+    max_connections=int(os.getenv("ADMISSION_MAX_CONNECTIONS", str(MAX_CONNECTIONS))),
+    retry_after=int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", str(RETRY_AFTER))),
+)
@@ -0,0 +1,3 @@
+from app.controllers.analytics.game_analytics import game_key, manager
+
+__all__ = ["manager", "game_key"]
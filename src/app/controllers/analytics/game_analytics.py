@@ -0,0 +1,195 @@
+from typing import Dict, Optional, Tuple
+from collections import OrderedDict
+import os
+
+from app.controllers.game.observer import GameObserver
+
+# Starting hands remembered for games still in play, the oldest are forgotten first
+MAX_TRACKED_GAMES = 10_000
+# Coin changes are bucketed per coin, clamped to this range
+MAX_COIN_DELTA = 10
+
+
+class _Rate:
+    """Count of successes out of attempts"""
+
+    __slots__ = ("hits", "total")
+
+    def __init__(self):
+        self.hits = 0
+        self.total = 0
+
+    def add(self, hit: bool) -> None:
+        self.total += 1
+        self.hits += hit
+
+    def report(self) -> Dict:
+        return {
+            "count": self.total,
+            "rate": self.hits / self.total if self.total else None,
+        }
+
+
+class _Mean:
+    """Running mean, minimum and maximum of a value"""
+
+    __slots__ = ("count", "total", "minimum", "maximum")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, value: int) -> None:
+        self.count += 1
+        self.total += value
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+    def report(self) -> Dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.minimum,
+            "max": self.maximum,
+        }
+
+
+def game_key(coup_game) -> Tuple[str, int]:
+    """
+    Key of a game that outlives the object: its room and seed, so a new game
+    of the room (or one whose object was freed and its id reused) is another key
+    """
+    return coup_game.game_state.room_code, coup_game.game_state.seed
+
+
+class GameAnalytics(GameObserver):
+    """
+    Running aggregates over every live game, updated from the engine's events
+    as they happen, so reports never rescan history. Memory stays bounded:
+    every aggregate is keyed by something with a fixed number of values
+    (characters, hands, action types, table sizes, clamped coin changes), and
+    only the starting hands of games still in play are remembered.
+    """
+
+    def __init__(
+        self, max_tracked_games: int = MAX_TRACKED_GAMES, token: Optional[str] = None
+    ):
+        self.max_tracked_games = max_tracked_games
+        # Admin token the report needs, it is off without one
+        self.token = token
+        # Map of (room_code, seed) -> map of player_id -> starting hand, for games in play
+        self.starting_hands: "OrderedDict[Tuple[str, int], Dict[str, str]]" = (
+            OrderedDict()
+        )
+        # Map of starting hand -> wins out of games played with it
+        self.hand_wins: Dict[str, _Rate] = {}
+        # Map of character -> bluffs out of claims
+        self.bluffs: Dict[str, _Rate] = {}
+        # Map of character -> caught bluffs out of challenges
+        self.challenges: Dict[str, _Rate] = {}
+        # Map of (player count, variation) -> turns per game
+        self.game_turns: Dict[Tuple[int, str], _Mean] = {}
+        # Map of (player count, variation) -> moves per game
+        self.game_moves: Dict[Tuple[int, str], _Mean] = {}
+        # Map of action_type -> map of the acting player's coin change -> count
+        self.coin_deltas: Dict[str, Dict[int, int]] = {}
+        # Coins that entered play from the bank, and that went back to it
+        self.coins_minted = 0
+        self.coins_burned = 0
+        self.games_started = 0
+        self.games_finished = 0
+
+    def on_game_start(self, coup_game) -> None:
+        self.games_started += 1
+        self.starting_hands[game_key(coup_game)] = {
+            p.id: "+".join(sorted(p.cards)) for p in coup_game.game_state.players
+        }
+        if len(self.starting_hands) > self.max_tracked_games:
+            self.starting_hands.popitem(last=False)
+
+    def on_claim(self, coup_game, player_id: str, character: str, honest: bool) -> None:
+        self.bluffs.setdefault(character, _Rate()).add(not honest)
+
+    def on_challenge(
+        self,
+        coup_game,
+        challenger_id: str,
+        claimant_id: str,
+        character: str,
+        successful: bool,
+    ) -> None:
+        self.challenges.setdefault(character, _Rate()).add(successful)
+
+    def on_action(
+        self,
+        coup_game,
+        player_id: str,
+        action_type: str,
+        coins_delta: int,
+        target_id: Optional[str],
+        target_coins_delta: int,
+    ) -> None:
+        bucket = max(-MAX_COIN_DELTA, min(MAX_COIN_DELTA, coins_delta))
+        deltas = self.coin_deltas.setdefault(action_type, {})
+        deltas[bucket] = deltas.get(bucket, 0) + 1
+
+        # Whatever the players didn't pass between each other came from or went to the bank
+        net = coins_delta + target_coins_delta
+        if net > 0:
+            self.coins_minted += net
+        else:
+            self.coins_burned -= net
+
+    def on_game_over(self, coup_game, winner_id: Optional[str]) -> None:
+        self.games_finished += 1
+        game_state = coup_game.game_state
+        key = (len(game_state.players), game_state.variation)
+        self.game_turns.setdefault(key, _Mean()).add(game_state.turn_number)
+        self.game_moves.setdefault(key, _Mean()).add(len(game_state.action_log))
+
+        # Games migrated in mid-play have no starting hands
+        hands = self.starting_hands.pop(game_key(coup_game), None)
+        if hands:
+            for player_id, hand in hands.items():
+                self.hand_wins.setdefault(hand, _Rate()).add(player_id == winner_id)
+
+    def report(self) -> Dict:
+        """Get the current aggregates"""
+        return {
+            "games_started": self.games_started,
+            "games_finished": self.games_finished,
+            "win_rate_by_starting_hand": {
+                hand: rate.report() for hand, rate in sorted(self.hand_wins.items())
+            },
+            "bluff_rate_by_character": {
+                character: rate.report()
+                for character, rate in sorted(self.bluffs.items())
+            },
+            "challenge_success_by_character": {
+                character: rate.report()
+                for character, rate in sorted(self.challenges.items())
+            },
+            "game_length": [
+                {
+                    "players": players,
+                    "variation": variation,
+                    "turns": self.game_turns[(players, variation)].report(),
+                    "moves": self.game_moves[(players, variation)].report(),
+                }
+                for players, variation in sorted(self.game_turns)
+            ],
+            "coin_flow": {
+                "minted": self.coins_minted,
+                "burned": self.coins_burned,
+                "delta_by_action": {
+                    action_type: dict(sorted(deltas.items()))
+                    for action_type, deltas in sorted(self.coin_deltas.items())
+                },
+            },
+        }
+
+
+# Create a singleton instance
+manager = GameAnalytics(token=os.getenv("ANALYTICS_ADMIN_TOKEN"))
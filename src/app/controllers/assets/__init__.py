@@ -0,0 +1,3 @@
+from app.controllers.assets.asset_store import manager
+
+__all__ = ["manager"]
@@ -0,0 +1,233 @@
+from typing import Dict, Optional, Tuple
+from collections import OrderedDict
+from pathlib import Path
+import gzip
+import hashlib
+import logging
+import mimetypes
+import re
+
+from fastapi import Response
+from fastapi.responses import FileResponse
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, prebuilt .br files are still served
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Vite writes built assets to assets/ with names like index-B7a3xQ9c.js, their
+# content never changes. Files copied from public/ keep their names, so only
+# hashed names in that directory are cached for good
+HASHED_ASSETS_DIR = "assets/"
+HASHED_ASSET = re.compile(r"-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Files smaller than this aren't worth compressing
+MIN_COMPRESS_SIZE = 1024
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+)
+
+# Encodings in order of preference, with the file suffix of their variant
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+# Bytes of asset variants kept in memory
+HOT_SET_SIZE = 32 * 1024 * 1024
+
+
+class Asset:
+    """A static file and its precompressed variants"""
+
+    def __init__(self, path: Path, media_type: str, digest: str, immutable: bool):
+        self.path = path
+        self.media_type = media_type
+        self.digest = digest
+        self.immutable = immutable
+        # Map of encoding -> (file, size), "identity" is the file itself
+        self.variants: Dict[str, Tuple[Path, int]] = {
+            "identity": (path, path.stat().st_size)
+        }
+
+
+class AssetStore:
+    """
+    Serves the built client. Every file is hashed once at startup and
+    gzip/brotli variants are written next to it (or picked up if the build
+    produced them), so a request only negotiates the encoding and sends
+    bytes. The most recently served variants are kept in memory, and
+    If-None-Match is answered with a 304.
+    """
+
+    def __init__(self, hot_set_size: int = HOT_SET_SIZE):
+        # Map of path relative to the root -> asset
+        self.assets: Dict[str, Asset] = {}
+        self.hot_set_size = hot_set_size
+        # (path, encoding) -> content of recently served variants, least recent first
+        self.hot_set: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self.hot_set_bytes = 0
+
+    def load(self, root: Path) -> None:
+        """Index (and precompress) every file under a directory"""
+        self.assets.clear()
+        self.hot_set.clear()
+        self.hot_set_bytes = 0
+        if not root.exists():
+            return
+
+        suffixes = tuple(suffix for _, suffix in ENCODINGS)
+        for path in sorted(root.rglob("*")):
+            if not path.is_file() or path.name.endswith(suffixes):
+                continue
+            relative_path = path.relative_to(root).as_posix()
+            self.assets[relative_path] = self._load_asset(path, relative_path)
+
+        logger.info(f"Loaded {len(self.assets)} static assets from {root}")
+
+    def get_asset(self, path: str) -> Optional[Asset]:
+        return self.assets.get(path.lstrip("/"))
+
+    def response(
+        self,
+        path: str,
+        accept_encoding: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+    ) -> Response:
+        """Build the response for a static file request"""
+        asset = self.get_asset(path)
+        if not asset:
+            return Response(status_code=404)
+
+        encoding = self._negotiate(asset, accept_encoding)
+        etag = (
+            f'"{asset.digest}"'
+            if encoding == "identity"
+            else f'"{asset.digest}-{encoding}"'
+        )
+        headers = {
+            "ETag": etag,
+            "Cache-Control": (
+                IMMUTABLE_CACHE_CONTROL if asset.immutable else REVALIDATE_CACHE_CONTROL
+            ),
+            "Vary": "Accept-Encoding",
+        }
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+
+        if if_none_match and _etag_matches(etag, if_none_match):
+            return Response(status_code=304, headers=headers)
+
+        file, size = asset.variants[encoding]
+        content = self._get_hot(path.lstrip("/"), encoding, file, size)
+        if content is None:
+            # Too large for the hot set, stream it from disk
+            return FileResponse(file, media_type=asset.media_type, headers=headers)
+        return Response(content, media_type=asset.media_type, headers=headers)
+
+    def _load_asset(self, path: Path, relative_path: str) -> Asset:
+        content = path.read_bytes()
+        media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        asset = Asset(
+            path,
+            media_type,
+            hashlib.blake2b(content, digest_size=8).hexdigest(),
+            relative_path.startswith(HASHED_ASSETS_DIR)
+            and bool(HASHED_ASSET.search(path.name)),
+        )
+
+        if len(content) < MIN_COMPRESS_SIZE or not media_type.startswith(
+            COMPRESSIBLE_TYPES
+        ):
+            return asset
+
+        for encoding, suffix in ENCODINGS:
+            variant = path.with_name(path.name + suffix)
+            if not variant.exists() or variant.stat().st_mtime < path.stat().st_mtime:
+                compressed = _compress(content, encoding)
+                if compressed is None:
+                    continue
+                try:
+                    variant.write_bytes(compressed)
+                except OSError as e:
+                    logger.warning(f"Can't write {variant}: {str(e)}")
+                    continue
+            size = variant.stat().st_size
+            # Only worth sending if it is actually smaller
+            if size < len(content):
+                asset.variants[encoding] = (variant, size)
+        return asset
+
+    def _negotiate(self, asset: Asset, accept_encoding: Optional[str]) -> str:
+        """Pick the preferred encoding the client accepts"""
+        if not accept_encoding or len(asset.variants) == 1:
+            return "identity"
+        accepted = _parse_accept_encoding(accept_encoding)
+        for encoding, _ in ENCODINGS:
+            if encoding in asset.variants and accepted.get(
+                encoding, accepted.get("*", 0)
+            ):
+                return encoding
+        return "identity"
+
+    def _get_hot(self, path: str, encoding: str, file: Path, size: int):
+        """Get a variant's content from the hot set, loading it on a miss"""
+        key = (path, encoding)
+        content = self.hot_set.get(key)
+        if content is not None:
+            self.hot_set.move_to_end(key)
+            return content
+
+        # Keep large files out so they can't flush the rest of the set
+        if size > self.hot_set_size // 8:
+            return None
+
+        content = file.read_bytes()
+        self.hot_set[key] = content
+        self.hot_set_bytes += len(content)
+        while self.hot_set_bytes > self.hot_set_size:
+            _, evicted = self.hot_set.popitem(last=False)
+            self.hot_set_bytes -= len(evicted)
+        return content
+
+
+def _compress(content: bytes, encoding: str) -> Optional[bytes]:
+    if encoding == "gzip":
+        return gzip.compress(content, compresslevel=9, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(content, quality=11)
+    return None
+
+
+def _parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Map of encoding -> q value"""
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    return accepted
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/")
+        if tag == "*" or tag == etag:
+            return True
+    return False
+
+
+# Create a singleton instance
+manager = AssetStore()
@@ -0,0 +1,3 @@
+from app.controllers.chat.chat_history import manager
+
+__all__ = ["manager"]
@@ -0,0 +1,118 @@
+from typing import Deque, Dict, List, Optional, Tuple
+from collections import deque
+import json
+import os
+import time
+
+# Messages kept per room
+HISTORY_MESSAGES = 50
+# Encoded bytes kept per room, the oldest messages go first past this
+HISTORY_BYTES = 16 * 1024
+# Longer chat messages are cut to this many characters
+MAX_MESSAGE_CHARS = 500
+
+
+class ChatHistory:
+    """
+    The last chat messages of every room, so players joining (or coming back)
+    get the conversation so far in one frame instead of nothing. Each room is
+    a ring of messages, each encoded to JSON once when it is said and kept as
+    that string, so the catch-up frame is a join and memory per room is
+    capped both by message count and by encoded bytes.
+    """
+
+    def __init__(
+        self,
+        max_messages: int = HISTORY_MESSAGES,
+        max_bytes: int = HISTORY_BYTES,
+        max_message_chars: int = MAX_MESSAGE_CHARS,
+        clock=time.time,
+    ):
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.max_message_chars = max_message_chars
+        self.clock = clock
+        # Map of room_code -> (sent_at, encoded message), oldest first
+        self.rooms: Dict[str, Deque[Tuple[int, str]]] = {}
+        # Map of room_code -> encoded bytes held for the room
+        self.room_bytes: Dict[str, int] = {}
+
+    def add(self, room_code: str, player_name: str, text: str) -> Dict:
+        """Remember a chat message and get the message to broadcast"""
+        message = {
+            "player": player_name,
+            "message": text[: self.max_message_chars],
+            "sent_at": int(self.clock() * 1000),
+        }
+        if self.max_messages > 0:
+            self._append(room_code, message["sent_at"], json.dumps(message))
+        return {"type": "chat", **message}
+
+    def encode_history(self, room_code: str, delay: float = 0.0) -> Optional[str]:
+        """
+        Get a room's history as one chat_history frame, None if it's empty.
+        With a delay (for delayed spectators), only messages said at least
+        that many seconds ago are included.
+        """
+        messages = self.rooms.get(room_code)
+        if delay > 0 and messages:
+            sent_before = (self.clock() - delay) * 1000
+            messages = [m for m in messages if m[0] <= sent_before]
+        if not messages:
+            return None
+        return (
+            f'{{"type": "chat_history", "room_code": {json.dumps(room_code)}, '
+            f'"messages": [{", ".join(encoded for _, encoded in messages)}]}}'
+        )
+
+    def recent_frames(self, room_code: str, within: float) -> List[Tuple[float, str]]:
+        """
+        Get the (age in seconds, chat frame) of a room's messages said in
+        the last `within` seconds, oldest first, e.g. to hold back for
+        delayed spectators joining a room nobody watched
+        """
+        now = self.clock() * 1000
+        return [
+            ((now - sent_at) / 1000, '{"type": "chat", ' + encoded[1:])
+            for sent_at, encoded in self.rooms.get(room_code, ())
+            if sent_at > now - within * 1000
+        ]
+
+    def export_room(self, room_code: str) -> List[Dict]:
+        """Get a room's history, e.g. to move it to another worker"""
+        return [json.loads(encoded) for _, encoded in self.rooms.get(room_code, ())]
+
+    def import_room(self, room_code: str, messages: List[Dict]) -> None:
+        """Restore a room's exported history"""
+        for message in messages:
+            self._append(room_code, message.get("sent_at", 0), json.dumps(message))
+
+    def remove_room(self, room_code: str) -> None:
+        """Forget a room's history once the room is closed"""
+        self.rooms.pop(room_code, None)
+        self.room_bytes.pop(room_code, None)
+
+    def total_bytes(self) -> int:
+        """Get the encoded bytes held across every room"""
+        return sum(self.room_bytes.values())
+
+    def _append(self, room_code: str, sent_at: int, encoded: str) -> None:
+        # JSON is ASCII, so one character is one byte. A message over the cap on its own is left out
+        size = len(encoded)
+        if size > self.max_bytes:
+            return
+
+        messages = self.rooms.setdefault(room_code, deque())
+        held = self.room_bytes.get(room_code, 0) + size
+        messages.append((sent_at, encoded))
+        while len(messages) > self.max_messages or held > self.max_bytes:
+            held -= len(messages.popleft()[1])
+        self.room_bytes[room_code] = held
+
+
+# Create a singleton instance
+manager = ChatHistory(
+    max_messages=int(os.getenv("CHAT_HISTORY_MESSAGES", str(HISTORY_MESSAGES))),
+    max_bytes=int(os.getenv("CHAT_HISTORY_BYTES", str(HISTORY_BYTES))),
+    max_message_chars=int(os.getenv("CHAT_MAX_MESSAGE_CHARS", str(MAX_MESSAGE_CHARS))),
+)
@@ -1,59 +1,221 @@
 from typing import Dict, List, Optional, Tuple
+import asyncio
+import functools
+import itertools
 import random
+import secrets
 from app.models.game import GameState, PlayerState, GameStatus
+from app.controllers.tracing import traced
+from app.controllers.game.observer import GameObserver
+from app.controllers.game.rules import ActionRule, ActionType, Effect, get_rules
 import logging
 
-# Define Coup-specific constants
-CHARACTERS = ["duke", "assassin", "captain", "ambassador", "contessa"]
-STARTING_COINS = 2
-CARDS_PER_PLAYER = 2
+logger = logging.getLogger(__name__)
 
-# Define action costs
-COUP_COST = 7
-ASSASSINATE_COST = 3
 
+def recorded(entry_type: str):
+    """
+    Append successful calls of a CoupGame move to the game's action log
+    and bump the state version. A move that raised may have left a partial
+    mutation behind, so the version is bumped in that case too.
+    """
 
-# Define actions
-class ActionType:
-    INCOME = "income"
-    FOREIGN_AID = "foreign_aid"
-    COUP = "coup"
-    TAX = "tax"  # Duke action
-    ASSASSINATE = "assassinate"  # Assassin action
-    STEAL = "steal"  # Captain action
-    EXCHANGE = "exchange"  # Ambassador action
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, player_id: str, *args) -> Dict:
+            try:
+                result = method(self, player_id, *args)
+            except Exception:
+                self.bump_version()
+                raise
+            if result.get("success"):
+                self.game_state.action_log.append(
+                    {"type": entry_type, "player_id": player_id, "args": list(args)}
+                )
+                self.bump_version()
+            return result
 
-    # Counteractions
-    BLOCK_FOREIGN_AID = "block_foreign_aid"  # Duke
-    BLOCK_ASSASSINATION = "block_assassination"  # Contessa
-    BLOCK_STEALING = "block_stealing"  # Captain or Ambassador
+        return wrapper
 
-    # Challenge
-    CHALLENGE = "challenge"
+    return decorator
 
 
 class CoupGame:
-    def __init__(self, game_state: GameState):
+    def __init__(self, game_state: GameState, seed: Optional[int] = None):
         self.game_state = game_state
+        self.rules = get_rules(game_state.variation)
+        self.players_by_id: Dict[str, PlayerState] = {
+            p.id: p for p in game_state.players
+        }
         self.pending_action = None
         self.pending_challenge = None
         self.pending_counteraction = None
         self.challenge_window_open = False
         self.counteraction_window_open = False
+        # ID of the player who still has to pick the cards to keep after an exchange
+        self.pending_exchange: Optional[str] = None
+        # Legal moves per player, memoized per state version
+        self._legal_moves_cache: Optional[Tuple[int, Dict[str, List[Dict]]]] = None
+        # Public (hidden-card) view shared by every player, built lazily per version
+        self.public_view_cache: Optional[Dict] = None
+        # Set (and replaced) whenever the version changes, for long-polling waiters
+        self._version_event: Optional[asyncio.Event] = None
+        # Notified of claims, challenges, actions and the outcome as they happen
+        self.observers: List[GameObserver] = []
+
+        # Each game owns its RNG so it can be replayed from the recorded seed
+        if seed is None:
+            seed = (
+                game_state.seed if game_state.seed is not None else secrets.randbits(64)
+            )
+        self.game_state.seed = seed
+        self.rng = random.Random(seed)
+
+    @classmethod
+    def replay(
+        cls,
+        room_code: str,
+        player_info: List[Dict],
+        seed: int,
+        action_log: List[Dict],
+        variation: Optional[str] = None,
+    ) -> "CoupGame":
+        """Rebuild a game from its seed, variation, starting roster and action log"""
+        game_state = GameState(
+            room_code=room_code,
+            players=[PlayerState(id=p["id"], name=p["name"]) for p in player_info],
+        )
+        if variation:
+            game_state.variation = variation
+        coup_game = cls(game_state, seed)
+        game_state.deck = coup_game.create_deck()
+        coup_game.start()
+
+        for entry in action_log:
+            result = coup_game.apply(entry)
+            if not result.get("success"):
+                raise ValueError(f"Replay diverged at {entry}: {result.get('message')}")
+
+        return coup_game
+
+    def snapshot(self) -> Dict:
+        """
+        Capture the game mid-play as plain JSON data, including the pending
+        windows and the RNG position, so it can be restored in another process.
+        """
+        version, internal_state, gauss_next = self.rng.getstate()
+        return {
+            "game_state": self.game_state.model_dump(mode="json"),
+            "pending_action": self.pending_action,
+            "pending_challenge": self.pending_challenge,
+            "pending_counteraction": self.pending_counteraction,
+            "challenge_window_open": self.challenge_window_open,
+            "counteraction_window_open": self.counteraction_window_open,
+            "pending_exchange": self.pending_exchange,
+            "rng_state": [version, list(internal_state), gauss_next],
+        }
+
+    @classmethod
+    def restore(cls, snapshot: Dict) -> "CoupGame":
+        """Rebuild a game from a snapshot, continuing exactly where it left off"""
+        game_state = GameState.model_validate(snapshot["game_state"])
+        coup_game = cls(game_state, game_state.seed)
+        coup_game.pending_action = snapshot.get("pending_action")
+        coup_game.pending_challenge = snapshot.get("pending_challenge")
+        coup_game.pending_counteraction = snapshot.get("pending_counteraction")
+        coup_game.challenge_window_open = snapshot.get("challenge_window_open", False)
+        coup_game.counteraction_window_open = snapshot.get(
+            "counteraction_window_open", False
+        )
+        coup_game.pending_exchange = snapshot.get("pending_exchange")
+
+        version, internal_state, gauss_next = snapshot["rng_state"]
+        coup_game.rng.setstate((version, tuple(internal_state), gauss_next))
+        return coup_game
+
+    def apply(self, entry: Dict) -> Dict:
+        """Apply a single action log entry to the game"""
+        moves = {
+            "perform_action": self.perform_action,
+            "challenge": self.challenge,
+            "pass_challenge": self.pass_challenge,
+            "counter": self.counter,
+            "pass_counter": self.pass_counter,
+            "complete_exchange": self.complete_exchange,
+        }
+        move = moves.get(entry.get("type"))
+        if not move:
+            return {"success": False, "message": "Unknown log entry"}
+        return move(entry["player_id"], *entry.get("args", []))
+
+    def bump_version(self) -> None:
+        """Mark the game state as changed and wake up anyone waiting on it"""
+        self.game_state.version += 1
+        if self._version_event is not None:
+            self._version_event.set()
+            self._version_event = None
+
+    async def wait_for_version(self, after_version: int, timeout: float) -> bool:
+        """Wait until the state version is past after_version, False on timeout"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.game_state.version <= after_version:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            if self._version_event is None:
+                self._version_event = asyncio.Event()
+            try:
+                await asyncio.wait_for(self._version_event.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    def start(self) -> None:
+        """Deal the cards and start playing, a game only starts once"""
+        if self.game_state.status != GameStatus.WAITING:
+            return
+        self.deal_cards()
+        self.game_state.status = GameStatus.PLAYING
+        self.bump_version()
+        self._notify("on_game_start")
+
+    def _notify(self, event: str, *args) -> None:
+        """Pass an event to the observers, a failing observer never breaks the game"""
+        for observer in self.observers:
+            try:
+                getattr(observer, event)(self, *args)
+            except Exception as e:
+                logger.error(f"Error in game observer {event}: {str(e)}")
 
     def create_deck(self) -> List[str]:
         """Create a deck of cards for Coup"""
-        cards = []
-        for character in CHARACTERS:
-            cards.extend([character] * 3)  # 3 copies of each character
-        random.shuffle(cards)
+        cards = list(self.rules.deck)
+        self.rng.shuffle(cards)
         return cards
 
     def deal_cards(self) -> None:
         """Deal cards to players"""
         for player in self.game_state.players:
-            player.cards = [self.game_state.deck.pop() for _ in range(CARDS_PER_PLAYER)]
-            player.coins = STARTING_COINS
+            player.cards = [
+                self._draw_card() for _ in range(self.rules.cards_per_player)
+            ]
+            player.coins = self.rules.starting_coins
+
+    def _get_player(self, player_id: Optional[str]) -> Optional[PlayerState]:
+        """Find a player by ID"""
+        return self.players_by_id.get(player_id)
+
+    def _draw_card(self) -> str:
+        """Draw the top card of the (already shuffled) deck"""
+        return self.game_state.deck.pop()
+
+    def _return_card(self, card: str) -> None:
+        """Put a card back into the deck at a uniformly random position in O(1)"""
+        deck = self.game_state.deck
+        deck.append(card)
+        swap_index = self.rng.randrange(len(deck))
+        deck[-1], deck[swap_index] = deck[swap_index], deck[-1]
 
     def is_action_valid(self, player_id: str, action: Dict) -> Tuple[bool, str]:
         """Check if an action is valid"""
@@ -66,8 +228,12 @@ class CoupGame:
             logger.error(f"No action type specified in action: {action}")
             return False, "No action type specified"
 
+        rule = self.rules.get_action(action_type)
+        if not rule:
+            return False, f"Unknown action type: {action_type}"
+
         # Find the player
-        player = next((p for p in self.game_state.players if p.id == player_id), None)
+        player = self._get_player(player_id)
         if not player:
             logger.error(f"Player {player_id} not found")
             return False, "Player not found"
@@ -84,238 +250,235 @@ class CoupGame:
         if not player.is_alive:
             return False, "Player is not alive"
 
-        # If player has 10+ coins, they must coup
-        if player.coins >= 10 and action_type != ActionType.COUP:
-            return False, "You must perform a coup when you have 10 or more coins"
-
-        # Check action-specific requirements
-        if action_type == ActionType.COUP:
-            # Check if player has enough coins
-            if player.coins < COUP_COST:
-                return False, "Not enough coins for coup"
+        # Check if the previous action is still being resolved
+        if self.pending_action or self.pending_exchange:
+            return False, "Another action is still pending"
 
-            # Check if target is specified and valid
-            target_id = action.get("target_id")
-            if not target_id:
-                return False, "No target specified for coup"
-
-            target = next(
-                (p for p in self.game_state.players if p.id == target_id), None
+        # If player has 10+ coins, they must coup
+        if (
+            player.coins >= self.rules.forced_action_coins
+            and action_type != self.rules.forced_action
+        ):
+            return (
+                False,
+                f"You must perform a {self.rules.forced_action} when you have {self.rules.forced_action_coins} or more coins",
             )
-            if not target:
-                return False, "Target player not found"
-
-            if not target.is_alive:
-                return False, "Target player is not alive"
 
-        elif action_type == ActionType.ASSASSINATE:
-            # Check if player has enough coins
-            if player.coins < ASSASSINATE_COST:
-                return False, "Not enough coins for assassination"
+        # Check if player has enough coins
+        if player.coins < rule.cost:
+            return False, f"Not enough coins for {rule.name}"
 
-            # Check if target is specified and valid
+        # Check if target is specified and valid
+        if rule.requires_target:
             target_id = action.get("target_id")
             if not target_id:
-                return False, "No target specified for assassination"
+                return False, f"No target specified for {rule.name}"
 
-            target = next(
-                (p for p in self.game_state.players if p.id == target_id), None
-            )
+            target = self._get_player(target_id)
             if not target:
                 return False, "Target player not found"
 
-            if not target.is_alive:
-                return False, "Target player is not alive"
-
-        elif action_type == ActionType.STEAL:
-            # Check if target is specified and valid
-            target_id = action.get("target_id")
-            if not target_id:
-                return False, "No target specified for stealing"
-
-            target = next(
-                (p for p in self.game_state.players if p.id == target_id), None
-            )
-            if not target:
-                return False, "Target player not found"
+            if target.id == player_id:
+                return False, "You cannot target yourself"
 
             if not target.is_alive:
                 return False, "Target player is not alive"
 
-            if target.coins == 0:
-                return False, "Target player has no coins to steal"
+            if rule.target_needs_coins and target.coins == 0:
+                return False, f"Target player has no coins for {rule.name}"
 
         return True, ""
 
+    def get_legal_moves(self) -> Dict[str, List[Dict]]:
+        """
+        Get every legal move for every player, keyed by player ID.
+        Moves use the same shape as the "action" of a game_action message,
+        so clients and bots can send one back as-is.
+        """
+        version = self.game_state.version
+        if self._legal_moves_cache is None or self._legal_moves_cache[0] != version:
+            self._legal_moves_cache = (version, self._generate_legal_moves())
+        return self._legal_moves_cache[1]
+
+    def _generate_legal_moves(self) -> Dict[str, List[Dict]]:
+        """List the legal moves of every player from the current state"""
+        moves = {p.id: [] for p in self.game_state.players}
+        if self.game_state.status != GameStatus.PLAYING:
+            return moves
+
+        alive_players = [p for p in self.game_state.players if p.is_alive]
+
+        # Claims can be challenged by anyone but the claimant
+        if self.challenge_window_open:
+            claim = self.pending_counteraction or self.pending_action
+            for p in alive_players:
+                if claim and p.id != claim["player_id"]:
+                    moves[p.id].append({"action_type": "challenge"})
+                    moves[p.id].append({"action_type": "pass_challenge"})
+            return moves
+
+        # Blocks can be claimed by anyone the rule allows but the acting player
+        if self.counteraction_window_open and self.pending_action:
+            action = self.pending_action["action"]
+            rule = self.rules.get_action(action.get("action_type"))
+            for p in alive_players:
+                if p.id == self.pending_action["player_id"]:
+                    continue
+                if rule and self._can_block(rule, action, p.id):
+                    for counter_type, characters in rule.blocked_by.items():
+                        for character in characters:
+                            moves[p.id].append(
+                                {
+                                    "action_type": "counter",
+                                    "counter_action": {
+                                        "counter_type": counter_type,
+                                        "character": character,
+                                    },
+                                }
+                            )
+                moves[p.id].append({"action_type": "pass_counter"})
+            return moves
+
+        # The exchanging player picks which cards to keep
+        if self.pending_exchange:
+            player = self._get_player(self.pending_exchange)
+            if player and player.is_alive and self.game_state.last_action:
+                all_cards = self.game_state.last_action.get("cards", [])
+                moves[player.id] = [
+                    {"action_type": "complete_exchange", "kept_indices": list(kept)}
+                    for kept in itertools.combinations(
+                        range(len(all_cards)), len(player.cards)
+                    )
+                ]
+            return moves
+
+        player = self.game_state.get_current_player()
+        if not player or not player.is_alive:
+            return moves
+
+        if player.coins >= self.rules.forced_action_coins:
+            rules = [self.rules.get_action(self.rules.forced_action)]
+        else:
+            rules = self.rules.actions.values()
+
+        targets = [p for p in alive_players if p.id != player.id]
+        game_actions = []
+        for rule in rules:
+            if player.coins < rule.cost:
+                continue
+            if not rule.requires_target:
+                game_actions.append({"action_type": rule.action_type})
+                continue
+            for t in targets:
+                if rule.target_needs_coins and t.coins == 0:
+                    continue
+                game_actions.append(
+                    {"action_type": rule.action_type, "target_id": t.id}
+                )
+
+        moves[player.id] = [
+            {"action_type": "perform_action", "game_action": game_action}
+            for game_action in game_actions
+        ]
+        return moves
+
+    @traced()
+    @recorded("perform_action")
     def perform_action(self, player_id: str, action: Dict) -> Dict:
         """Perform an action in the game"""
-        action_type = action.get("action_type")
+        rule = self.rules.get_action(action.get("action_type"))
 
         # Find the player
-        player = next((p for p in self.game_state.players if p.id == player_id), None)
+        player = self._get_player(player_id)
         if not player:
             return {"success": False, "message": "Player not found"}
 
-        # For actions that can be challenged or countered, set up the pending action
-        if action_type in [
-            ActionType.TAX,
-            ActionType.ASSASSINATE,
-            ActionType.STEAL,
-            ActionType.EXCHANGE,
-            ActionType.FOREIGN_AID,
-        ]:
-            self.pending_action = {"player_id": player_id, "action": action}
-
-            # Open challenge window for character claims
-            if action_type in [
-                ActionType.TAX,
-                ActionType.ASSASSINATE,
-                ActionType.STEAL,
-                ActionType.EXCHANGE,
-            ]:
-                self.challenge_window_open = True
-                return {
-                    "success": True,
-                    "message": f"Player {player.name} is attempting {action_type}",
-                    "state": "challenge_window",
-                }
-
-            # Open counteraction window for foreign aid
-            if action_type == ActionType.FOREIGN_AID:
-                self.counteraction_window_open = True
-                return {
-                    "success": True,
-                    "message": f"Player {player.name} is attempting to take foreign aid",
-                    "state": "counteraction_window",
-                }
+        if not rule:
+            return {"success": False, "message": "Invalid action"}
 
         # For direct actions that can't be challenged or countered, execute immediately
-        if action_type == ActionType.INCOME:
-            player.coins += 1
-            self.game_state.last_action = {
-                "type": ActionType.INCOME,
-                "player": player.name,
-            }
-            self.game_state.next_player()
-            return {"success": True, "message": f"Player {player.name} took income"}
-
-        elif action_type == ActionType.COUP:
-            target_id = action.get("target_id")
-            target = next(
-                (p for p in self.game_state.players if p.id == target_id), None
+        if not rule.challengeable and not rule.blockable:
+            return self._execute_action(player_id, action)
+
+        # Otherwise set up the pending action
+        self.pending_action = {"player_id": player_id, "action": action}
+
+        # Open challenge window for character claims, counteraction window otherwise
+        if rule.challengeable:
+            self._notify(
+                "on_claim",
+                player_id,
+                rule.claimed_character,
+                rule.claimed_character in player.cards,
             )
-
-            # Deduct coins
-            player.coins -= COUP_COST
-
-            # Target loses a card
-            self._lose_card(target_id, action.get("card_index", 0))
-
-            self.game_state.last_action = {
-                "type": ActionType.COUP,
-                "player": player.name,
-                "target": target.name,
-            }
-
-            # Check if game is over
-            if self.game_state.is_game_over():
-                self.game_state.status = GameStatus.FINISHED
-                return {
-                    "success": True,
-                    "message": f"Player {player.name} performed a coup against {target.name}",
-                    "game_over": True,
-                }
-
-            self.game_state.next_player()
-            return {
-                "success": True,
-                "message": f"Player {player.name} performed a coup against {target.name}",
-            }
-
-        return {"success": False, "message": "Invalid action"}
-
+            self.challenge_window_open = True
+            state = "challenge_window"
+        else:
+            self.counteraction_window_open = True
+            state = "counteraction_window"
+
+        return {
+            "success": True,
+            "message": f"Player {player.name} is attempting {rule.action_type}",
+            "state": state,
+        }
+
+    @traced()
     def resolve_challenge(self, challenger_id: str, challenge_successful: bool) -> Dict:
         """Resolve a challenge"""
         if not self.pending_action:
             return {"success": False, "message": "No pending action to challenge"}
 
         action_player_id = self.pending_action["player_id"]
-        action_player = next(
-            (p for p in self.game_state.players if p.id == action_player_id), None
-        )
-        challenger = next(
-            (p for p in self.game_state.players if p.id == challenger_id), None
-        )
+        action_player = self._get_player(action_player_id)
+        challenger = self._get_player(challenger_id)
 
         if not action_player or not challenger:
             return {"success": False, "message": "Player not found"}
 
-        action = self.pending_action["action"]
-        action_type = action.get("action_type")
-
         # Determine which character is being claimed
-        claimed_character = None
-        if action_type == ActionType.TAX:
-            claimed_character = "duke"
-        elif action_type == ActionType.ASSASSINATE:
-            claimed_character = "assassin"
-        elif action_type == ActionType.STEAL:
-            claimed_character = "captain"
-        elif action_type == ActionType.EXCHANGE:
-            claimed_character = "ambassador"
-
-        if not claimed_character:
+        action = self.pending_action["action"]
+        rule = self.rules.get_action(action.get("action_type"))
+        if not rule or not rule.challengeable:
             return {"success": False, "message": "Invalid action for challenge"}
 
-        # Check if the player has the claimed character
-        has_character = claimed_character in action_player.cards
+        claimed_character = rule.claimed_character
+        self.challenge_window_open = False
+        self._notify(
+            "on_challenge",
+            challenger_id,
+            action_player_id,
+            claimed_character,
+            claimed_character not in action_player.cards,
+        )
 
-        if has_character:  # Challenge fails
+        if claimed_character in action_player.cards:  # Challenge fails
             # Challenger loses a card
             self._lose_card(challenger_id)
 
             # Player with the character returns it to the deck and draws a new one
-            card_index = action_player.cards.index(claimed_character)
-            self.game_state.deck.append(action_player.cards.pop(card_index))
-            random.shuffle(self.game_state.deck)
-            action_player.cards.append(self.game_state.deck.pop())
+            self._replace_card(action_player, claimed_character)
 
-            # Execute the action
-            result = self._execute_action(action_player_id, action)
-
-            self.challenge_window_open = False
-            self.pending_action = None
-
-            return {
-                "success": True,
-                "message": f"Challenge failed! {action_player.name} had the {claimed_character}. {challenger.name} loses a card.",
-                "action_result": result,
-            }
-        else:  # Challenge succeeds
-            # Player being challenged loses a card
-            self._lose_card(action_player_id)
-
-            self.challenge_window_open = False
-            self.pending_action = None
+            message = f"Challenge failed! {action_player.name} had the {claimed_character}. {challenger.name} loses a card."
+            if self.game_state.is_game_over():
+                self.pending_action = None
+                return {"success": True, "message": message, **self._end_turn()}
 
-            # Move to next player if the current player lost
-            if not action_player.is_alive:
-                self.game_state.next_player()
+            # The claim stands, so the action can still be blocked or goes through
+            result = self._claim_stands()
+            return self._with_action_result(message, result)
 
-            # Check if game is over
-            if self.game_state.is_game_over():
-                self.game_state.status = GameStatus.FINISHED
-                return {
-                    "success": True,
-                    "message": f"Challenge successful! {action_player.name} did not have the {claimed_character} and loses a card.",
-                    "game_over": True,
-                }
+        # Challenge succeeds, player being challenged loses a card and the turn ends
+        self._lose_card(action_player_id)
+        self.pending_action = None
 
-            return {
-                "success": True,
-                "message": f"Challenge successful! {action_player.name} did not have the {claimed_character} and loses a card.",
-            }
+        return {
+            "success": True,
+            "message": f"Challenge successful! {action_player.name} did not have the {claimed_character} and loses a card.",
+            **self._end_turn(),
+        }
 
+    @traced()
     def resolve_counteraction(
         self, counter_player_id: str, counter_action: Dict
     ) -> Dict:
@@ -324,315 +487,418 @@ class CoupGame:
             return {"success": False, "message": "No pending action to counter"}
 
         action_player_id = self.pending_action["player_id"]
-        action_player = next(
-            (p for p in self.game_state.players if p.id == action_player_id), None
-        )
-        counter_player = next(
-            (p for p in self.game_state.players if p.id == counter_player_id), None
-        )
+        action_player = self._get_player(action_player_id)
+        counter_player = self._get_player(counter_player_id)
 
         if not action_player or not counter_player:
             return {"success": False, "message": "Player not found"}
 
         action = self.pending_action["action"]
-        action_type = action.get("action_type")
+        rule = self.rules.get_action(action.get("action_type"))
         counter_type = counter_action.get("counter_type")
 
         # Validate the counteraction
-        if (
-            action_type == ActionType.FOREIGN_AID
-            and counter_type == ActionType.BLOCK_FOREIGN_AID
-        ):
-            # Duke blocks foreign aid
-            self.pending_counteraction = {
-                "player_id": counter_player_id,
-                "counter_action": counter_action,
-                "claimed_character": "duke",
-            }
-
-            # Open challenge window for the counteraction
-            self.challenge_window_open = True
-            self.counteraction_window_open = False
+        characters = (
+            self.rules.get_blockers(rule.action_type, counter_type) if rule else []
+        )
+        if not characters or counter_player_id == action_player_id:
+            return {"success": False, "message": "Invalid counteraction"}
 
+        if not self._can_block(rule, action, counter_player_id):
             return {
-                "success": True,
-                "message": f"{counter_player.name} is blocking foreign aid with Duke",
-                "state": "challenge_window",
-            }
-
-        elif (
-            action_type == ActionType.ASSASSINATE
-            and counter_type == ActionType.BLOCK_ASSASSINATION
-        ):
-            # Contessa blocks assassination
-            self.pending_counteraction = {
-                "player_id": counter_player_id,
-                "counter_action": counter_action,
-                "claimed_character": "contessa",
+                "success": False,
+                "message": f"Only the target can block {rule.name}",
             }
 
-            # Open challenge window for the counteraction
-            self.challenge_window_open = True
-            self.counteraction_window_open = False
-
+        claimed_character = counter_action.get("character", characters[0])
+        if claimed_character not in characters:
             return {
-                "success": True,
-                "message": f"{counter_player.name} is blocking assassination with Contessa",
-                "state": "challenge_window",
-            }
-
-        elif (
-            action_type == ActionType.STEAL
-            and counter_type == ActionType.BLOCK_STEALING
-        ):
-            # Captain or Ambassador blocks stealing
-            claimed_character = counter_action.get("character", "captain")
-            if claimed_character not in ["captain", "ambassador"]:
-                return {
-                    "success": False,
-                    "message": "Invalid character for blocking stealing",
-                }
-
-            self.pending_counteraction = {
-                "player_id": counter_player_id,
-                "counter_action": counter_action,
-                "claimed_character": claimed_character,
+                "success": False,
+                "message": f"Invalid character for blocking {rule.name}",
             }
+        # Log the character the block resolved to, records and replays need it
+        counter_action["character"] = claimed_character
+
+        self.pending_counteraction = {
+            "player_id": counter_player_id,
+            "counter_action": counter_action,
+            "claimed_character": claimed_character,
+        }
+        self._notify(
+            "on_claim",
+            counter_player_id,
+            claimed_character,
+            claimed_character in counter_player.cards,
+        )
 
-            # Open challenge window for the counteraction
-            self.challenge_window_open = True
-            self.counteraction_window_open = False
-
-            return {
-                "success": True,
-                "message": f"{counter_player.name} is blocking stealing with {claimed_character.capitalize()}",
-                "state": "challenge_window",
-            }
+        # Open challenge window for the counteraction
+        self.challenge_window_open = True
+        self.counteraction_window_open = False
 
-        return {"success": False, "message": "Invalid counteraction"}
+        return {
+            "success": True,
+            "message": f"{counter_player.name} is blocking {rule.name} with {claimed_character.capitalize()}",
+            "state": "challenge_window",
+        }
 
+    @traced()
     def resolve_counteraction_challenge(
         self, challenger_id: str, challenge_successful: bool
     ) -> Dict:
         """Resolve a challenge to a counteraction"""
-        if not self.pending_counteraction:
+        if not self.pending_counteraction or not self.pending_action:
             return {
                 "success": False,
                 "message": "No pending counteraction to challenge",
             }
 
         counter_player_id = self.pending_counteraction["player_id"]
-        counter_player = next(
-            (p for p in self.game_state.players if p.id == counter_player_id), None
-        )
-        challenger = next(
-            (p for p in self.game_state.players if p.id == challenger_id), None
-        )
+        counter_player = self._get_player(counter_player_id)
+        challenger = self._get_player(challenger_id)
 
         if not counter_player or not challenger:
             return {"success": False, "message": "Player not found"}
 
         claimed_character = self.pending_counteraction["claimed_character"]
+        self.challenge_window_open = False
+        self._notify(
+            "on_challenge",
+            challenger_id,
+            counter_player_id,
+            claimed_character,
+            claimed_character not in counter_player.cards,
+        )
 
-        # Check if the counter player has the claimed character
-        has_character = claimed_character in counter_player.cards
-
-        if has_character:  # Challenge fails
+        if claimed_character in counter_player.cards:  # Challenge fails
             # Challenger loses a card
             self._lose_card(challenger_id)
 
             # Player with the character returns it to the deck and draws a new one
-            card_index = counter_player.cards.index(claimed_character)
-            self.game_state.deck.append(counter_player.cards.pop(card_index))
-            random.shuffle(self.game_state.deck)
-            counter_player.cards.append(self.game_state.deck.pop())
+            self._replace_card(counter_player, claimed_character)
 
             # Counteraction succeeds, original action is blocked
-            action_player_id = self.pending_action["player_id"]
-            action_player = next(
-                (p for p in self.game_state.players if p.id == action_player_id), None
-            )
-
-            # If it was an assassination, return the coins
-            if (
-                self.pending_action["action"].get("action_type")
-                == ActionType.ASSASSINATE
-            ):
-                action_player.coins += ASSASSINATE_COST
-
-            self.challenge_window_open = False
             self.pending_action = None
             self.pending_counteraction = None
 
-            # Move to next player
-            self.game_state.next_player()
-
             return {
                 "success": True,
                 "message": f"Challenge failed! {counter_player.name} had the {claimed_character}. {challenger.name} loses a card. Action blocked.",
+                **self._end_turn(),
             }
-        else:  # Challenge succeeds
-            # Counter player loses a card
-            self._lose_card(counter_player_id)
-
-            # Original action proceeds
-            action_player_id = self.pending_action["player_id"]
-            action = self.pending_action["action"]
-            result = self._execute_action(action_player_id, action)
 
-            self.challenge_window_open = False
-            self.pending_action = None
-            self.pending_counteraction = None
+        # Challenge succeeds, counter player loses a card
+        self._lose_card(counter_player_id)
 
-            # Check if game is over
-            if self.game_state.is_game_over():
-                self.game_state.status = GameStatus.FINISHED
-                return {
-                    "success": True,
-                    "message": f"Challenge successful! {counter_player.name} did not have the {claimed_character} and loses a card. Original action proceeds.",
-                    "action_result": result,
-                    "game_over": True,
-                }
+        # Original action proceeds
+        action_player_id = self.pending_action["player_id"]
+        action = self.pending_action["action"]
+        self.pending_counteraction = None
+        result = self._execute_action(action_player_id, action)
+        self.pending_action = None
 
-            return {
-                "success": True,
-                "message": f"Challenge successful! {counter_player.name} did not have the {claimed_character} and loses a card. Original action proceeds.",
-                "action_result": result,
-            }
+        return self._with_action_result(
+            f"Challenge successful! {counter_player.name} did not have the {claimed_character} and loses a card. Original action proceeds.",
+            result,
+        )
 
-    def _execute_action(self, player_id: str, action: Dict) -> Dict:
-        """Execute an action after challenges/counteractions are resolved"""
-        action_type = action.get("action_type")
-        player = next((p for p in self.game_state.players if p.id == player_id), None)
+    @traced()
+    @recorded("challenge")
+    def challenge(self, challenger_id: str) -> Dict:
+        """Challenge the pending action or counteraction"""
+        if not self.challenge_window_open:
+            return {"success": False, "message": "No action to challenge"}
 
-        if not player:
-            return {"success": False, "message": "Player not found"}
+        rejection = self._check_responder(challenger_id)
+        if rejection:
+            return rejection
 
-        if action_type == ActionType.TAX:
-            # Duke takes 3 coins
-            player.coins += 3
-            self.game_state.last_action = {
-                "type": ActionType.TAX,
-                "player": player.name,
-            }
-            self.game_state.next_player()
-            return {
-                "success": True,
-                "message": f"Player {player.name} took tax (3 coins)",
-            }
+        claim = self.pending_counteraction or self.pending_action
+        if claim and claim["player_id"] == challenger_id:
+            return {"success": False, "message": "You cannot challenge yourself"}
 
-        elif action_type == ActionType.FOREIGN_AID:
-            # Take 2 coins
-            player.coins += 2
-            self.game_state.last_action = {
-                "type": ActionType.FOREIGN_AID,
-                "player": player.name,
-            }
-            self.game_state.next_player()
-            return {
-                "success": True,
-                "message": f"Player {player.name} took foreign aid (2 coins)",
-            }
+        # If there's a pending counteraction, challenge that instead
+        if self.pending_counteraction:
+            return self.resolve_counteraction_challenge(challenger_id, True)
 
-        elif action_type == ActionType.ASSASSINATE:
-            target_id = action.get("target_id")
-            target = next(
-                (p for p in self.game_state.players if p.id == target_id), None
-            )
+        # Otherwise challenge the main action
+        return self.resolve_challenge(challenger_id, True)
 
-            if not target:
-                return {"success": False, "message": "Target player not found"}
+    @traced()
+    @recorded("pass_challenge")
+    def pass_challenge(self, player_id: str) -> Dict:
+        """Pass on challenging the pending action or counteraction"""
+        if not self.challenge_window_open:
+            return {"success": False, "message": "No action to challenge"}
 
-            # Deduct coins
-            player.coins -= ASSASSINATE_COST
+        rejection = self._check_responder(player_id)
+        if rejection:
+            return rejection
 
-            # Target loses a card
-            card_index = action.get("card_index", 0)
-            self._lose_card(target_id, card_index)
+        # If there's a pending counteraction and all players passed, the counteraction succeeds
+        if self.pending_counteraction:
+            counter_player = self._get_player(self.pending_counteraction["player_id"])
 
-            self.game_state.last_action = {
-                "type": ActionType.ASSASSINATE,
-                "player": player.name,
-                "target": target.name,
-            }
+            # Close windows and clear pending actions
+            self.challenge_window_open = False
+            self.counteraction_window_open = False
+            self.pending_action = None
+            self.pending_counteraction = None
 
-            # Check if game is over
-            if self.game_state.is_game_over():
-                self.game_state.status = GameStatus.FINISHED
-                return {
-                    "success": True,
-                    "message": f"Player {player.name} assassinated {target.name}",
-                    "game_over": True,
-                }
-
-            self.game_state.next_player()
             return {
                 "success": True,
-                "message": f"Player {player.name} assassinated {target.name}",
+                "message": f"No one challenged. {counter_player.name}'s counteraction succeeds. Action blocked.",
+                **self._end_turn(),
             }
 
-        elif action_type == ActionType.STEAL:
-            target_id = action.get("target_id")
-            target = next(
-                (p for p in self.game_state.players if p.id == target_id), None
-            )
+        # If there's a pending action and all players passed, the claim stands
+        if self.pending_action:
+            self.challenge_window_open = False
+            result = self._claim_stands()
+            message = "No one challenged."
+            if not self.counteraction_window_open:
+                message += " Action succeeds."
+            return self._with_action_result(message, result)
+
+        return {"success": False, "message": "No pending action"}
+
+    @traced()
+    @recorded("counter")
+    def counter(self, counter_player_id: str, counter_action: Dict) -> Dict:
+        """Counter the pending action"""
+        if not self.counteraction_window_open:
+            return {"success": False, "message": "No action to counter"}
+
+        return self.resolve_counteraction(counter_player_id, counter_action)
+
+    @traced()
+    @recorded("pass_counter")
+    def pass_counter(self, player_id: str) -> Dict:
+        """Pass on countering the pending action"""
+        if not self.counteraction_window_open:
+            return {"success": False, "message": "No action to counter"}
+
+        rejection = self._check_responder(player_id)
+        if rejection:
+            return rejection
+        if self.pending_action and self.pending_action["player_id"] == player_id:
+            return {"success": False, "message": "You cannot pass on your own action"}
+
+        # If all players passed, execute the action
+        if self.pending_action:
+            action_player_id = self.pending_action["player_id"]
+            action = self.pending_action["action"]
 
-            if not target:
-                return {"success": False, "message": "Target player not found"}
+            # Close counteraction window and execute the action
+            self.counteraction_window_open = False
+            result = self._execute_action(action_player_id, action)
+            self.pending_action = None
 
-            # Steal up to 2 coins
-            steal_amount = min(2, target.coins)
-            target.coins -= steal_amount
-            player.coins += steal_amount
+            return self._with_action_result(
+                "No one countered. Action succeeds.", result
+            )
 
-            self.game_state.last_action = {
-                "type": ActionType.STEAL,
-                "player": player.name,
-                "target": target.name,
-                "amount": steal_amount,
-            }
+        return {"success": False, "message": "No pending action"}
+
+    def _check_responder(self, player_id: str) -> Optional[Dict]:
+        """Get the failure for a player who can't respond to a claim, None if they can"""
+        player = self._get_player(player_id)
+        if not player:
+            return {"success": False, "message": "Player not found"}
+        if not player.is_alive:
+            return {"success": False, "message": "Eliminated players cannot respond"}
+        return None
+
+    def _can_block(self, rule: ActionRule, action: Dict, player_id: str) -> bool:
+        """Check if a player is allowed to block an action"""
+        return not rule.target_blocks_only or action.get("target_id") == player_id
+
+    def _claim_stands(self) -> Dict:
+        """
+        Continue the pending action once its claim was not (or unsuccessfully)
+        challenged: open the counteraction window if it can be blocked,
+        otherwise execute it.
+        """
+        action_player_id = self.pending_action["player_id"]
+        action = self.pending_action["action"]
+        rule = self.rules.get_action(action.get("action_type"))
 
-            self.game_state.next_player()
+        if rule.blockable:
+            self.counteraction_window_open = True
             return {
                 "success": True,
-                "message": f"Player {player.name} stole {steal_amount} coins from {target.name}",
+                "message": f"Waiting to see if anyone blocks {rule.name}",
+                "state": "counteraction_window",
             }
 
-        elif action_type == ActionType.EXCHANGE:
-            # Draw 2 cards from the deck
-            if len(self.game_state.deck) < 2:
-                return {"success": False, "message": "Not enough cards in the deck"}
+        result = self._execute_action(action_player_id, action)
+        self.pending_action = None
+        return result
+
+    def _with_action_result(self, message: str, result: Dict) -> Dict:
+        """Build a resolution result around the result of the resolved action"""
+        response = {"success": True, "message": message, "action_result": result}
+        if result.get("game_over"):
+            response["game_over"] = True
+        return response
+
+    def _end_turn(self) -> Dict:
+        """Finish the game if only one player is left, otherwise move to the next player"""
+        if self.game_state.is_game_over():
+            self.game_state.status = GameStatus.FINISHED
+            if self.observers:
+                alive = [p.id for p in self.game_state.players if p.is_alive]
+                self._notify("on_game_over", alive[0] if alive else None)
+            return {"game_over": True}
 
-            drawn_cards = [self.game_state.deck.pop() for _ in range(2)]
+        self.game_state.next_player()
+        return {}
 
-            # Add to player's hand temporarily
-            all_cards = player.cards + drawn_cards
+    @traced()
+    def _execute_action(self, player_id: str, action: Dict) -> Dict:
+        """Execute an action after challenges/counteractions are resolved"""
+        rule = self.rules.get_action(action.get("action_type"))
+        player = self._get_player(player_id)
 
-            # Player will need to choose which cards to keep in a separate action
-            self.game_state.last_action = {
-                "type": ActionType.EXCHANGE,
-                "player": player.name,
-                "cards": all_cards,
-            }
+        if not player:
+            return {"success": False, "message": "Player not found"}
 
-            return {
-                "success": True,
-                "message": f"Player {player.name} is exchanging cards",
-                "state": "exchange",
-                "cards": all_cards,
-            }
+        if not rule:
+            return {"success": False, "message": "Invalid action"}
+
+        target = None
+        if rule.requires_target:
+            target = self._get_player(action.get("target_id"))
+            if not target:
+                return {"success": False, "message": "Target player not found"}
 
-        return {"success": False, "message": "Invalid action"}
+        coins_before = player.coins
+        target_coins_before = target.coins if target else 0
+
+        # Deduct coins
+        player.coins -= rule.cost
+
+        result = self._effects[rule.effect](self, rule, player, target, action)
+        if result.get("success"):
+            self._notify(
+                "on_action",
+                player_id,
+                rule.action_type,
+                player.coins - coins_before,
+                target.id if target else None,
+                target.coins - target_coins_before if target else 0,
+            )
+        return result
+
+    def _finish_action(
+        self,
+        rule: ActionRule,
+        player: PlayerState,
+        target: Optional[PlayerState],
+        amount: int,
+        details: Optional[Dict] = None,
+    ) -> Dict:
+        """Record an executed action as the last action and end the turn"""
+        self.game_state.last_action = {"type": rule.action_type, "player": player.name}
+        if target:
+            self.game_state.last_action["target"] = target.name
+        if details:
+            self.game_state.last_action.update(details)
+
+        message = rule.message.format(
+            player=player.name,
+            target=target.name if target else None,
+            amount=amount,
+        )
+        return {"success": True, "message": message, **self._end_turn()}
+
+    def _gain_coins(
+        self,
+        rule: ActionRule,
+        player: PlayerState,
+        target: Optional[PlayerState],
+        action: Dict,
+    ) -> Dict:
+        """Take coins from the bank"""
+        player.coins += rule.amount
+        return self._finish_action(rule, player, target, rule.amount)
+
+    def _target_loses_card(
+        self,
+        rule: ActionRule,
+        player: PlayerState,
+        target: Optional[PlayerState],
+        action: Dict,
+    ) -> Dict:
+        """Make the target lose a card"""
+        self._lose_card(target.id, action.get("card_index", 0))
+        return self._finish_action(rule, player, target, 0)
+
+    def _steal_coins(
+        self,
+        rule: ActionRule,
+        player: PlayerState,
+        target: Optional[PlayerState],
+        action: Dict,
+    ) -> Dict:
+        """Take coins from the target"""
+        steal_amount = min(rule.amount, target.coins)
+        target.coins -= steal_amount
+        player.coins += steal_amount
+        return self._finish_action(
+            rule, player, target, steal_amount, {"amount": steal_amount}
+        )
 
+    def _exchange_cards(
+        self,
+        rule: ActionRule,
+        player: PlayerState,
+        target: Optional[PlayerState],
+        action: Dict,
+    ) -> Dict:
+        """Draw cards from the deck, the player keeps some in complete_exchange"""
+        if len(self.game_state.deck) < rule.amount:
+            return {"success": False, "message": "Not enough cards in the deck"}
+
+        drawn_cards = [self._draw_card() for _ in range(rule.amount)]
+
+        # Add to player's hand temporarily
+        all_cards = player.cards + drawn_cards
+
+        # Player will need to choose which cards to keep in a separate action
+        self.pending_exchange = player.id
+        self.game_state.last_action = {
+            "type": rule.action_type,
+            "player": player.name,
+            "cards": all_cards,
+        }
+
+        return {
+            "success": True,
+            "message": rule.message.format(player=player.name, target=None, amount=0),
+            "state": "exchange",
+            "cards": all_cards,
+        }
+
+    # Map of effect -> handler, filled in once for every rule table
+    _effects = {
+        Effect.GAIN_COINS: _gain_coins,
+        Effect.LOSE_CARD: _target_loses_card,
+        Effect.STEAL_COINS: _steal_coins,
+        Effect.EXCHANGE_CARDS: _exchange_cards,
+    }
+
+    @traced()
+    @recorded("complete_exchange")
     def complete_exchange(self, player_id: str, kept_indices: List[int]) -> Dict:
         """Complete an exchange action by selecting which cards to keep"""
-        player = next((p for p in self.game_state.players if p.id == player_id), None)
+        player = self._get_player(player_id)
 
         if not player:
             return {"success": False, "message": "Player not found"}
 
         if (
-            not self.game_state.last_action
+            self.pending_exchange != player_id
+            or not self.game_state.last_action
             or self.game_state.last_action.get("type") != ActionType.EXCHANGE
         ):
             return {"success": False, "message": "No exchange action in progress"}
@@ -645,7 +911,12 @@ class CoupGame:
                 "message": f"You must keep exactly {len(player.cards)} cards",
             }
 
-        if max(kept_indices) >= len(all_cards) or min(kept_indices) < 0:
+        # Each card can only be kept once
+        if (
+            max(kept_indices) >= len(all_cards)
+            or min(kept_indices) < 0
+            or len(set(kept_indices)) != len(kept_indices)
+        ):
             return {"success": False, "message": "Invalid card indices"}
 
         # Get the cards the player wants to keep
@@ -655,23 +926,31 @@ class CoupGame:
         returned_cards = [
             card for i, card in enumerate(all_cards) if i not in kept_indices
         ]
-        self.game_state.deck.extend(returned_cards)
-        random.shuffle(self.game_state.deck)
+        for card in returned_cards:
+            self._return_card(card)
 
         # Update player's cards
         player.cards = kept_cards
+        self.pending_exchange = None
 
         self.game_state.next_player()
         return {"success": True, "message": f"Player {player.name} completed exchange"}
 
+    def _replace_card(self, player: PlayerState, card: str) -> None:
+        """Return a revealed card to the deck and draw a new one in its place"""
+        card_index = player.cards.index(card)
+        self._return_card(player.cards.pop(card_index))
+        player.cards.append(self._draw_card())
+
     def _lose_card(self, player_id: str, card_index: int = 0) -> None:
         """Make a player lose a card"""
-        player = next((p for p in self.game_state.players if p.id == player_id), None)
+        player = self._get_player(player_id)
 
         if not player or not player.cards:
             return
 
-        if card_index >= len(player.cards):
+        # The index comes from the client, anything out of range loses the first card
+        if not 0 <= card_index < len(player.cards):
             card_index = 0
 
         # Move card from hand to revealed cards
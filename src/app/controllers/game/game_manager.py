@@ -1,9 +1,15 @@
 from app.models.game import GameState, PlayerState, GameStatus
+from app.models.room import RoomVariation
 from app.controllers.game.coup_game import CoupGame
+from app.controllers.game.observer import GameObserver
+from app.controllers.metrics import PLAYER_VIEW_SECONDS
+from app.controllers.tracing import traced
 from typing import Dict, Optional, List
 import random
 import uuid
+import json
 import logging
+import time
 
 
 class GameManager:
@@ -12,11 +18,30 @@ class GameManager:
         self.games: Dict[str, GameState] = {}
         # Map of room_code -> CoupGame
         self.coup_games: Dict[str, CoupGame] = {}
-
-    def create_game(self, room_code: str, player_info: List[Dict]) -> GameState:
-        """Create a new game for a room"""
-        if room_code in self.games:
-            return self.games[room_code]
+        # Observers attached to every live game (not to replays)
+        self.observers: List[GameObserver] = []
+
+    def add_observer(self, observer: GameObserver) -> None:
+        """Receive the events of every live game"""
+        self.observers.append(observer)
+
+    def create_game(
+        self,
+        room_code: str,
+        player_info: List[Dict],
+        seed: Optional[int] = None,
+        variation: str = RoomVariation.COUP_O_CLOCK.value,
+    ) -> GameState:
+        """
+        Create a new game for a room. A game still in progress is returned as
+        is, whoever asks; a finished one is replaced. (The game of a released
+        room code is removed on release, so it is never found here.)
+        """
+        existing = self.games.get(room_code)
+        if existing is not None:
+            if existing.status != GameStatus.FINISHED:
+                return existing
+            self.remove_game(room_code)
 
         # Create player states
         players = []
@@ -26,6 +51,7 @@ class GameManager:
         # Create game state
         game_state = GameState(
             room_code=room_code,
+            variation=variation,
             players=players,
             deck=[],  # Will be created by CoupGame
             status=GameStatus.WAITING,
@@ -34,7 +60,8 @@ class GameManager:
         self.games[room_code] = game_state
 
         # Create Coup game
-        coup_game = CoupGame(game_state)
+        coup_game = CoupGame(game_state, seed)
+        coup_game.observers = self.observers
         self.coup_games[room_code] = coup_game
 
         # Create deck
@@ -50,11 +77,8 @@ class GameManager:
         game = self.games[room_code]
         coup_game = self.coup_games[room_code]
 
-        # Deal cards to players
-        coup_game.deal_cards()
-
-        # Set game status to playing
-        game.status = GameStatus.PLAYING
+        # Deal cards to players and set game status to playing
+        coup_game.start()
 
         return game
 
@@ -66,6 +90,25 @@ class GameManager:
         """Get the Coup game for a room"""
         return self.coup_games.get(room_code)
 
+    def replay_game(self, game_state: GameState) -> CoupGame:
+        """Rebuild a recorded game from its seed and action log"""
+        player_info = [{"id": p.id, "name": p.name} for p in game_state.players]
+        return CoupGame.replay(
+            game_state.room_code,
+            player_info,
+            game_state.seed,
+            game_state.action_log,
+            game_state.variation,
+        )
+
+    def add_game(self, coup_game: CoupGame) -> GameState:
+        """Register a game restored elsewhere, e.g. migrated from another worker"""
+        game_state = coup_game.game_state
+        coup_game.observers = self.observers
+        self.games[game_state.room_code] = game_state
+        self.coup_games[game_state.room_code] = coup_game
+        return game_state
+
     def remove_game(self, room_code: str) -> bool:
         """Remove a game from the manager"""
         if room_code in self.games:
@@ -75,6 +118,7 @@ class GameManager:
             return True
         return False
 
+    @traced()
     def perform_action(self, room_code: str, player_id: str, action: Dict) -> Dict:
         """Perform a game action"""
         logger = logging.getLogger(__name__)
@@ -99,83 +143,25 @@ class GameManager:
         logger.info(f"Action result: {result}")
         return result
 
+    @traced()
     def challenge_action(self, room_code: str, challenger_id: str) -> Dict:
         """Challenge a pending action"""
         coup_game = self.get_coup_game(room_code)
         if not coup_game:
             return {"success": False, "message": "Game not found"}
 
-        if not coup_game.challenge_window_open:
-            return {"success": False, "message": "No action to challenge"}
-
-        # If there's a pending counteraction, challenge that instead
-        if coup_game.pending_counteraction:
-            return coup_game.resolve_counteraction_challenge(challenger_id, True)
-
-        # Otherwise challenge the main action
-        return coup_game.resolve_challenge(challenger_id, True)
+        return coup_game.challenge(challenger_id)
 
+    @traced()
     def pass_challenge(self, room_code: str, player_id: str) -> Dict:
         """Pass on challenging an action"""
         coup_game = self.get_coup_game(room_code)
         if not coup_game:
             return {"success": False, "message": "Game not found"}
 
-        if not coup_game.challenge_window_open:
-            return {"success": False, "message": "No action to challenge"}
-
-        # If there's a pending counteraction and all players passed, the counteraction succeeds
-        if coup_game.pending_counteraction:
-            action_player_id = coup_game.pending_action["player_id"]
-            action_player = next(
-                (p for p in coup_game.game_state.players if p.id == action_player_id),
-                None,
-            )
-
-            counter_player_id = coup_game.pending_counteraction["player_id"]
-            counter_player = next(
-                (p for p in coup_game.game_state.players if p.id == counter_player_id),
-                None,
-            )
-
-            # If it was an assassination, return the coins
-            if coup_game.pending_action["action"].get("action_type") == "assassinate":
-                action_player.coins += 3
-
-            # Close windows and clear pending actions
-            coup_game.challenge_window_open = False
-            coup_game.counteraction_window_open = False
-            coup_game.pending_action = None
-            coup_game.pending_counteraction = None
-
-            # Move to next player
-            coup_game.game_state.next_player()
-
-            return {
-                "success": True,
-                "message": f"No one challenged. {counter_player.name}'s counteraction succeeds. Action blocked.",
-            }
-
-        # If there's a pending action and all players passed, execute the action
-        if coup_game.pending_action:
-            action_player_id = coup_game.pending_action["player_id"]
-            action = coup_game.pending_action["action"]
-
-            # Execute the action
-            result = coup_game._execute_action(action_player_id, action)
-
-            # Close challenge window and clear pending action
-            coup_game.challenge_window_open = False
-            coup_game.pending_action = None
-
-            return {
-                "success": True,
-                "message": "No one challenged. Action succeeds.",
-                "action_result": result,
-            }
-
-        return {"success": False, "message": "No pending action"}
+        return coup_game.pass_challenge(player_id)
 
+    @traced()
     def counter_action(
         self, room_code: str, counter_player_id: str, counter_action: Dict
     ) -> Dict:
@@ -184,40 +170,18 @@ class GameManager:
         if not coup_game:
             return {"success": False, "message": "Game not found"}
 
-        if not coup_game.counteraction_window_open:
-            return {"success": False, "message": "No action to counter"}
-
-        return coup_game.resolve_counteraction(counter_player_id, counter_action)
+        return coup_game.counter(counter_player_id, counter_action)
 
+    @traced()
     def pass_counter(self, room_code: str, player_id: str) -> Dict:
         """Pass on countering an action"""
         coup_game = self.get_coup_game(room_code)
         if not coup_game:
             return {"success": False, "message": "Game not found"}
 
-        if not coup_game.counteraction_window_open:
-            return {"success": False, "message": "No action to counter"}
-
-        # If all players passed, execute the action
-        if coup_game.pending_action:
-            action_player_id = coup_game.pending_action["player_id"]
-            action = coup_game.pending_action["action"]
-
-            # Execute the action
-            result = coup_game._execute_action(action_player_id, action)
-
-            # Close counteraction window and clear pending action
-            coup_game.counteraction_window_open = False
-            coup_game.pending_action = None
-
-            return {
-                "success": True,
-                "message": "No one countered. Action succeeds.",
-                "action_result": result,
-            }
-
-        return {"success": False, "message": "No pending action"}
+        return coup_game.pass_counter(player_id)
 
+    @traced()
     def complete_exchange(
         self, room_code: str, player_id: str, kept_indices: List[int]
     ) -> Dict:
@@ -228,31 +192,33 @@ class GameManager:
 
         return coup_game.complete_exchange(player_id, kept_indices)
 
-    def get_player_view(self, room_code: str, player_id: str) -> dict:
-        """Get a view of the game state for a specific player"""
+    def _get_public_view(self, room_code: str) -> Optional[Dict]:
+        """
+        Get the part of the game view shared by every player (all cards hidden).
+        Built and JSON-encoded once per state version, then reused for every player.
+        """
         game = self.get_game(room_code)
         if not game:
-            return {"error": "Game not found"}
+            return None
 
-        # Find the player
-        player = next((p for p in game.players if p.id == player_id), None)
-        if not player:
-            return {"error": "Player not found"}
+        coup_game = self.get_coup_game(room_code)
+        cached = coup_game.public_view_cache if coup_game else None
+        if cached is not None and cached["version"] == game.version:
+            return cached
 
-        # Create a view that hides other players' cards
-        other_players = []
+        # Hide cards for all players, the requesting player's hand is overlaid later
+        public_players = []
+        private_players = {}
         for p in game.players:
-            if p.id == player_id:
-                # Include full player info for the requesting player
-                other_players.append(p.dict())
-            else:
-                # Hide cards for other players
-                player_info = p.dict()
-                player_info["cards"] = ["hidden"] * len(p.cards)
-                other_players.append(player_info)
+            player_info = p.model_dump()
+            private_players[p.id] = player_info
+            public_players.append({**player_info, "cards": ["hidden"] * len(p.cards)})
+        # Players target each other by ID, spectators don't need to know them
+        spectator_players = [
+            {k: v for k, v in p.items() if k != "id"} for p in public_players
+        ]
 
         # Get the Coup game to check for pending actions
-        coup_game = self.get_coup_game(room_code)
         pending_info = {}
         if coup_game:
             pending_info = {
@@ -262,25 +228,181 @@ class GameManager:
                 "pending_counteraction": coup_game.pending_counteraction,
             }
 
-        return {
+        legal_moves = coup_game.get_legal_moves() if coup_game else {}
+
+        # The cards drawn for an exchange are only shown to the exchanging player
+        last_action = public_last_action = game.last_action
+        if last_action and "cards" in last_action:
+            public_last_action = {k: v for k, v in last_action.items() if k != "cards"}
+        exchanging = coup_game.pending_exchange if coup_game else None
+        private_last_actions = (
+            {exchanging: last_action}
+            if exchanging and public_last_action is not last_action
+            else {}
+        )
+
+        current_player = game.get_current_player()
+        view = {
             "room_code": game.room_code,
             "status": game.status,
-            "players": other_players,
+            "players": public_players,
             "current_player_index": game.current_player_index,
-            "current_player": (
-                game.players[game.current_player_index].name if game.players else None
-            ),
-            "is_your_turn": (
-                game.players[game.current_player_index].id == player_id
-                if game.players
-                else False
-            ),
+            "current_player": current_player.name if current_player else None,
+            "is_your_turn": False,
             "turn_number": game.turn_number,
-            "last_action": game.last_action,
+            "version": game.version,
+            "last_action": public_last_action,
             "cards_left": len(game.deck),
             **pending_info,
         }
 
+        # Pre-encode everything except the per-player fields
+        shared = {k: v for k, v in view.items() if k not in ("players", "is_your_turn")}
+        encoded_head = json.dumps(shared)[:-1]
+        encoded_players = [json.dumps(p) for p in public_players]
+        public_view = {
+            "version": game.version,
+            "view": view,
+            "index": {p.id: i for i, p in enumerate(game.players)},
+            "private_players": private_players,
+            "encoded_private_players": {
+                player_id: json.dumps(player_info)
+                for player_id, player_info in private_players.items()
+            },
+            "encoded_head": encoded_head,
+            "private_last_actions": private_last_actions,
+            "encoded_private_heads": {
+                player_id: json.dumps({**shared, "last_action": action})[:-1]
+                for player_id, action in private_last_actions.items()
+            },
+            "encoded_players": encoded_players,
+            "spectator_view": {**view, "players": spectator_players},
+            "encoded_view": self._encode_view(
+                encoded_head, [json.dumps(p) for p in spectator_players], False
+            ),
+            "legal_moves": legal_moves,
+            "encoded_legal_moves": {
+                player_id: json.dumps(moves) for player_id, moves in legal_moves.items()
+            },
+            "current_player_id": current_player.id if current_player else None,
+        }
+
+        if coup_game:
+            coup_game.public_view_cache = public_view
+        return public_view
+
+    @traced()
+    def get_player_view(self, room_code: str, player_id: str) -> dict:
+        """Get a view of the game state for a specific player"""
+        start = time.perf_counter()
+        public_view = self._get_public_view(room_code)
+        if not public_view:
+            return {"error": "Game not found"}
+
+        index = public_view["index"].get(player_id)
+        if index is None:
+            return {"error": "Player not found"}
+
+        # Overlay the requesting player's own hand on the shared view
+        view = dict(public_view["view"])
+        view["players"] = list(view["players"])
+        view["players"][index] = public_view["private_players"][player_id]
+        view["is_your_turn"] = public_view["current_player_id"] == player_id
+        if player_id in public_view["private_last_actions"]:
+            view["last_action"] = public_view["private_last_actions"][player_id]
+        view["legal_moves"] = public_view["legal_moves"].get(player_id, [])
+        PLAYER_VIEW_SECONDS.observe(time.perf_counter() - start, "dict")
+        return view
+
+    @traced()
+    def get_encoded_player_view(self, room_code: str, player_id: str) -> str:
+        """Get a player's view of the game state as a JSON string"""
+        start = time.perf_counter()
+        public_view = self._get_public_view(room_code)
+        if not public_view:
+            return json.dumps({"error": "Game not found"})
+
+        index = public_view["index"].get(player_id)
+        if index is None:
+            return json.dumps({"error": "Player not found"})
+
+        # Splice the player's own (pre-encoded) entry into the shared fragments
+        players = list(public_view["encoded_players"])
+        players[index] = public_view["encoded_private_players"][player_id]
+        is_your_turn = public_view["current_player_id"] == player_id
+        encoded_view = self._encode_view(
+            public_view["encoded_private_heads"].get(
+                player_id, public_view["encoded_head"]
+            ),
+            players,
+            is_your_turn,
+            public_view["encoded_legal_moves"].get(player_id, "[]"),
+        )
+        PLAYER_VIEW_SECONDS.observe(time.perf_counter() - start, "json")
+        return encoded_view
+
+    @staticmethod
+    def public_result(result: Dict) -> Dict:
+        """
+        An action result as everyone may see it, without the cards drawn for
+        an exchange (the exchanging player has them in their game state)
+        """
+        public = {k: v for k, v in result.items() if k != "cards"}
+        if isinstance(result.get("action_result"), dict):
+            public["action_result"] = GameManager.public_result(result["action_result"])
+        return public
+
+    def get_spectator_view(self, room_code: str) -> dict:
+        """Get a view of the game state with every player's cards hidden"""
+        public_view = self._get_public_view(room_code)
+        if not public_view:
+            return {"error": "Game not found"}
+        return dict(public_view["spectator_view"])
+
+    @traced()
+    def get_encoded_spectator_view(self, room_code: str) -> str:
+        """Get the spectator view of the game state as a JSON string"""
+        public_view = self._get_public_view(room_code)
+        if not public_view:
+            return json.dumps({"error": "Game not found"})
+        return public_view["encoded_view"]
+
+    async def wait_for_version(
+        self, room_code: str, after_version: int, timeout: float
+    ) -> bool:
+        """Wait until a game's state version is past after_version"""
+        coup_game = self.get_coup_game(room_code)
+        if not coup_game:
+            return False
+        return await coup_game.wait_for_version(after_version, timeout)
+
+    def get_legal_moves(self, room_code: str, player_id: str) -> List[Dict]:
+        """Get the legal moves of a player, for bots and simulations"""
+        coup_game = self.get_coup_game(room_code)
+        if not coup_game:
+            return []
+        return coup_game.get_legal_moves().get(player_id, [])
+
+    @staticmethod
+    def _encode_view(
+        encoded_head: str,
+        players: List[str],
+        is_your_turn: bool,
+        legal_moves: Optional[str] = None,
+    ) -> str:
+        """Join pre-encoded view fragments into a JSON object"""
+        parts = [
+            encoded_head,
+            ', "players": [',
+            ", ".join(players),
+            '], "is_your_turn": ',
+            "true" if is_your_turn else "false",
+        ]
+        if legal_moves is not None:
+            parts += [', "legal_moves": ', legal_moves]
+        parts.append("}")
+        return "".join(parts)
+
 
 # Create a singleton instance
 manager = GameManager()
@@ -0,0 +1,39 @@
+from typing import Optional
+
+
+class GameObserver:
+    """
+    Receives the events of the games it is attached to, as they happen.
+    Override the events you need; replayed games have no observers, so
+    nothing is counted twice.
+    """
+
+    def on_game_start(self, coup_game) -> None:
+        """The cards were dealt"""
+
+    def on_claim(self, coup_game, player_id: str, character: str, honest: bool) -> None:
+        """A player claimed a character, for an action or a block"""
+
+    def on_challenge(
+        self,
+        coup_game,
+        challenger_id: str,
+        claimant_id: str,
+        character: str,
+        successful: bool,
+    ) -> None:
+        """A claim was challenged, successful if the claimant was bluffing"""
+
+    def on_action(
+        self,
+        coup_game,
+        player_id: str,
+        action_type: str,
+        coins_delta: int,
+        target_id: Optional[str],
+        target_coins_delta: int,
+    ) -> None:
+        """An action went through, with the coins it moved"""
+
+    def on_game_over(self, coup_game, winner_id: Optional[str]) -> None:
+        """Only one player is left"""
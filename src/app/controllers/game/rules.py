@@ -0,0 +1,197 @@
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel, Field
+from app.models.room import RoomVariation
+
+# Define Coup-specific constants
+CHARACTERS = ["duke", "assassin", "captain", "ambassador", "contessa"]
+COPIES_PER_CHARACTER = 3
+STARTING_COINS = 2
+CARDS_PER_PLAYER = 2
+
+# Define action costs
+COUP_COST = 7
+ASSASSINATE_COST = 3
+
+# A player with this many coins must coup
+FORCED_COUP_COINS = 10
+
+
+# Define actions
+class ActionType:
+    INCOME = "income"
+    FOREIGN_AID = "foreign_aid"
+    COUP = "coup"
+    TAX = "tax"  # Duke action
+    ASSASSINATE = "assassinate"  # Assassin action
+    STEAL = "steal"  # Captain action
+    EXCHANGE = "exchange"  # Ambassador action
+
+    # Counteractions
+    BLOCK_FOREIGN_AID = "block_foreign_aid"  # Duke
+    BLOCK_ASSASSINATION = "block_assassination"  # Contessa
+    BLOCK_STEALING = "block_stealing"  # Captain or Ambassador
+
+    # Challenge
+    CHALLENGE = "challenge"
+
+
+# Define what an action does once it goes through
+class Effect:
+    GAIN_COINS = "gain_coins"  # Take `amount` coins from the bank
+    LOSE_CARD = "lose_card"  # Target loses a card
+    STEAL_COINS = "steal_coins"  # Take up to `amount` coins from the target
+    EXCHANGE_CARDS = "exchange_cards"  # Draw `amount` cards and choose which to keep
+
+
+class ActionRule(BaseModel):
+    action_type: str
+    name: str  # Used in messages, e.g. "foreign aid"
+    effect: str
+    amount: int = 0
+    # Coins paid when the action takes effect
+    cost: int = 0
+    # Character claimed to take the action, claims can be challenged
+    claimed_character: Optional[str] = None
+    # Map of counter type -> characters that may be claimed to block the action
+    blocked_by: Dict[str, List[str]] = Field(default_factory=dict)
+    # Only the target may block, otherwise anyone but the acting player can
+    target_blocks_only: bool = False
+    requires_target: bool = False
+    target_needs_coins: bool = False
+    # Formatted with player, target and amount
+    message: str
+
+    @property
+    def challengeable(self) -> bool:
+        return self.claimed_character is not None
+
+    @property
+    def blockable(self) -> bool:
+        return bool(self.blocked_by)
+
+
+class RuleSet:
+    """
+    A table of action rules compiled into lookup structures, so validating
+    and applying an action is a dict lookup instead of a chain of branches.
+    """
+
+    def __init__(
+        self,
+        actions: List[ActionRule],
+        characters: List[str] = CHARACTERS,
+        copies_per_character: int = COPIES_PER_CHARACTER,
+        starting_coins: int = STARTING_COINS,
+        cards_per_player: int = CARDS_PER_PLAYER,
+        forced_action: str = ActionType.COUP,
+        forced_action_coins: int = FORCED_COUP_COINS,
+    ):
+        self.actions: Dict[str, ActionRule] = {
+            rule.action_type: rule for rule in actions
+        }
+        # Map of (action_type, counter_type) -> characters that may block
+        self.blocks: Dict[Tuple[str, str], List[str]] = {
+            (rule.action_type, counter_type): characters
+            for rule in actions
+            for counter_type, characters in rule.blocked_by.items()
+        }
+        self.deck: List[str] = [
+            character for character in characters for _ in range(copies_per_character)
+        ]
+        self.starting_coins = starting_coins
+        self.cards_per_player = cards_per_player
+        self.forced_action = forced_action
+        self.forced_action_coins = forced_action_coins
+
+    def get_action(self, action_type: Optional[str]) -> Optional[ActionRule]:
+        """Get the rule for an action type"""
+        return self.actions.get(action_type)
+
+    def get_blockers(self, action_type: str, counter_type: str) -> List[str]:
+        """Get the characters that may block an action with a counter type"""
+        return self.blocks.get((action_type, counter_type), [])
+
+
+STANDARD_ACTIONS = [
+    ActionRule(
+        action_type=ActionType.INCOME,
+        name="income",
+        effect=Effect.GAIN_COINS,
+        amount=1,
+        message="Player {player} took income",
+    ),
+    ActionRule(
+        action_type=ActionType.FOREIGN_AID,
+        name="foreign aid",
+        effect=Effect.GAIN_COINS,
+        amount=2,
+        blocked_by={ActionType.BLOCK_FOREIGN_AID: ["duke"]},
+        message="Player {player} took foreign aid ({amount} coins)",
+    ),
+    ActionRule(
+        action_type=ActionType.COUP,
+        name="coup",
+        effect=Effect.LOSE_CARD,
+        cost=COUP_COST,
+        requires_target=True,
+        message="Player {player} performed a coup against {target}",
+    ),
+    ActionRule(
+        action_type=ActionType.TAX,
+        name="tax",
+        effect=Effect.GAIN_COINS,
+        amount=3,
+        claimed_character="duke",
+        message="Player {player} took tax ({amount} coins)",
+    ),
+    ActionRule(
+        action_type=ActionType.ASSASSINATE,
+        name="assassination",
+        effect=Effect.LOSE_CARD,
+        cost=ASSASSINATE_COST,
+        claimed_character="assassin",
+        blocked_by={ActionType.BLOCK_ASSASSINATION: ["contessa"]},
+        target_blocks_only=True,
+        requires_target=True,
+        message="Player {player} assassinated {target}",
+    ),
+    ActionRule(
+        action_type=ActionType.STEAL,
+        name="stealing",
+        effect=Effect.STEAL_COINS,
+        amount=2,
+        claimed_character="captain",
+        blocked_by={ActionType.BLOCK_STEALING: ["captain", "ambassador"]},
+        target_blocks_only=True,
+        requires_target=True,
+        target_needs_coins=True,
+        message="Player {player} stole {amount} coins from {target}",
+    ),
+    ActionRule(
+        action_type=ActionType.EXCHANGE,
+        name="exchange",
+        effect=Effect.EXCHANGE_CARDS,
+        amount=2,
+        claimed_character="ambassador",
+        message="Player {player} is exchanging cards",
+    ),
+]
+
+STANDARD_RULES = RuleSet(STANDARD_ACTIONS)
+
+# Map of room variation -> rules, variations without their own table use the standard rules
+RULES_BY_VARIATION: Dict[str, RuleSet] = {
+    RoomVariation.COUP_O_CLOCK: STANDARD_RULES,
+    RoomVariation.COUP_PAST_COUP: STANDARD_RULES,
+    RoomVariation.COUP_THIRTY: STANDARD_RULES,
+}
+
+
+def register_rules(variation: str, rules: RuleSet) -> None:
+    """Plug in the rule table for a room variation"""
+    RULES_BY_VARIATION[variation] = rules
+
+
+def get_rules(variation: Optional[str]) -> RuleSet:
+    """Get the rule table for a room variation"""
+    return RULES_BY_VARIATION.get(variation, STANDARD_RULES)
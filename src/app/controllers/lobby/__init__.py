@@ -0,0 +1,3 @@
+from app.controllers.lobby.lobby_index import manager
+
+__all__ = ["manager"]
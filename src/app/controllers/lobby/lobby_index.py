@@ -0,0 +1,173 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+import bisect
+import heapq
+import itertools
+
+from app.models.game import GameStatus
+from app.models.lobby import LobbyPage, LobbyRoom
+from app.models.room import MAX_TABLE_SIZE, RoomVariation
+
+# Most rooms returned by one listing page
+MAX_PAGE_SIZE = 100
+
+
+class _Bucket:
+    """
+    Rooms sharing a (status, variation, free seats) key, ordered by when they
+    entered the bucket. Sequence numbers only grow, so adding is an append,
+    and a cursor is found with a binary search. Removed rooms are skipped
+    lazily and compacted away once they make up half the bucket.
+    """
+
+    def __init__(self):
+        self.seqs: List[int] = []
+        self.codes: List[str] = []
+        # Map of room_code -> sequence number, for rooms still in the bucket
+        self.live: Dict[str, int] = {}
+
+    def add(self, room_code: str, seq: int) -> None:
+        self.seqs.append(seq)
+        self.codes.append(room_code)
+        self.live[room_code] = seq
+
+    def remove(self, room_code: str) -> None:
+        self.live.pop(room_code, None)
+        if len(self.seqs) > 2 * len(self.live):
+            self._compact()
+
+    def iter_after(self, seq: int) -> Iterator[Tuple[int, str]]:
+        """Iterate over the rooms that entered the bucket after a sequence number"""
+        start = bisect.bisect_right(self.seqs, seq)
+        for i in range(start, len(self.seqs)):
+            room_code = self.codes[i]
+            if self.live.get(room_code) == self.seqs[i]:
+                yield self.seqs[i], room_code
+
+    def _compact(self) -> None:
+        pairs = [
+            (seq, code)
+            for seq, code in zip(self.seqs, self.codes)
+            if self.live.get(code) == seq
+        ]
+        self.seqs = [seq for seq, _ in pairs]
+        self.codes = [code for _, code in pairs]
+
+
+class LobbyIndex:
+    """
+    Index of open rooms, kept up to date as players connect, leave and get
+    ready and as games start and finish, so listing a page never scans every room.
+    """
+
+    def __init__(self):
+        # Map of room_code -> lobby entry
+        self.rooms: Dict[str, LobbyRoom] = {}
+        # Map of room_code -> (bucket key, sequence number)
+        self.room_keys: Dict[str, Tuple[Tuple[str, str, int], int]] = {}
+        # Map of (status, variation, free seats) -> bucket
+        self.buckets: Dict[Tuple[str, str, int], _Bucket] = {}
+        self._seq = itertools.count(1)
+
+    def add_room(
+        self,
+        room_code: str,
+        variation: str = RoomVariation.COUP_O_CLOCK,
+        max_players: int = MAX_TABLE_SIZE,
+    ) -> LobbyRoom:
+        """Add a new room to the lobby"""
+        if room_code in self.rooms:
+            return self.rooms[room_code]
+
+        room = LobbyRoom(code=room_code, variation=variation, max_players=max_players)
+        self.rooms[room_code] = room
+        self._index(room)
+        return room
+
+    def remove_room(self, room_code: str) -> None:
+        """Remove a room from the lobby"""
+        if room_code not in self.rooms:
+            return
+        self._unindex(room_code)
+        del self.rooms[room_code]
+
+    def get_room(self, room_code: str) -> Optional[LobbyRoom]:
+        """Get the lobby entry of a room"""
+        return self.rooms.get(room_code)
+
+    def update_room(
+        self,
+        room_code: str,
+        players: Optional[int] = None,
+        ready_players: Optional[int] = None,
+        status: Optional[GameStatus] = None,
+    ) -> None:
+        """Update a room's entry, moving it to another bucket if its key changed"""
+        room = self.rooms.get(room_code)
+        if not room:
+            return
+
+        if players is not None:
+            room.players = players
+        if ready_players is not None:
+            room.ready_players = ready_players
+        if status is not None:
+            room.status = status
+
+        if self._key(room) != self.room_keys[room_code][0]:
+            self._unindex(room_code)
+            self._index(room)
+
+    def list_rooms(
+        self,
+        status: Optional[GameStatus] = GameStatus.WAITING,
+        variation: Optional[str] = None,
+        min_free_seats: int = 1,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+    ) -> LobbyPage:
+        """
+        List rooms matching the filters, oldest first. Pass the returned
+        next_cursor to get the following page.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        after = int(cursor) if cursor else 0
+
+        # Merge the matching buckets by sequence number, starting after the cursor
+        streams = [
+            bucket.iter_after(after)
+            for (
+                bucket_status,
+                bucket_variation,
+                free_seats,
+            ), bucket in self.buckets.items()
+            if (status is None or bucket_status == status)
+            and (variation is None or bucket_variation == variation)
+            and free_seats >= min_free_seats
+        ]
+        page = list(itertools.islice(heapq.merge(*streams), limit + 1))
+
+        rooms = [self.rooms[room_code] for _, room_code in page[:limit]]
+        next_cursor = str(page[limit - 1][0]) if len(page) > limit else None
+        return LobbyPage(rooms=rooms, next_cursor=next_cursor)
+
+    def _key(self, room: LobbyRoom) -> Tuple[str, str, int]:
+        return (room.status, room.variation, room.free_seats)
+
+    def _index(self, room: LobbyRoom) -> None:
+        key = self._key(room)
+        seq = next(self._seq)
+        if key not in self.buckets:
+            self.buckets[key] = _Bucket()
+        self.buckets[key].add(room.code, seq)
+        self.room_keys[room.code] = (key, seq)
+
+    def _unindex(self, room_code: str) -> None:
+        key, _ = self.room_keys.pop(room_code)
+        bucket = self.buckets[key]
+        bucket.remove(room_code)
+        if not bucket.live:
+            del self.buckets[key]
+
+
+# Create a singleton instance
+manager = LobbyIndex()
@@ -0,0 +1,4 @@
+from app.controllers.loop_lag.probe import probe
+from app.controllers.loop_lag.stall_monitor import monitor
+
+__all__ = ["probe", "monitor"]
@@ -0,0 +1,63 @@
+from typing import Optional
+import asyncio
+import os
+
+from app.controllers.metrics import LOOP_LAG_SECONDS
+
+# Seconds between probes
+PROBE_INTERVAL = 0.1
+# Weight of the newest sample in the smoothed lag
+SMOOTHING = 0.2
+
+
+class LoopLagProbe:
+    """
+    Measures how late the event loop runs a timer. A task sleeps for a fixed
+    interval and records how much longer than that it actually took, which
+    is how long ready callbacks (message handlers) kept the loop busy.
+    One timer per interval, so the probe itself costs next to nothing.
+    """
+
+    def __init__(self, interval: float = PROBE_INTERVAL, smoothing: float = SMOOTHING):
+        self.interval = interval
+        self.smoothing = smoothing
+        # Seconds of lag of the last probe, and exponentially smoothed over recent probes
+        self.last_lag = 0.0
+        self.lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, lag: float) -> None:
+        """Add a lag sample"""
+        self.last_lag = lag
+        self.lag += self.smoothing * (lag - self.lag)
+        LOOP_LAG_SECONDS.observe(lag)
+
+    async def run(self) -> None:
+        """Probe the loop until cancelled"""
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, loop.time() - start - self.interval))
+
+    def start(self) -> None:
+        """Start probing"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop probing"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+# Create a singleton instance
+probe = LoopLagProbe(
+    interval=float(os.getenv("LOOP_LAG_PROBE_INTERVAL_SECONDS", str(PROBE_INTERVAL)))
+)
@@ -0,0 +1,143 @@
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+from app.controllers.metrics import LOOP_STALL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Seconds the loop may take to run a ping before it counts as stalled
+STALL_THRESHOLD = 0.1
+# Seconds between pings
+CHECK_INTERVAL = 0.05
+# App frames of the stalled stack shown in the log
+LOGGED_FRAMES = 5
+
+_APP_DIR = os.sep + "app" + os.sep
+
+
+class StallMonitor:
+    """
+    Finds out who blocks the event loop. A watchdog thread pings the loop
+    every interval; when a ping isn't run within the threshold, the loop is
+    stuck in some synchronous code right now, so the watchdog captures the
+    loop thread's stack and the labels of the task that is running (message
+    and action type and room, set by the message dispatch). Once the loop
+    recovers, the stall is logged and recorded, from the loop, in the metrics.
+    The loop only runs one extra callback per interval.
+    """
+
+    def __init__(
+        self, threshold: float = STALL_THRESHOLD, interval: float = CHECK_INTERVAL
+    ):
+        self.threshold = threshold
+        self.interval = interval
+        # Map of task -> labels of what the task is handling
+        self.annotations: Dict[asyncio.Task, Dict[str, str]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def annotate(self, **labels: str) -> None:
+        """Label what the current task is handling, for stalls it causes"""
+        task = asyncio.current_task()
+        if task is not None:
+            self.annotations.setdefault(task, {}).update(labels)
+
+    def clear(self) -> None:
+        """Forget the current task's labels once it is done handling"""
+        task = asyncio.current_task()
+        if task is not None:
+            self.annotations.pop(task, None)
+
+    def start(self) -> None:
+        """Start watching the running loop"""
+        if self._thread is not None or self.threshold <= 0:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._watch, name="loop-stall-monitor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop watching"""
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join(timeout=self.threshold + self.interval)
+        self._thread = None
+
+    def _watch(self) -> None:
+        """Ping the loop and catch it in the act when a ping is late"""
+        while not self._stopped.is_set():
+            ran = threading.Event()
+            start = time.perf_counter()
+            try:
+                self._loop.call_soon_threadsafe(ran.set)
+            except RuntimeError:
+                # The loop is closed
+                return
+
+            if not ran.wait(self.threshold):
+                culprit = self._capture()
+                while not ran.wait(self.interval):
+                    if self._stopped.is_set():
+                        return
+                duration = time.perf_counter() - start
+                try:
+                    self._loop.call_soon_threadsafe(self._record, duration, culprit)
+                except RuntimeError:
+                    return
+
+            self._stopped.wait(self.interval)
+
+    def _capture(self) -> Dict:
+        """Describe what the loop thread is doing, from the watchdog thread"""
+        task = asyncio.current_task(self._loop)
+        labels = dict(self.annotations.get(task, {})) if task else {}
+        if "message_type" in labels:
+            handler = labels["message_type"]
+            if labels.get("action_type"):
+                handler += "/" + labels["action_type"]
+        elif task is not None:
+            handler = task.get_coro().__qualname__
+        else:
+            handler = "callback"
+
+        frame = sys._current_frames().get(self._loop_thread_id)
+        frames = traceback.extract_stack(frame) if frame else []
+        app_frames = [f for f in frames if _APP_DIR in f.filename]
+        return {
+            "handler": handler,
+            "room_code": labels.get("room_code"),
+            "stack": [
+                f"{f.name} ({os.path.basename(f.filename)}:{f.lineno})"
+                for f in app_frames[-LOGGED_FRAMES:]
+            ],
+        }
+
+    def _record(self, duration: float, culprit: Dict) -> None:
+        """Log and count a stall, on the loop"""
+        LOOP_STALL_SECONDS.observe(duration, culprit["handler"])
+        stack: List[str] = culprit["stack"]
+        logger.warning(
+            f"Event loop blocked for {duration * 1000:.0f} ms by {culprit['handler']}"
+            + (f" in room {culprit['room_code']}" if culprit["room_code"] else "")
+            + (f" at {' <- '.join(reversed(stack))}" if stack else "")
+        )
+
+
+# Create a singleton instance
+monitor = StallMonitor(
+    threshold=float(os.getenv("LOOP_STALL_THRESHOLD_MS", "100")) / 1000,
+    interval=float(os.getenv("LOOP_STALL_CHECK_INTERVAL_MS", "50")) / 1000,
+)
@@ -0,0 +1,3 @@
+from app.controllers.matchmaking.matchmaker import manager
+
+__all__ = ["manager"]
@@ -0,0 +1,240 @@
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+from collections import OrderedDict, deque
+from urllib.parse import quote
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+import uuid
+
+from app.controllers.room_codes import manager as room_code_manager
+from app.controllers.room_codes import router as room_router
+from app.models.matchmaking import (
+    MAX_TABLE_SIZE,
+    MIN_TABLE_SIZE,
+    MatchmakingRequest,
+    MatchmakingTicket,
+    TicketStatus,
+)
+
+logger = logging.getLogger(__name__)
+
+# Seconds between batching passes
+BATCH_INTERVAL = 1.0
+# Seconds a player waits before accepting a table one seat smaller than they asked for
+RELAX_INTERVAL = 15.0
+# Seconds a matched ticket (and its room code) is kept for the player to pick up
+MATCHED_TICKET_TTL = 120.0
+
+
+class Matchmaker:
+    """
+    Queue of players waiting for a table, bucketed by variation and desired
+    table size. Each bucket is an insertion-ordered dict of ticket IDs, and
+    since players join in time order it is also ordered by wait time, so
+    joining, leaving and taking the longest-waiting players are all O(1).
+    Relaxed tables merge the buckets that accept them by wait time, popping
+    players off the buckets' heads instead of scanning the buckets. With
+    several workers, matched rooms get codes owned by each worker in turn,
+    so their players are sent there.
+    """
+
+    def __init__(
+        self,
+        relax_interval: float = RELAX_INTERVAL,
+        matched_ticket_ttl: float = MATCHED_TICKET_TTL,
+        clock=time.monotonic,
+    ):
+        self.relax_interval = relax_interval
+        self.matched_ticket_ttl = matched_ticket_ttl
+        self.clock = clock
+        # Map of ticket_id -> ticket
+        self.tickets: Dict[str, MatchmakingTicket] = {}
+        # Map of (variation, table_size) -> queued ticket IDs, longest waiting first
+        self.buckets: Dict[Tuple[str, int], "OrderedDict[str, None]"] = {}
+        # (matched time, ticket_id) of matched tickets, oldest first
+        self.matched: Deque[Tuple[float, str]] = deque()
+        # Map of room_code -> number of matched tickets not yet expired
+        self.reserved_codes: Dict[str, int] = {}
+        # Worker the next matched room goes to
+        self.next_worker = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def join(self, request: MatchmakingRequest) -> MatchmakingTicket:
+        """Add a player to the queue and return their ticket"""
+        ticket = MatchmakingTicket(
+            id=str(uuid.uuid4()),
+            player_name=request.player_name,
+            variation=request.variation,
+            table_size=request.table_size,
+            joined_at=self.clock(),
+        )
+        self.tickets[ticket.id] = ticket
+
+        key = (ticket.variation, ticket.table_size)
+        if key not in self.buckets:
+            self.buckets[key] = OrderedDict()
+        self.buckets[key][ticket.id] = None
+
+        return ticket
+
+    def leave(self, ticket_id: str) -> bool:
+        """Remove a queued player from the queue"""
+        ticket = self.tickets.get(ticket_id)
+        if not ticket or ticket.status != TicketStatus.QUEUED:
+            return False
+
+        self.buckets[(ticket.variation, ticket.table_size)].pop(ticket_id, None)
+        ticket.status = TicketStatus.CANCELLED
+        del self.tickets[ticket_id]
+        return True
+
+    def get_ticket(self, ticket_id: str) -> Optional[MatchmakingTicket]:
+        """Get a ticket, with its room once matched"""
+        return self.tickets.get(ticket_id)
+
+    def is_code_reserved(self, room_code: str) -> bool:
+        """Check if a room code was handed out to matched players"""
+        return room_code in self.reserved_codes
+
+    def get_queue_size(self) -> int:
+        """Get the number of players waiting"""
+        return sum(len(bucket) for bucket in self.buckets.values())
+
+    def form_matches(self) -> List[List[MatchmakingTicket]]:
+        """
+        Seat waiting players at tables. Full tables of the size players asked
+        for are formed first, then players who waited long enough are seated
+        at smaller tables, one seat less per relax interval waited.
+        """
+        now = self.clock()
+        tables = []
+        variations = {variation for variation, _ in self.buckets}
+
+        for variation in variations:
+            # Exact matches first
+            for size in range(MAX_TABLE_SIZE, MIN_TABLE_SIZE - 1, -1):
+                bucket = self.buckets.get((variation, size))
+                while bucket and len(bucket) >= size:
+                    tables.append(self._seat(list(itertools.islice(bucket, size)), now))
+
+            # Then relaxed matches for players who waited long enough
+            for size in range(MAX_TABLE_SIZE - 1, MIN_TABLE_SIZE - 1, -1):
+                while True:
+                    candidates = self._relaxed_candidates(variation, size, now)
+                    if len(candidates) < size:
+                        break
+                    tables.append(self._seat(candidates, now))
+
+        self._expire_matched(now)
+        return tables
+
+    def _relaxed_candidates(self, variation: str, size: int, now: float) -> List[str]:
+        """
+        Pick up to size of the longest-waiting tickets that accept a table of
+        this size. Every bucket is ordered by wait time, so the eligible heads
+        of the buckets are merged through a heap and only the tickets picked
+        (plus one per bucket) are looked at.
+        """
+        heads: List[Tuple] = []
+        for desired_size in range(size, MAX_TABLE_SIZE + 1):
+            bucket = self.buckets.get((variation, desired_size))
+            if bucket:
+                required_wait = (desired_size - size) * self.relax_interval
+                self._push_head(heads, iter(bucket), required_wait, now)
+
+        picked = []
+        while heads and len(picked) < size:
+            _, ticket_id, tickets, required_wait = heapq.heappop(heads)
+            picked.append(ticket_id)
+            self._push_head(heads, tickets, required_wait, now)
+        return picked
+
+    def _push_head(
+        self,
+        heads: List[Tuple],
+        tickets: Iterator[str],
+        required_wait: float,
+        now: float,
+    ) -> None:
+        """Push a bucket's next ticket on the heap, unless it hasn't waited enough"""
+        ticket_id = next(tickets, None)
+        if ticket_id is None:
+            return
+        ticket = self.tickets[ticket_id]
+        # The tickets after it joined later, so the bucket is done for this size
+        if now - ticket.joined_at < required_wait:
+            return
+        heapq.heappush(heads, (ticket.joined_at, ticket_id, tickets, required_wait))
+
+    def _seat(self, ticket_ids: List[str], now: float) -> List[MatchmakingTicket]:
+        """Take tickets out of the queue and give them a room"""
+        # The code stays held until every matched ticket has expired
+        room_code = self._allocate_code()
+        self.reserved_codes[room_code] = len(ticket_ids)
+
+        tickets = []
+        for ticket_id in ticket_ids:
+            ticket = self.tickets[ticket_id]
+            self.buckets[(ticket.variation, ticket.table_size)].pop(ticket_id, None)
+            ticket.status = TicketStatus.MATCHED
+            ticket.room_code = room_code
+            ticket.connect_path = (
+                f"/ws/room/{room_code}?player_name={quote(ticket.player_name)}"
+                f"&variation={quote(ticket.variation)}"
+            )
+            self.matched.append((now, ticket_id))
+            tickets.append(ticket)
+
+        logger.info(f"Matched {len(tickets)} players into room {room_code}")
+        return tickets
+
+    def _allocate_code(self) -> str:
+        """Get a code for a matched room, owned by the next worker in turn"""
+        if not room_router.enabled:
+            return room_code_manager.allocate()
+        worker_id = self.next_worker
+        self.next_worker = (worker_id + 1) % room_code_manager.workers
+        return room_code_manager.allocate_for(worker_id)
+
+    def _expire_matched(self, now: float) -> None:
+        """Forget matched tickets nobody picked up in time"""
+        while self.matched and self.matched[0][0] + self.matched_ticket_ttl < now:
+            _, ticket_id = self.matched.popleft()
+            ticket = self.tickets.pop(ticket_id, None)
+            if not ticket:
+                continue
+            self.reserved_codes[ticket.room_code] -= 1
+            if not self.reserved_codes[ticket.room_code]:
+                del self.reserved_codes[ticket.room_code]
+                room_code_manager.release(ticket.room_code)
+
+    async def run(self, interval: float = BATCH_INTERVAL) -> None:
+        """Form matches periodically"""
+        while True:
+            try:
+                self.form_matches()
+            except Exception as e:
+                logger.error(f"Error forming matches: {str(e)}")
+            await asyncio.sleep(interval)
+
+    def start(self) -> None:
+        """Start the periodic batcher"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop the periodic batcher"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+# Create a singleton instance
+manager = Matchmaker()
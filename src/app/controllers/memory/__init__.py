@@ -0,0 +1,4 @@
+from app.controllers.memory.allocation_tracker import tracker
+from app.controllers.memory.room_memory import manager
+
+__all__ = ["manager", "tracker"]
@@ -0,0 +1,155 @@
+from typing import Dict, List, Optional
+import os
+import sysconfig
+import time
+import tracemalloc
+
+# Frames kept per traced allocation, enough to reach app code from library internals
+TRACE_FRAMES = 25
+# Allocation sites listed per subsystem
+TOP_SITES = 5
+
+_APP_DIR = os.sep + "app" + os.sep
+_SITE_PACKAGES = os.sep + "site-packages" + os.sep
+_STDLIB_DIR = sysconfig.get_paths()["stdlib"] + os.sep
+
+
+def subsystem_of(filename: str) -> str:
+    """
+    Name the part of the server a source file belongs to, e.g.
+    controllers.game, or the library it comes from
+    """
+    if _APP_DIR in filename:
+        parts = filename.rsplit(_APP_DIR, 1)[1].split(os.sep)
+        if parts[0] == "controllers" and len(parts) > 2:
+            return f"controllers.{parts[1]}"
+        return parts[0] if len(parts) > 1 else "app"
+    if _SITE_PACKAGES in filename:
+        library = filename.rsplit(_SITE_PACKAGES, 1)[1].split(os.sep)[0]
+        return f"library.{library.removesuffix('.py')}"
+    return "python"
+
+
+def short_path(filename: str) -> str:
+    """Path of a source file from the app, site-packages or stdlib directory"""
+    for root in (_APP_DIR, _SITE_PACKAGES):
+        if root in filename:
+            return filename.rsplit(root, 1)[1]
+    if filename.startswith(_STDLIB_DIR):
+        return os.path.relpath(filename, _STDLIB_DIR)
+    return filename
+
+
+class AllocationTracker:
+    """
+    Differential allocation snapshots with tracemalloc. Taking a baseline
+    starts tracing (which slows every allocation down, so it stays off until
+    someone asks), and a diff compares the memory allocated now to the
+    baseline. Growth is put down to the innermost app frame of each
+    allocation, so memory allocated by pydantic or json on behalf of, say,
+    the game engine counts for controllers.game.
+    """
+
+    def __init__(self, frames: int = TRACE_FRAMES):
+        self.frames = frames
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.baseline_at: Optional[float] = None
+        # Whether tracing was started here (and so is stopped here)
+        self.started_tracing = False
+
+    def take_baseline(self) -> Dict:
+        """Start tracing if needed and remember what is allocated now"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self.started_tracing = True
+        self.baseline = self._snapshot()
+        self.baseline_at = time.time()
+        return self.status()
+
+    def stop(self) -> None:
+        """Forget the baseline and stop tracing"""
+        self.baseline = None
+        self.baseline_at = None
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def status(self) -> Dict:
+        traced, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": tracemalloc.is_tracing(),
+            "frames": tracemalloc.get_traceback_limit(),
+            "baseline_at": self.baseline_at,
+            "traced_bytes": traced,
+            "peak_traced_bytes": peak,
+        }
+
+    def diff(self, limit: int = 20) -> Optional[Dict]:
+        """
+        Growth since the baseline by subsystem, the largest first, with the
+        sites that allocated the most in each. None without a baseline.
+        """
+        if self.baseline is None or not tracemalloc.is_tracing():
+            return None
+
+        groups: Dict[str, Dict] = {}
+        for stat in self._snapshot().compare_to(self.baseline, "traceback"):
+            if not stat.size_diff and not stat.count_diff:
+                continue
+            frame = self._attribute(stat.traceback)
+            subsystem = subsystem_of(frame.filename)
+            group = groups.setdefault(
+                subsystem,
+                {
+                    "subsystem": subsystem,
+                    "size_diff": 0,
+                    "count_diff": 0,
+                    "size": 0,
+                    "sites": {},
+                },
+            )
+            group["size_diff"] += stat.size_diff
+            group["count_diff"] += stat.count_diff
+            group["size"] += stat.size
+            site = f"{short_path(frame.filename)}:{frame.lineno}"
+            group["sites"][site] = group["sites"].get(site, 0) + stat.size_diff
+
+        subsystems: List[Dict] = sorted(
+            groups.values(), key=lambda group: group["size_diff"], reverse=True
+        )
+        for group in subsystems:
+            sites = sorted(group["sites"].items(), key=lambda item: -item[1])
+            group["top_sites"] = [
+                {"site": site, "size_diff": size_diff}
+                for site, size_diff in sites[:TOP_SITES]
+            ]
+            del group["sites"]
+        return {
+            **self.status(),
+            "seconds_since_baseline": time.time() - self.baseline_at,
+            "size_diff": sum(group["size_diff"] for group in subsystems),
+            "subsystems": subsystems[:limit],
+        }
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        """Take a snapshot without tracemalloc's and the import system's own memory"""
+        return tracemalloc.take_snapshot().filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+                tracemalloc.Filter(False, "<unknown>"),
+            ]
+        )
+
+    def _attribute(self, traceback: tracemalloc.Traceback) -> tracemalloc.Frame:
+        """The innermost app frame of an allocation, or the innermost frame"""
+        # Tracebacks run from the oldest frame to the most recent one
+        for frame in reversed(traceback):
+            if _APP_DIR in frame.filename:
+                return frame
+        return traceback[-1]
+
+
+# Create a singleton instance
+tracker = AllocationTracker(frames=int(os.getenv("MEMORY_TRACE_FRAMES", TRACE_FRAMES)))
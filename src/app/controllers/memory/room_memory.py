@@ -0,0 +1,303 @@
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from collections import deque
+from enum import Enum
+from fastapi import WebSocket
+import asyncio
+import os
+import sys
+import types
+
+from app.controllers.analytics import game_key
+from app.controllers.analytics import manager as analytics_manager
+from app.controllers.chat import manager as chat_manager
+from app.controllers.game import manager as game_manager
+from app.controllers.game.observer import GameObserver
+from app.controllers.game.rules import RuleSet
+from app.controllers.lobby import manager as lobby_manager
+from app.controllers.loop_lag import monitor as stall_monitor
+from app.controllers.matchmaking import manager as matchmaking_manager
+from app.controllers.migration import manager as migration_manager
+from app.controllers.room_codes import manager as room_code_manager
+from app.controllers.websockets import manager as ws_manager
+from app.controllers.websockets import spectator_manager
+from app.controllers.websockets.channel_socket import ChannelSocket
+
+try:
+    import resource
+except ImportError:  # Not on Windows, process memory is left out there
+    resource = None
+
+# Rooms listed in a report, the largest first
+MAX_REPORTED_ROOMS = 50
+# Keys listed per manager dict that outlived their room
+MAX_REPORTED_ORPHANS = 20
+
+# Objects that aren't owned by what refers to them: shared singletons, code,
+# connections and loop machinery. They are neither counted nor followed.
+_NOT_OWNED = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+    Enum,
+    RuleSet,
+    GameObserver,
+    WebSocket,
+    ChannelSocket,
+    asyncio.AbstractEventLoop,
+    asyncio.Future,
+)
+_LEAVES = (str, bytes, int, float, bool, type(None))
+
+
+def deep_sizeof(obj, seen: Set[int]) -> int:
+    """
+    Approximate bytes held by an object and everything it references, not
+    counting objects in seen (which it adds to). Strings shared with other
+    objects are counted wherever they are reached first.
+    """
+    total = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _NOT_OWNED):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, _LEAVES):
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            stack.extend(obj)
+        else:
+            instance_dict = getattr(obj, "__dict__", None)
+            if instance_dict is not None:
+                stack.append(instance_dict)
+            for cls in type(obj).__mro__:
+                for name in cls.__dict__.get("__slots__", ()):
+                    if name != "__dict__":
+                        stack.append(getattr(obj, name, None))
+    return total
+
+
+class RoomMemory:
+    """
+    Approximate memory held for each room, split by what holds it, and the
+    size of every manager dict, to find out what a growing worker is
+    keeping. A room is live while somebody is connected to it (or a migrated
+    game waits for its players); rooms and keys of room-keyed dicts that
+    outlive that are reported as orphans: they are what leaks. Sizes come
+    from walking the objects on the loop, so a report costs time
+    proportional to the memory it describes.
+    """
+
+    def __init__(self, token: Optional[str] = None):
+        # Shared secret the admin endpoints require, they are off without one
+        self.token = token
+
+    def live_rooms(self) -> Set[str]:
+        """
+        Rooms with connected players or spectators, and migrated games still
+        waiting for their players
+        """
+        return (
+            set(ws_manager.active_rooms)
+            | set(spectator_manager.room_spectators)
+            | set(migration_manager.resumable)
+        )
+
+    def orphaned_rooms(self) -> Set[str]:
+        """Rooms nobody is connected to that still hold a game or room state"""
+        return (
+            set(game_manager.games)
+            | set(chat_manager.rooms)
+            | set(lobby_manager.rooms)
+            | set(spectator_manager.buffers)
+            | set(spectator_manager.delayed_states)
+        ) - self.live_rooms()
+
+    def measure_room(self, room_code: str) -> Dict[str, int]:
+        """Bytes held for a room, by the part of the server holding them"""
+        seen: Set[int] = {id(game_manager.observers)}
+        parts = {
+            "game": (
+                game_manager.games.get(room_code),
+                game_manager.coup_games.get(room_code),
+                migration_manager.resumable.get(room_code),
+            ),
+            "players": (
+                ws_manager.active_rooms.get(room_code),
+                ws_manager.room_players.get(room_code),
+            ),
+            "spectators": (spectator_manager.room_spectators.get(room_code),),
+            "outbound": (
+                spectator_manager.buffers.get(room_code),
+                spectator_manager.delayed_states.get(room_code),
+            ),
+            "chat": (chat_manager.rooms.get(room_code),),
+            "lobby": (
+                lobby_manager.rooms.get(room_code),
+                lobby_manager.room_keys.get(room_code),
+            ),
+        }
+        sizes = {
+            part: sum(deep_sizeof(obj, seen) for obj in objs if obj is not None)
+            for part, objs in parts.items()
+        }
+        sizes["total"] = sum(sizes.values())
+        return sizes
+
+    def manager_dicts(self) -> List[Tuple[str, Dict, Optional[Callable]]]:
+        """
+        Every long-lived dict of the managers, with a check telling if an
+        entry still belongs to something alive (None when that can't go stale)
+        """
+        live = self.live_rooms()
+        sockets = set(ws_manager.connection_rooms) | set(
+            spectator_manager.spectator_rooms
+        )
+        live_games = {
+            game_key(coup_game) for coup_game in game_manager.coup_games.values()
+        }
+
+        def room(key, value):
+            return key in live
+
+        def socket(key, value):
+            return key in ws_manager.active_rooms.get(
+                value, ()
+            ) or key in spectator_manager.room_spectators.get(value, ())
+
+        return [
+            ("connections.active_rooms", ws_manager.active_rooms, room),
+            ("connections.room_players", ws_manager.room_players, room),
+            ("connections.connection_rooms", ws_manager.connection_rooms, socket),
+            (
+                "connections.player_ids",
+                ws_manager.player_ids,
+                lambda key, value: key in sockets,
+            ),
+            ("games.games", game_manager.games, room),
+            ("games.coup_games", game_manager.coup_games, room),
+            ("spectators.room_spectators", spectator_manager.room_spectators, room),
+            ("spectators.spectator_rooms", spectator_manager.spectator_rooms, socket),
+            ("spectators.buffers", spectator_manager.buffers, room),
+            ("spectators.drain_tasks", spectator_manager.drain_tasks, room),
+            (
+                "spectators.delayed_states",
+                spectator_manager.delayed_states,
+                room,
+            ),
+            ("spectators.readers", spectator_manager.readers, room),
+            ("chat.rooms", chat_manager.rooms, room),
+            ("chat.room_bytes", chat_manager.room_bytes, room),
+            ("lobby.rooms", lobby_manager.rooms, room),
+            ("lobby.room_keys", lobby_manager.room_keys, room),
+            ("lobby.buckets", lobby_manager.buckets, None),
+            ("migration.resumable", migration_manager.resumable, room),
+            ("room_codes.holds", room_code_manager.holds, None),
+            ("room_codes.released_at", room_code_manager.released_at, None),
+            ("matchmaking.tickets", matchmaking_manager.tickets, None),
+            ("matchmaking.buckets", matchmaking_manager.buckets, None),
+            ("matchmaking.reserved_codes", matchmaking_manager.reserved_codes, None),
+            (
+                "analytics.starting_hands",
+                analytics_manager.starting_hands,
+                lambda key, value: key in live_games,
+            ),
+            (
+                "loop_lag.annotations",
+                stall_monitor.annotations,
+                lambda key, value: not key.done(),
+            ),
+        ]
+
+    def measure_managers(self) -> List[Dict]:
+        """Entries, bytes and orphaned entries of every manager dict"""
+        reports = []
+        for name, entries, is_live in self.manager_dicts():
+            seen: Set[int] = {id(game_manager.observers)}
+            report = {
+                "name": name,
+                "entries": len(entries),
+                "bytes": deep_sizeof(entries, seen),
+                "orphans": None,
+                "orphan_keys": [],
+            }
+            if is_live is not None:
+                orphans = [
+                    key
+                    for key, value in list(entries.items())
+                    if not is_live(key, value)
+                ]
+                report["orphans"] = len(orphans)
+                report["orphan_keys"] = [
+                    key if isinstance(key, str) else repr(key)
+                    for key in orphans[:MAX_REPORTED_ORPHANS]
+                ]
+            reports.append(report)
+        return sorted(reports, key=lambda report: report["bytes"], reverse=True)
+
+    def report(
+        self,
+        room_codes: Optional[Iterable[str]] = None,
+        limit: int = MAX_REPORTED_ROOMS,
+    ) -> Dict:
+        """
+        Memory of the given rooms (every live room by default), the largest
+        first, with the totals over all of them, the rooms that outlived
+        their connections and the manager dicts
+        """
+        rooms = self._measure_rooms(
+            self.live_rooms() if room_codes is None else room_codes
+        )
+        totals: Dict[str, int] = {}
+        for room in rooms:
+            for part, size in room.items():
+                if part != "room_code":
+                    totals[part] = totals.get(part, 0) + size
+
+        orphans = self._measure_rooms(self.orphaned_rooms())
+        return {
+            "process": process_memory(),
+            "room_count": len(rooms),
+            "totals": totals,
+            "rooms": rooms[:limit],
+            "orphaned_room_count": len(orphans),
+            "orphaned_room_bytes": sum(room["total"] for room in orphans),
+            "orphaned_rooms": orphans[:limit],
+            "managers": self.measure_managers(),
+        }
+
+    def _measure_rooms(self, room_codes: Iterable[str]) -> List[Dict]:
+        """Measure rooms, the largest first"""
+        rooms = [
+            {"room_code": room_code, **self.measure_room(room_code)}
+            for room_code in sorted(room_codes)
+        ]
+        rooms.sort(key=lambda room: room["total"], reverse=True)
+        return rooms
+
+
+def process_memory() -> Dict[str, Optional[int]]:
+    """Resident and peak resident memory of the process, where the OS tells"""
+    if resource is None:
+        return {"rss_bytes": None, "max_rss_bytes": None}
+
+    try:
+        with open("/proc/self/statm") as statm:
+            rss = int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        rss = None
+    # Linux reports the peak in kilobytes, macOS in bytes
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        max_rss *= 1024
+    return {"rss_bytes": rss, "max_rss_bytes": max_rss}
+
+
+# Create a singleton instance
+manager = RoomMemory(token=os.getenv("MEMORY_ADMIN_TOKEN"))
@@ -0,0 +1,21 @@
+from app.controllers.metrics.registry import (
+    ADMISSION_REJECTIONS,
+    BROADCAST_BYTES,
+    BROADCAST_SECONDS,
+    LOOP_LAG_SECONDS,
+    LOOP_STALL_SECONDS,
+    MESSAGE_SECONDS,
+    PLAYER_VIEW_SECONDS,
+    registry,
+)
+
+__all__ = [
+    "registry",
+    "MESSAGE_SECONDS",
+    "BROADCAST_SECONDS",
+    "BROADCAST_BYTES",
+    "PLAYER_VIEW_SECONDS",
+    "ADMISSION_REJECTIONS",
+    "LOOP_LAG_SECONDS",
+    "LOOP_STALL_SECONDS",
+]
@@ -0,0 +1,63 @@
+from app.controllers.chat import manager as chat_manager
+from app.controllers.game import manager as game_manager
+from app.controllers.lobby import manager as lobby_manager
+from app.controllers.loop_lag import probe as loop_lag_probe
+from app.controllers.matchmaking import manager as matchmaking_manager
+from app.controllers.metrics.registry import MetricsRegistry
+from app.controllers.rooms.multiplexer import manager as mux_manager
+from app.controllers.websockets import manager as ws_manager
+from app.controllers.websockets import spectator_manager
+
+
+def register_gauges(registry: MetricsRegistry) -> None:
+    """Register gauges reading the current size of the in-memory managers"""
+    registry.gauge(
+        "coup_active_rooms",
+        "Rooms with at least one connected player",
+        lambda: len(ws_manager.active_rooms),
+    )
+    registry.gauge(
+        "coup_lobby_rooms",
+        "Rooms listed in the lobby directory",
+        lambda: len(lobby_manager.rooms),
+    )
+    registry.gauge(
+        "coup_connections",
+        "Open WebSocket connections",
+        lambda: {
+            ("player",): len(ws_manager.connection_rooms),
+            ("spectator",): len(spectator_manager.spectator_rooms),
+            ("multiplexed",): len(mux_manager.connections),
+        },
+        ["role"],
+    )
+    registry.gauge(
+        "coup_resident_games",
+        "Games held in memory",
+        lambda: len(game_manager.games),
+    )
+    registry.gauge(
+        "coup_outbound_queue_depth",
+        "Frames waiting to be sent",
+        lambda: {
+            ("spectator_delay",): sum(
+                len(buffer) for buffer in spectator_manager.buffers.values()
+            ),
+        },
+        ["queue"],
+    )
+    registry.gauge(
+        "coup_matchmaking_queue_depth",
+        "Players waiting for a table",
+        matchmaking_manager.get_queue_size,
+    )
+    registry.gauge(
+        "coup_chat_history_bytes",
+        "Encoded chat messages kept for catching up joining players",
+        chat_manager.total_bytes,
+    )
+    registry.gauge(
+        "coup_event_loop_lag_seconds",
+        "Smoothed delay of the event loop in running a timer",
+        lambda: loop_lag_probe.lag,
+    )
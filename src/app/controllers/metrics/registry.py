@@ -0,0 +1,235 @@
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+import bisect
+import math
+
+# Upper bounds (seconds) of the latency buckets, from 50µs to 10s
+LATENCY_BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# A gauge callback returns one value, or a map of label values -> value
+GaugeValue = Union[float, Dict[Tuple[str, ...], float]]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        value = value.replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Latency histogram. Each label combination gets a preallocated list of
+    bucket counts the first time it is seen, so observing a value is a
+    binary search and two additions. Everything runs on the event loop, so
+    there are no locks.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # Map of label values -> [bucket counts (last one is +Inf), sum]
+        self.series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        """Record a value"""
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for label_values, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                labels = _format_labels(
+                    self.label_names + ("le",), label_values + (bound,)
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonically increasing total"""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        # Map of label values -> total
+        self.series: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, *label_values: str) -> None:
+        """Add to the total"""
+        self.series[label_values] = self.series.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        for label_values, total in self.series.items():
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}{labels} {_format_value(total)}")
+        return lines
+
+
+class Gauge:
+    """Current value, read from a callback when the metrics are scraped"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], GaugeValue],
+        label_names: Sequence[str] = (),
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.label_names = tuple(label_names)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+        ]
+        value = self.callback()
+        values = value if isinstance(value, dict) else {(): value}
+        for label_values, current in values.items():
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}{labels} {_format_value(current)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered in the Prometheus text format"""
+
+    def __init__(self):
+        # Map of metric name -> metric, in registration order
+        self.metrics: Dict[str, Union[Histogram, Counter, Gauge]] = {}
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        """Register a histogram"""
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def counter(
+        self, name: str, documentation: str, label_names: Sequence[str] = ()
+    ) -> Counter:
+        """Register a counter"""
+        return self._register(Counter(name, documentation, label_names))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], GaugeValue],
+        label_names: Sequence[str] = (),
+    ) -> Gauge:
+        """Register a gauge, replacing any gauge of the same name"""
+        gauge = Gauge(name, documentation, callback, label_names)
+        self.metrics[name] = gauge
+        return gauge
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+
+# Create a singleton instance
+registry = MetricsRegistry()
+
+# Hot path measurements
+MESSAGE_SECONDS = registry.histogram(
+    "coup_process_message_seconds",
+    "Time spent processing a client message",
+    ["message_type", "action_type"],
+)
+BROADCAST_SECONDS = registry.histogram(
+    "coup_broadcast_seconds",
+    "Time spent fanning a message out to a room",
+)
+BROADCAST_BYTES = registry.counter(
+    "coup_broadcast_bytes_total",
+    "Bytes sent by room broadcasts",
+    ["audience"],
+)
+PLAYER_VIEW_SECONDS = registry.histogram(
+    "coup_player_view_seconds",
+    "Time spent building a player's view of the game",
+    ["format"],
+)
+ADMISSION_REJECTIONS = registry.counter(
+    "coup_admission_rejections_total",
+    "Connections turned away because the server was overloaded",
+    ["reason"],
+)
+LOOP_LAG_SECONDS = registry.histogram(
+    "coup_event_loop_lag_probe_seconds",
+    "Delay of the event loop in running the lag probe's timer",
+)
+LOOP_STALL_SECONDS = registry.histogram(
+    "coup_event_loop_stall_seconds",
+    "Times the event loop was blocked past the stall threshold, by the handler blocking it",
+    ["handler"],
+)
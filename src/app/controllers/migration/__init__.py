@@ -0,0 +1,3 @@
+from app.controllers.migration.migration_manager import manager
+
+__all__ = ["manager"]
@@ -0,0 +1,313 @@
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+import asyncio
+import json
+import logging
+import os
+import signal
+import time
+
+import httpx
+
+from app.controllers.chat import manager as chat_manager
+from app.controllers.game import manager as game_manager
+from app.controllers.game.coup_game import CoupGame
+from app.controllers.matchmaking import manager as matchmaking_manager
+from app.controllers.player_tokens import manager as player_tokens
+from app.controllers.room_codes import manager as room_code_manager
+from app.controllers.room_codes.routing import format_worker_url
+from app.controllers.websockets import manager as ws_manager
+from app.controllers.websockets import spectator_manager
+from app.models.game import GameStatus
+
+logger = logging.getLogger(__name__)
+
+# Close code telling clients the server is restarting and they should reconnect
+SERVICE_RESTART = 1012
+# Seconds players of a migrated room have to reconnect before the room is dropped
+RESUME_TTL = 300.0
+# Seconds to wait for the peer worker to take the rooms
+HANDOFF_TIMEOUT = 10.0
+
+
+class MigrationManager:
+    """
+    Moves running games off a worker that is shutting down. On drain, new
+    connections are refused, every game in play is snapshotted and handed to
+    a peer worker (over HTTP, or through a spool directory the next process
+    imports on startup), and players are told where to reconnect before their
+    sockets are closed. The receiving worker holds the room codes and lets the
+    original players (by player ID and token) resume their seats until the
+    TTL expires.
+    """
+
+    def __init__(
+        self,
+        peer_url: Optional[str] = None,
+        spool_dir: Optional[str] = None,
+        token: Optional[str] = None,
+        reconnect_url: Optional[str] = None,
+        resume_ttl: float = RESUME_TTL,
+        clock=time.monotonic,
+        peer_worker: Optional[int] = None,
+    ):
+        self.peer_url = peer_url.rstrip("/") if peer_url else None
+        # Worker ID of the peer, rooms it takes are routed there from now on
+        self.peer_worker = peer_worker
+        self.spool_dir = Path(spool_dir) if spool_dir else None
+        self.token = token
+        self.reconnect_url = reconnect_url
+        self.resume_ttl = resume_ttl
+        self.clock = clock
+        self.draining = False
+        # Map of room_code -> (import time, map of player_id -> name still to resume)
+        self.resumable: Dict[str, Tuple[float, Dict[str, str]]] = {}
+        self._previous_handler = None
+        self._drain_task: Optional[asyncio.Task] = None
+
+    def snapshot_room(self, room_code: str) -> Optional[Dict]:
+        """Capture a room's game so another worker can continue it"""
+        coup_game = game_manager.get_coup_game(room_code)
+        if not coup_game:
+            return None
+        return {
+            "room_code": room_code,
+            "game": coup_game.snapshot(),
+            "chat": chat_manager.export_room(room_code),
+        }
+
+    def restore_room(self, snapshot: Dict) -> bool:
+        """
+        Take over a room snapshotted by another worker. The room code is held
+        until its players are back or the resume TTL expires.
+        """
+        self.expire_resumable()
+
+        room_code = snapshot["room_code"]
+        if game_manager.get_game(room_code) or not room_code_manager.claim(room_code):
+            logger.warning(f"Not importing room {room_code}, the code is in use")
+            return False
+
+        try:
+            coup_game = CoupGame.restore(snapshot["game"])
+        except Exception as e:
+            room_code_manager.release(room_code)
+            logger.error(f"Could not restore room {room_code}: {str(e)}")
+            return False
+
+        game_manager.add_game(coup_game)
+        chat_manager.import_room(room_code, snapshot.get("chat", []))
+        self.resumable[room_code] = (
+            self.clock(),
+            {p.id: p.name for p in coup_game.game_state.players if p.is_alive},
+        )
+        logger.info(
+            f"Imported room {room_code} at version {coup_game.game_state.version}"
+        )
+        return True
+
+    def import_rooms(self, snapshots: List[Dict]) -> List[str]:
+        """Restore several rooms and return the codes that were imported"""
+        return [
+            snapshot["room_code"]
+            for snapshot in snapshots
+            if self.restore_room(snapshot)
+        ]
+
+    def is_resumable(self, room_code: str) -> bool:
+        """Check if a room is waiting for its migrated players"""
+        self.expire_resumable()
+        return room_code in self.resumable
+
+    def resume_player(
+        self, room_code: str, player_id: str, player_token: Optional[str]
+    ) -> Optional[str]:
+        """
+        Give a migrated player their seat back and return their name, or
+        None if there is nothing to resume. The player proves the seat is
+        theirs with the token they got in room_joined, since other players
+        and the reconnect URL know their player ID.
+        """
+        self.expire_resumable()
+        if not player_tokens.verify(room_code, player_id, player_token):
+            return None
+
+        entry = self.resumable.get(room_code)
+        if not entry:
+            return None
+
+        _, waiting = entry
+        player_name = waiting.pop(player_id, None)
+        if player_name is not None and not waiting:
+            # Everyone is back, the open room holds the code from now on
+            del self.resumable[room_code]
+            room_code_manager.release(room_code)
+        return player_name
+
+    def expire_resumable(self) -> None:
+        """Drop migrated rooms whose players did not come back in time"""
+        now = self.clock()
+        for room_code, (imported_at, _) in list(self.resumable.items()):
+            if imported_at + self.resume_ttl > now:
+                continue
+            del self.resumable[room_code]
+            room_code_manager.release(room_code)
+            # Keep the game if some of its players made it back
+            if room_code not in ws_manager.active_rooms:
+                game_manager.remove_game(room_code)
+            logger.info(f"Resume window of room {room_code} expired")
+
+    async def drain(self) -> None:
+        """Hand every game in play to the peer and send the players there"""
+        if self.draining:
+            return
+        self.draining = True
+        await matchmaking_manager.stop()
+
+        snapshots = []
+        for room_code in list(ws_manager.active_rooms):
+            game = game_manager.get_game(room_code)
+            if game and game.status == GameStatus.PLAYING:
+                snapshots.append(self.snapshot_room(room_code))
+
+        handed_off, reconnect_url = (
+            await self.hand_off(snapshots) if snapshots else ([], None)
+        )
+        handed_off = set(handed_off)
+        logger.info(f"Drained {len(handed_off)} of {len(snapshots)} games in play")
+        if reconnect_url and self.peer_worker is not None:
+            # The next process here mustn't take these codes back, nor their clients
+            room_code_manager.record_moved(handed_off, self.peer_worker)
+
+        for room_code in list(ws_manager.active_rooms):
+            resumable = room_code in handed_off
+            for player in list(ws_manager.get_room_players(room_code)):
+                websocket = player["websocket"]
+                player_id = ws_manager.get_player_id(websocket)
+                message = {
+                    "type": "reconnect",
+                    "room_code": room_code,
+                    "player_id": player_id,
+                    "player_token": player_tokens.issue(room_code, player_id),
+                    "url": (
+                        format_worker_url(reconnect_url, websocket)
+                        if reconnect_url
+                        else None
+                    ),
+                    "resumable": resumable,
+                }
+                try:
+                    await ws_manager.send_personal_message(websocket, message)
+                except Exception:
+                    # Already gone
+                    pass
+            await ws_manager.close_room(room_code, SERVICE_RESTART, "Server restarting")
+
+        for websocket in list(spectator_manager.spectator_rooms):
+            spectator_manager.disconnect(websocket)
+            try:
+                await websocket.close(code=SERVICE_RESTART, reason="Server restarting")
+            except Exception:
+                pass
+
+    async def hand_off(self, snapshots: List[Dict]) -> Tuple[List[str], Optional[str]]:
+        """
+        Send snapshots to the peer worker, or spool them. Returns the rooms
+        taken and the URL their players reconnect to, None for this address.
+        """
+        if self.peer_url:
+            try:
+                async with httpx.AsyncClient(timeout=HANDOFF_TIMEOUT) as client:
+                    response = await client.post(
+                        f"{self.peer_url}/internal/migration/rooms",
+                        json={"rooms": snapshots},
+                        headers={"X-Migration-Token": self.token or ""},
+                    )
+                    response.raise_for_status()
+                    return response.json()["imported"], self.reconnect_url
+            except Exception as e:
+                logger.error(f"Could not hand rooms to {self.peer_url}: {str(e)}")
+
+        # The next process on this address picks the spooled rooms up
+        if self.spool_dir:
+            return self.write_spool(snapshots), None
+
+        return [], None
+
+    def write_spool(self, snapshots: List[Dict]) -> List[str]:
+        """Write snapshots to the spool directory for the next process to import"""
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        spooled = []
+        for snapshot in snapshots:
+            path = self.spool_dir / f"{snapshot['room_code']}.json"
+            # Write then rename, so the importer never sees a half written file
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(snapshot))
+            os.replace(tmp_path, path)
+            spooled.append(snapshot["room_code"])
+        return spooled
+
+    def import_spool(self) -> List[str]:
+        """Restore the rooms a previous process spooled, removing the files"""
+        if not self.spool_dir or not self.spool_dir.is_dir():
+            return []
+
+        imported = []
+        for path in sorted(self.spool_dir.glob("*.json")):
+            try:
+                snapshot = json.loads(path.read_text())
+            except (OSError, ValueError) as e:
+                logger.error(f"Skipping unreadable snapshot {path}: {str(e)}")
+                continue
+            if self.restore_room(snapshot):
+                imported.append(snapshot["room_code"])
+            path.unlink(missing_ok=True)
+        return imported
+
+    def install_signal_handler(self) -> None:
+        """
+        Drain on SIGTERM before handing the signal to the server, so players
+        are moved before their connections are torn down.
+        """
+        loop = asyncio.get_running_loop()
+        self._previous_handler = signal.getsignal(signal.SIGTERM)
+
+        def handle_sigterm(sig, frame):
+            loop.call_soon_threadsafe(self._start_drain, sig, frame)
+
+        try:
+            signal.signal(signal.SIGTERM, handle_sigterm)
+        except ValueError:
+            # Signals can only be handled from the main thread
+            self._previous_handler = None
+
+    def _start_drain(self, sig, frame) -> None:
+        """Run the drain, then let the previous handler shut the server down"""
+        if self._drain_task is not None:
+            return
+
+        async def drain_then_exit():
+            try:
+                await self.drain()
+            except Exception as e:
+                logger.error(f"Error draining: {str(e)}")
+            finally:
+                if callable(self._previous_handler):
+                    self._previous_handler(sig, frame)
+
+        self._drain_task = asyncio.create_task(drain_then_exit())
+
+
+# Create a singleton instance
+manager = MigrationManager(
+    peer_url=os.getenv("MIGRATION_PEER_URL"),
+    spool_dir=os.getenv("MIGRATION_SPOOL_DIR"),
+    token=os.getenv("MIGRATION_TOKEN"),
+    reconnect_url=os.getenv("MIGRATION_RECONNECT_URL"),
+    resume_ttl=float(os.getenv("MIGRATION_RESUME_TTL_SECONDS", str(RESUME_TTL))),
+    peer_worker=(
+        int(os.environ["MIGRATION_PEER_WORKER_ID"])
+        if os.getenv("MIGRATION_PEER_WORKER_ID")
+        else None
+    ),
+)
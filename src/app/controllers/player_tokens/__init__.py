@@ -0,0 +1,3 @@
+from app.controllers.player_tokens.player_tokens import manager
+
+__all__ = ["manager"]
@@ -0,0 +1,33 @@
+from typing import Optional
+import hashlib
+import hmac
+import os
+import secrets
+
+
+class PlayerTokens:
+    """
+    Secret tokens proving a connection owns a seat. Player IDs are shown to
+    the other players (actions target them), so they can't stand for the
+    player. A token is an HMAC of the room code and player ID: it is handed
+    out once, in room_joined, and checked without being stored anywhere, so
+    it still holds after the game migrates to another worker with the same key.
+    """
+
+    def __init__(self, key: Optional[str] = None):
+        self.key = (key or secrets.token_hex(16)).encode()
+
+    def issue(self, room_code: str, player_id: str) -> str:
+        """Get the token of a player's seat in a room"""
+        message = f"{room_code}:{player_id}".encode()
+        return hmac.new(self.key, message, hashlib.sha256).hexdigest()[:32]
+
+    def verify(self, room_code: str, player_id: str, token: Optional[str]) -> bool:
+        """Check a token against a player's seat in a room"""
+        if not token or not isinstance(token, str):
+            return False
+        return hmac.compare_digest(self.issue(room_code, player_id), token)
+
+
+# Create a singleton instance, workers that hand games to each other share PLAYER_TOKEN_KEY
+manager = PlayerTokens(key=os.getenv("PLAYER_TOKEN_KEY"))
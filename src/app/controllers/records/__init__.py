@@ -0,0 +1,27 @@
+from app.controllers.records.archive import manager
+from app.controllers.records.export import (
+    export_ndjson,
+    format_cursor,
+    matching_records,
+    parse_cursor,
+)
+from app.controllers.records.game_record import (
+    GameRecord,
+    GameRecordWriter,
+    encode_game,
+    iter_records,
+    skip_record,
+)
+
+__all__ = [
+    "manager",
+    "export_ndjson",
+    "format_cursor",
+    "matching_records",
+    "parse_cursor",
+    "GameRecord",
+    "GameRecordWriter",
+    "encode_game",
+    "iter_records",
+    "skip_record",
+]
@@ -0,0 +1,323 @@
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+from collections import deque
+from pathlib import Path
+import bisect
+import logging
+import mmap
+import os
+import threading
+import time
+
+from app.controllers.records.game_record import (
+    GameRecord,
+    GameRecordWriter,
+    iter_records,
+)
+from app.models.game import GameState
+
+logger = logging.getLogger(__name__)
+
+# A new segment file is started once the current one is this big
+SEGMENT_BYTES = 64 * 1024 * 1024
+# Every this many records, a segment's (finished_at, offset) is kept to seek by time
+INDEX_INTERVAL = 1024
+
+SEGMENT_PATTERN = "games-*.rec"
+# Subdirectories the launcher's workers archive to, one each
+SHARD_PATTERN = "worker-*"
+
+
+class GameArchive:
+    """
+    Append-only archive of finished games in the binary record format.
+    Records go to numbered segment files that are read back through mmap,
+    so scanning millions of games only touches the pages it reads. Records
+    are appended in finishing order, so a sparse per-segment index of
+    finish times is enough to seek to a point in time.
+    """
+
+    def __init__(self, directory: Optional[str], segment_bytes: int = SEGMENT_BYTES):
+        self.directory = Path(directory) if directory else None
+        self.segment_bytes = segment_bytes
+        self._writer: Optional[GameRecordWriter] = None
+        self._segment: Optional[int] = None
+        # Map of segment -> [(finished_at, offset)] of every INDEX_INTERVAL-th record
+        self._index: Dict[int, List[Tuple[int, int]]] = {}
+        # Map of segment -> number of records, for segments with an index
+        self._record_counts: Dict[int, int] = {}
+        # Map of segment -> its latest read-only mapping
+        self._maps: Dict[int, mmap.mmap] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def segments(self) -> List[int]:
+        """List the segment numbers, oldest first"""
+        if not self.directory or not self.directory.is_dir():
+            return []
+        return sorted(
+            int(path.stem.split("-")[1])
+            for path in self.directory.glob(SEGMENT_PATTERN)
+        )
+
+    def segment_path(self, segment: int) -> Path:
+        return self.directory / f"games-{segment:06d}.rec"
+
+    def append(self, game_state: GameState, finished_at: Optional[int] = None) -> None:
+        """Archive a finished game"""
+        if not self.enabled:
+            return
+
+        finished_at = int(time.time()) if finished_at is None else finished_at
+        writer = self._open_writer()
+        offset = writer.write(game_state, finished_at)
+        writer.flush()
+
+        # Keep the time index of the open segment current
+        if self._segment in self._index:
+            count = self._record_counts[self._segment]
+            if count % INDEX_INTERVAL == 0:
+                self._index[self._segment].append((finished_at, offset))
+            self._record_counts[self._segment] = count + 1
+
+    def _open_writer(self) -> GameRecordWriter:
+        """Get the writer of the current segment, starting a new one when it is full"""
+        if self._writer is not None and self._writer.file.tell() < self.segment_bytes:
+            return self._writer
+
+        if self._writer is not None:
+            self._writer.file.close()
+            segment = self._segment + 1
+        else:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            segments = self.segments()
+            segment = segments[-1] if segments else 1
+            path = self.segment_path(segment)
+            if path.exists() and path.stat().st_size >= self.segment_bytes:
+                segment += 1
+
+        self._segment = segment
+        self._writer = GameRecordWriter(open(self.segment_path(segment), "ab"))
+        return self._writer
+
+    def close(self) -> None:
+        """Close the open segment and every mapping, e.g. on shutdown"""
+        if self._writer is not None:
+            self._writer.file.close()
+            self._writer = None
+        for buf in self._maps.values():
+            try:
+                buf.close()
+            except BufferError:
+                # Still read by an export, it goes with its last reader
+                pass
+        self._maps.clear()
+
+    def _map(self, segment: int) -> Optional[mmap.mmap]:
+        """
+        Map a segment read-only, None if it is empty or missing. The mapping
+        is kept until the segment grows, then a new one covers the appends.
+        """
+        try:
+            with open(self.segment_path(segment), "rb") as file:
+                size = os.fstat(file.fileno()).st_size
+                if size == 0:
+                    return None
+                buf = self._maps.get(segment)
+                if buf is None or buf.closed or len(buf) != size:
+                    # An older mapping may still be read by an export, so it isn't closed here
+                    buf = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._maps[segment] = buf
+                return buf
+        except FileNotFoundError:
+            return None
+
+    def records(
+        self, segment: Optional[int] = None, offset: int = 0
+    ) -> Iterator[Tuple[int, GameRecord]]:
+        """
+        Lazily read (segment, record) pairs, oldest first, starting at a
+        segment and offset (e.g. taken from a previously read record's end).
+        """
+        for current in self.segments():
+            if segment is not None and current < segment:
+                continue
+            buf = self._map(current)
+            if buf is None:
+                continue
+            start = offset if current == segment else 0
+            # Only read up to the size mapped, the writer may be appending meanwhile
+            for record in iter_records(buf, start):
+                yield current, record
+
+    def is_record_boundary(self, segment: int, offset: int) -> bool:
+        """Check if a record starts (or a segment ends) at an offset, e.g. of a cursor"""
+        buf = self._map(segment)
+        if buf is None:
+            return offset == 0
+        if offset == len(buf):
+            return True
+        try:
+            GameRecord(buf, offset)
+        except (ValueError, IndexError):
+            return False
+        return True
+
+    def seek_time(self, finished_after: int) -> Tuple[Optional[int], int]:
+        """
+        Find a (segment, offset) at or before the first record finished at or
+        after a unix time, so reading from there skips most older records.
+        """
+        start = (None, 0)
+        for segment in self.segments():
+            index = self._segment_index(segment)
+            if not index:
+                continue
+            if index[0][0] >= finished_after:
+                break
+            position = bisect.bisect_left(index, (finished_after, -1)) - 1
+            start = (segment, index[max(position, 0)][1])
+        return start
+
+    def _segment_index(self, segment: int) -> List[Tuple[int, int]]:
+        """Get a segment's sparse time index, building it from the headers on first use"""
+        if segment not in self._index:
+            index = []
+            count = 0
+            buf = self._map(segment)
+            if buf is not None:
+                for count, record in enumerate(iter_records(buf), 1):
+                    if (count - 1) % INDEX_INTERVAL == 0:
+                        index.append((record.finished_at, record.offset))
+            self._index[segment] = index
+            self._record_counts[segment] = count
+        return self._index[segment]
+
+
+class ShardedArchive:
+    """
+    The game archives of several processes under one directory. A segment
+    file only takes appends from one process, so each worker appends to a
+    shard of its own (a worker-N subdirectory, named by the launcher) and
+    readers go through all of them. Games archived by a single process are
+    in the directory itself, which is the shard named "".
+
+    Once started, submit() only queues a finished game; a writer thread
+    encodes and appends what was queued, so the loop never waits on the disk.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str],
+        shard: str = "",
+        segment_bytes: int = SEGMENT_BYTES,
+    ):
+        self.directory = Path(directory) if directory else None
+        # The shard this process appends to
+        self.shard = shard
+        self.segment_bytes = segment_bytes
+        # Map of shard -> its archive
+        self._archives: Dict[str, GameArchive] = {}
+        # (game, finished_at) waiting for the writer thread
+        self.pending: Deque[Tuple[GameState, int]] = deque()
+        self._thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def shards(self) -> List[str]:
+        """List the shards holding segments"""
+        if not self.directory or not self.directory.is_dir():
+            return []
+        shards = [""] if any(self.directory.glob(SEGMENT_PATTERN)) else []
+        shards.extend(
+            sorted(
+                path.name
+                for path in self.directory.glob(SHARD_PATTERN)
+                if path.is_dir()
+            )
+        )
+        return shards
+
+    def archive(self, shard: str) -> GameArchive:
+        """Get the archive of a shard"""
+        if shard not in self._archives:
+            self._archives[shard] = GameArchive(
+                str(self.directory / shard), self.segment_bytes
+            )
+        return self._archives[shard]
+
+    def append(self, game_state: GameState, finished_at: Optional[int] = None) -> None:
+        """Archive a finished game in this process's shard"""
+        if not self.enabled:
+            return
+        self.archive(self.shard).append(game_state, finished_at)
+
+    def submit(self, game_state: GameState) -> None:
+        """
+        Archive a finished game from the writer thread, or right away if it
+        isn't running. A finished game doesn't change anymore, so it is
+        queued as it is.
+        """
+        if not self.enabled:
+            return
+        if self._thread is None:
+            self.append(game_state)
+            return
+        self.pending.append((game_state, int(time.time())))
+        self._wake.set()
+
+    def start(self) -> None:
+        """Start the writer thread"""
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._write_loop, name="game-archive-writer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Archive what is still queued, stop the writer thread and close every shard"""
+        if self._thread is not None:
+            self._stopped.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        for archive in self._archives.values():
+            archive.close()
+
+    def _write_loop(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            self._write_pending()
+            if self._stopped.is_set():
+                return
+
+    def _write_pending(self) -> None:
+        """Append every queued game, from the writer thread"""
+        while self.pending:
+            game_state, finished_at = self.pending.popleft()
+            try:
+                self.append(game_state, finished_at)
+            except Exception as e:
+                logger.error(
+                    f"Could not archive the game of room {game_state.room_code}: {str(e)}"
+                )
+
+    def is_record_boundary(self, shard: str, segment: int, offset: int) -> bool:
+        """Check if a record starts (or a segment ends) at an offset of a shard"""
+        return shard in self.shards() and self.archive(shard).is_record_boundary(
+            segment, offset
+        )
+
+
+# Create a singleton instance
+manager = ShardedArchive(
+    os.getenv("GAME_ARCHIVE_DIR"), os.getenv("GAME_ARCHIVE_SHARD", "")
+)
@@ -0,0 +1,157 @@
+from typing import Dict, Iterator, Optional, Tuple
+import heapq
+import json
+
+from app.controllers.records.archive import GameArchive, ShardedArchive
+from app.controllers.records.game_record import GameRecord
+
+# Lines are sent in chunks of about this many bytes
+CHUNK_BYTES = 64 * 1024
+
+
+def format_cursor(positions: Dict[str, Tuple[int, int]]) -> str:
+    """
+    Cursor resuming an export right after a record, from the (segment,
+    offset) reached in each shard: shard:segment:offset entries, comma
+    separated, with the name left out for the unnamed shard
+    """
+    return ",".join(
+        f"{shard}:{segment}:{offset}" if shard else f"{segment}:{offset}"
+        for shard, (segment, offset) in sorted(positions.items())
+    )
+
+
+def parse_cursor(cursor: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Get the map of shard -> (segment, offset) of a cursor, raising
+    ValueError if it is malformed
+    """
+    positions = {}
+    for entry in cursor.split(","):
+        fields = entry.split(":")
+        if len(fields) == 2:
+            fields.insert(0, "")
+        if (
+            len(fields) != 3
+            or fields[0] in positions
+            or not fields[1].isdigit()
+            or not fields[2].isdigit()
+        ):
+            raise ValueError(f"Invalid cursor: {cursor}")
+        positions[fields[0]] = (int(fields[1]), int(fields[2]))
+    return positions
+
+
+def shard_records(
+    shard: str,
+    archive: GameArchive,
+    start: Tuple[Optional[int], int],
+    finished_after: Optional[int] = None,
+    finished_before: Optional[int] = None,
+) -> Iterator[Tuple[str, int, GameRecord]]:
+    """Lazily read the (shard, segment, record) of a shard finished in range"""
+    segment, offset = start
+    for segment, record in archive.records(segment, offset):
+        if finished_after is not None and record.finished_at < finished_after:
+            continue
+        # One process appends to a shard, in finishing order: nothing later can match
+        if finished_before is not None and record.finished_at >= finished_before:
+            return
+        yield shard, segment, record
+
+
+def matching_records(
+    archive: ShardedArchive,
+    cursor: Optional[str] = None,
+    finished_after: Optional[int] = None,
+    finished_before: Optional[int] = None,
+    variation: Optional[str] = None,
+    player: Optional[str] = None,
+) -> Iterator[Tuple[str, GameRecord]]:
+    """
+    Lazily read the (cursor, record) pairs of the archived games finished
+    in [finished_after, finished_before) with a variation and a player (by
+    ID or name), oldest first across every shard, after a cursor. A
+    record's cursor resumes right after it. Only headers are decoded.
+    """
+    positions = parse_cursor(cursor) if cursor is not None else {}
+    streams = []
+    for shard in archive.shards():
+        shard_archive = archive.archive(shard)
+        if shard in positions:
+            start = positions[shard]
+        elif finished_after is not None:
+            start = shard_archive.seek_time(finished_after)
+        else:
+            start = (None, 0)
+        streams.append(
+            shard_records(shard, shard_archive, start, finished_after, finished_before)
+        )
+
+    # Each shard is in finishing order, merging them keeps it (ties go by shard)
+    for shard, segment, record in heapq.merge(
+        *streams, key=lambda item: item[2].finished_at
+    ):
+        if variation is not None and record.variation != variation:
+            continue
+        if player is not None and not any(
+            player in (player_id, name) for player_id, name in record.players
+        ):
+            continue
+        positions[shard] = (segment, record.end)
+        yield format_cursor(positions), record
+
+
+def encode_export_line(cursor: str, record: GameRecord, events: bool = True) -> str:
+    """Encode an archived game as one NDJSON line, with the cursor following it"""
+    game = {
+        "cursor": cursor,
+        "room_code": record.room_code,
+        "variation": record.variation,
+        "finished_at": record.finished_at,
+        "seed": record.seed,
+        "players": [
+            {"id": player_id, "name": name} for player_id, name in record.players
+        ],
+        "winner_id": record.winner_id,
+        "event_count": record.event_count,
+    }
+    if events:
+        game["events"] = list(record.events())
+    return json.dumps(game) + "\n"
+
+
+def export_ndjson(
+    archive: ShardedArchive,
+    cursor: Optional[str] = None,
+    finished_after: Optional[int] = None,
+    finished_before: Optional[int] = None,
+    variation: Optional[str] = None,
+    player: Optional[str] = None,
+    limit: Optional[int] = None,
+    events: bool = True,
+) -> Iterator[bytes]:
+    """
+    Stream archived games as NDJSON in chunks of about CHUNK_BYTES. Games
+    are read, encoded and sent one chunk at a time, so memory stays the
+    same however many games match. Every line carries the cursor to resume
+    from after it.
+    """
+    chunk = []
+    size = 0
+    count = 0
+    for record_cursor, record in matching_records(
+        archive, cursor, finished_after, finished_before, variation, player
+    ):
+        if limit is not None and count >= limit:
+            break
+        line = encode_export_line(record_cursor, record, events).encode()
+        chunk.append(line)
+        size += len(line)
+        count += 1
+        if size >= CHUNK_BYTES:
+            yield b"".join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield b"".join(chunk)
@@ -0,0 +1,362 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+import uuid
+
+from app.controllers.game.coup_game import CoupGame
+from app.controllers.game.rules import CHARACTERS, ActionType
+from app.models.game import GameState
+from app.models.room import RoomVariation
+
+# A record is MAGIC, FORMAT_VERSION, a varint body length, then the body:
+#
+#   varint finished_at (unix seconds)    varint seed
+#   code variation                       string room_code
+#   varint player count, then per player a flags byte (bit 0: the ID is a
+#   UUID stored as 16 raw bytes, otherwise a string) and a string name
+#   varint winner (roster index + 1, 0 for none)
+#   varint event count, then the events
+#
+# Strings are a varint byte length followed by UTF-8. Every event starts with
+# a byte holding the move type (top 3 bits) and the acting player's roster
+# index (bottom 5 bits, 31 meaning a varint index follows), then:
+#
+#   perform_action      action code (low 6 bits), bit 7 set when a varint target
+#                       index follows, bit 6 when a varint card index follows
+#   counter             counter type code (high nibble) and character code (low nibble)
+#   complete_exchange   varint count, then the kept card indices two per byte
+#
+# Codes index the tables below. A code equal to the escape value (0x3F for
+# action codes, 0x7F for other 7 bit codes, 0xF for nibbles) is followed by
+# the name as a string, so custom rule tables still round-trip. Records are
+# self-delimiting, so files of records can be concatenated and scanned
+# without decoding the events. Version 1 records had 7 bit action codes and
+# no card indices, they are still read.
+MAGIC = b"\xc0\x0c"
+FORMAT_VERSION = 2
+READABLE_VERSIONS = (1, 2)
+
+MOVE_TYPES = [
+    "perform_action",
+    "challenge",
+    "pass_challenge",
+    "counter",
+    "pass_counter",
+    "complete_exchange",
+]
+ACTION_CODES = [
+    ActionType.INCOME,
+    ActionType.FOREIGN_AID,
+    ActionType.COUP,
+    ActionType.TAX,
+    ActionType.ASSASSINATE,
+    ActionType.STEAL,
+    ActionType.EXCHANGE,
+]
+COUNTER_CODES = [
+    ActionType.BLOCK_FOREIGN_AID,
+    ActionType.BLOCK_ASSASSINATION,
+    ActionType.BLOCK_STEALING,
+]
+CHARACTER_CODES = list(CHARACTERS)
+VARIATION_CODES = [variation.value for variation in RoomVariation]
+
+_CODE_ESCAPE = 0x7F
+_ACTION_ESCAPE = 0x3F
+_NIBBLE_ESCAPE = 0xF
+_ACTOR_ESCAPE = 31
+_HAS_TARGET = 0x80
+_HAS_CARD_INDEX = 0x40
+_UUID_ID = 0x01
+
+_move_codes = {move: i for i, move in enumerate(MOVE_TYPES)}
+
+
+def write_varint(out: bytearray, n: int) -> None:
+    """Append an unsigned LEB128 varint"""
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def read_varint(buf, pos: int) -> Tuple[int, int]:
+    """Read an unsigned LEB128 varint, returning it and the next position"""
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _write_string(out: bytearray, value: str) -> None:
+    data = value.encode()
+    write_varint(out, len(data))
+    out += data
+
+
+def _read_string(buf, pos: int) -> Tuple[str, int]:
+    length, pos = read_varint(buf, pos)
+    return bytes(buf[pos : pos + length]).decode(), pos + length
+
+
+def _code(table: List[str], value: str, escape: int) -> int:
+    try:
+        code = table.index(value)
+    except ValueError:
+        return escape
+    return code if code < escape else escape
+
+
+def _read_code(
+    table: List[str], code: int, escape: int, buf, pos: int
+) -> Tuple[str, int]:
+    if code == escape:
+        return _read_string(buf, pos)
+    return table[code], pos
+
+
+def encode_game(game_state: GameState, finished_at: int) -> bytes:
+    """Encode a finished game as a record"""
+    roster = {p.id: i for i, p in enumerate(game_state.players)}
+    body = bytearray()
+    write_varint(body, finished_at)
+    write_varint(body, game_state.seed or 0)
+
+    variation = _code(VARIATION_CODES, game_state.variation, _CODE_ESCAPE)
+    body.append(variation)
+    if variation == _CODE_ESCAPE:
+        _write_string(body, game_state.variation)
+    _write_string(body, game_state.room_code)
+
+    write_varint(body, len(game_state.players))
+    for player in game_state.players:
+        try:
+            player_uuid = uuid.UUID(player.id)
+        except ValueError:
+            player_uuid = None
+        if player_uuid is not None and str(player_uuid) == player.id:
+            body.append(_UUID_ID)
+            body += player_uuid.bytes
+        else:
+            body.append(0)
+            _write_string(body, player.id)
+        _write_string(body, player.name)
+
+    alive = [i for i, p in enumerate(game_state.players) if p.is_alive]
+    write_varint(body, alive[0] + 1 if len(alive) == 1 else 0)
+
+    write_varint(body, len(game_state.action_log))
+    for entry in game_state.action_log:
+        _encode_event(body, entry, roster)
+
+    out = bytearray(MAGIC)
+    out.append(FORMAT_VERSION)
+    write_varint(out, len(body))
+    out += body
+    return bytes(out)
+
+
+def _encode_event(out: bytearray, entry: Dict, roster: Dict[str, int]) -> None:
+    """Append one action log entry, keeping only the fields replay needs"""
+    move_type = entry["type"]
+    actor = roster[entry["player_id"]]
+    out.append(_move_codes[move_type] << 5 | min(actor, _ACTOR_ESCAPE))
+    if actor >= _ACTOR_ESCAPE:
+        write_varint(out, actor - _ACTOR_ESCAPE)
+
+    args = entry.get("args", [])
+    if move_type == "perform_action":
+        action = args[0]
+        code = _code(ACTION_CODES, action["action_type"], _ACTION_ESCAPE)
+        target_id = action.get("target_id")
+        # The card a coup or assassination takes, the first one when left out
+        card_index = action.get("card_index")
+        has_card_index = isinstance(card_index, int) and card_index > 0
+        out.append(
+            code
+            | (_HAS_TARGET if target_id else 0)
+            | (_HAS_CARD_INDEX if has_card_index else 0)
+        )
+        if code == _ACTION_ESCAPE:
+            _write_string(out, action["action_type"])
+        if target_id:
+            write_varint(out, roster[target_id])
+        if has_card_index:
+            write_varint(out, int(card_index))
+    elif move_type == "counter":
+        counter = args[0]
+        counter_code = _code(COUNTER_CODES, counter["counter_type"], _NIBBLE_ESCAPE)
+        character_code = _code(CHARACTER_CODES, counter["character"], _NIBBLE_ESCAPE)
+        out.append(counter_code << 4 | character_code)
+        if counter_code == _NIBBLE_ESCAPE:
+            _write_string(out, counter["counter_type"])
+        if character_code == _NIBBLE_ESCAPE:
+            _write_string(out, counter["character"])
+    elif move_type == "complete_exchange":
+        kept = args[0]
+        write_varint(out, len(kept))
+        # Two indices per byte, in the order they were picked (it sets the hand order)
+        for i in range(0, len(kept), 2):
+            pair = kept[i : i + 2]
+            out.append(pair[0] << 4 | (pair[1] if len(pair) > 1 else 0))
+
+
+class GameRecord:
+    """
+    A decoded record header. The events stay encoded in the underlying
+    buffer (bytes or an mmap) and are decoded lazily by events().
+    """
+
+    __slots__ = (
+        "offset",
+        "size",
+        "finished_at",
+        "seed",
+        "variation",
+        "room_code",
+        "players",
+        "winner_id",
+        "event_count",
+        "format_version",
+        "_buf",
+        "_events_pos",
+    )
+
+    def __init__(self, buf, offset: int):
+        view = memoryview(buf)
+        if bytes(view[offset : offset + 2]) != MAGIC:
+            raise ValueError(f"No game record at offset {offset}")
+        if view[offset + 2] not in READABLE_VERSIONS:
+            raise ValueError(f"Unsupported record version {view[offset + 2]}")
+        self.format_version = view[offset + 2]
+        length, pos = read_varint(view, offset + 3)
+        self.offset = offset
+        self.size = pos + length - offset
+
+        self.finished_at, pos = read_varint(view, pos)
+        self.seed, pos = read_varint(view, pos)
+        self.variation, pos = _read_code(
+            VARIATION_CODES, view[pos], _CODE_ESCAPE, view, pos + 1
+        )
+        self.room_code, pos = _read_string(view, pos)
+
+        count, pos = read_varint(view, pos)
+        # (player_id, name) in seating order
+        self.players: List[Tuple[str, str]] = []
+        for _ in range(count):
+            flags = view[pos]
+            pos += 1
+            if flags & _UUID_ID:
+                player_id = str(uuid.UUID(bytes=bytes(view[pos : pos + 16])))
+                pos += 16
+            else:
+                player_id, pos = _read_string(view, pos)
+            name, pos = _read_string(view, pos)
+            self.players.append((player_id, name))
+
+        winner, pos = read_varint(view, pos)
+        self.winner_id = self.players[winner - 1][0] if winner else None
+        self.event_count, pos = read_varint(view, pos)
+        self._buf = view
+        self._events_pos = pos
+
+    @property
+    def end(self) -> int:
+        """Offset of the record that follows this one"""
+        return self.offset + self.size
+
+    def events(self) -> Iterator[Dict]:
+        """Decode the events one by one, in the shape of action log entries"""
+        view = self._buf
+        pos = self._events_pos
+        action_escape = _CODE_ESCAPE if self.format_version == 1 else _ACTION_ESCAPE
+        for _ in range(self.event_count):
+            head = view[pos]
+            pos += 1
+            move_type = MOVE_TYPES[head >> 5]
+            actor = head & _ACTOR_ESCAPE
+            if actor == _ACTOR_ESCAPE:
+                extra, pos = read_varint(view, pos)
+                actor += extra
+
+            args = []
+            if move_type == "perform_action":
+                code = view[pos]
+                pos += 1
+                action_type, pos = _read_code(
+                    ACTION_CODES, code & action_escape, action_escape, view, pos
+                )
+                action = {"action_type": action_type}
+                if code & _HAS_TARGET:
+                    target, pos = read_varint(view, pos)
+                    action["target_id"] = self.players[target][0]
+                if self.format_version > 1 and code & _HAS_CARD_INDEX:
+                    action["card_index"], pos = read_varint(view, pos)
+                args = [action]
+            elif move_type == "counter":
+                codes = view[pos]
+                pos += 1
+                counter_type, pos = _read_code(
+                    COUNTER_CODES, codes >> 4, _NIBBLE_ESCAPE, view, pos
+                )
+                character, pos = _read_code(
+                    CHARACTER_CODES, codes & 0xF, _NIBBLE_ESCAPE, view, pos
+                )
+                args = [{"counter_type": counter_type, "character": character}]
+            elif move_type == "complete_exchange":
+                count, pos = read_varint(view, pos)
+                kept = []
+                for i in range(0, count, 2):
+                    kept.append(view[pos] >> 4)
+                    if i + 1 < count:
+                        kept.append(view[pos] & 0xF)
+                    pos += 1
+                args = [kept]
+
+            yield {"type": move_type, "player_id": self.players[actor][0], "args": args}
+
+    def replay(self) -> CoupGame:
+        """Rebuild the full game, including reveals and draws, from the seed"""
+        return CoupGame.replay(
+            self.room_code,
+            [{"id": player_id, "name": name} for player_id, name in self.players],
+            self.seed,
+            list(self.events()),
+            self.variation,
+        )
+
+
+def skip_record(buf, offset: int) -> int:
+    """Get the offset of the next record without decoding this one"""
+    if bytes(buf[offset : offset + 2]) != MAGIC:
+        raise ValueError(f"No game record at offset {offset}")
+    length, pos = read_varint(buf, offset + 3)
+    return pos + length
+
+
+def iter_records(
+    buf, offset: int = 0, end: Optional[int] = None
+) -> Iterator[GameRecord]:
+    """Lazily decode the records of a buffer, e.g. an mmap of concatenated records"""
+    end = len(buf) if end is None else end
+    while offset < end:
+        record = GameRecord(buf, offset)
+        yield record
+        offset = record.end
+
+
+class GameRecordWriter:
+    """Append records to a binary file, returning the offset of each"""
+
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, game_state: GameState, finished_at: int) -> int:
+        offset = self.file.tell()
+        self.file.write(encode_game(game_state, finished_at))
+        return offset
+
+    def flush(self) -> None:
+        self.file.flush()
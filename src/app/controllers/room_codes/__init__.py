@@ -0,0 +1,4 @@
+from app.controllers.room_codes.allocator import manager
+from app.controllers.room_codes.routing import router
+
+__all__ = ["manager", "router"]
@@ -0,0 +1,302 @@
+from typing import Deque, Dict, Iterable, Optional, Tuple
+from collections import deque
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+import secrets
+import string
+import time
+
+ROOM_CODE_ALPHABET = string.ascii_uppercase + string.digits
+ROOM_CODE_LENGTH = 5
+# Number of possible room codes, 36^5
+ROOM_CODE_SPACE = len(ROOM_CODE_ALPHABET) ** ROOM_CODE_LENGTH
+
+# Seconds a released code rests before it is handed out again, so clients
+# still holding it don't end up in somebody else's room
+RECYCLE_COOLDOWN = 300.0
+# Counter values reserved per write of the state file, so it is rarely written
+COUNTER_BLOCK = 4096
+# Seconds the rooms handed to another worker are still sent there
+MOVED_TTL = 3600.0
+
+# The permutation works on 26 bit numbers (the smallest power of two above the
+# code space) split into two 13 bit halves
+_HALF_BITS = 13
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUNDS = 4
+
+logger = logging.getLogger(__name__)
+
+
+class RoomCodeAllocator:
+    """
+    Hands out room codes that are unique by construction. A counter is mapped
+    onto the code space through a keyed permutation (a small Feistel network,
+    cycle-walked back into range), so codes look random but never repeat
+    until the space runs out, and each allocation is O(1).
+
+    Codes are held while a room is open or a reservation (such as a
+    matchmaking match) still refers to them. Once the last hold is released
+    the code cools down before it can be handed out again.
+
+    With several workers, every worker uses the same key and counts in
+    lanes of every `2 * workers`-th value: a worker hands out its own codes
+    from the lane starting at its ID, and codes for worker w (e.g. for the
+    rooms the matchmaking worker spreads over the others) from the lane
+    starting at `workers + w`. Workers hand out disjoint codes without
+    talking to each other, and the worker that owns a code can be recovered
+    from the code itself.
+
+    A worker restarted with its rooms handed to a peer would start counting
+    from scratch and hand their codes out again, so with a state file the
+    counters survive restarts (reserved a block at a time), along with the
+    rooms that moved to another worker, which are sent there meanwhile.
+    """
+
+    def __init__(
+        self,
+        key: Optional[str] = None,
+        worker_id: int = 0,
+        workers: int = 1,
+        cooldown: float = RECYCLE_COOLDOWN,
+        clock=time.monotonic,
+        state_path: Optional[str] = None,
+        moved_ttl: float = MOVED_TTL,
+    ):
+        if not 0 <= worker_id < workers:
+            raise ValueError(f"Worker ID {worker_id} is not in [0, {workers})")
+
+        key = key or secrets.token_hex(16)
+        self.round_keys = [
+            int.from_bytes(
+                hashlib.blake2b(f"{key}:{i}".encode(), digest_size=4).digest()
+            )
+            for i in range(_ROUNDS)
+        ]
+        self.worker_id = worker_id
+        self.workers = workers
+        self.cooldown = cooldown
+        self.clock = clock
+        # Counter values a lane moves on by
+        self.stride = 2 * workers
+        # Map of lane -> its next counter value, lanes start at their own number
+        self.counters: Dict[int, int] = {}
+        # Map of room_code -> number of holds on it
+        self.holds: Dict[str, int] = {}
+        # Map of room_code -> time its last hold was released
+        self.released_at: Dict[str, float] = {}
+        # (release time, room_code) of released codes, oldest first
+        self.cooling: Deque[Tuple[float, str]] = deque()
+        self.state_path = Path(state_path) if state_path else None
+        self.moved_ttl = moved_ttl
+        # Map of lane -> counter value up to which the state file has it reserved
+        self.reserved: Dict[int, int] = {}
+        # Map of room_code -> (worker it moved to, unix time it moved)
+        self.moved: Dict[str, Tuple[int, float]] = {}
+        self._load_state()
+
+    def allocate(self) -> str:
+        """Get an unused room code, held once by the caller"""
+        room_code = self._next_recycled() or self._next_fresh(self.worker_id)
+        self.holds[room_code] = 1
+        return room_code
+
+    def allocate_for(self, worker_id: int) -> str:
+        """
+        Get an unused room code owned by a worker, held once by the caller.
+        Only one worker hands out codes for the others.
+        """
+        if worker_id == self.worker_id:
+            return self.allocate()
+        if not 0 <= worker_id < self.workers:
+            raise ValueError(f"Worker ID {worker_id} is not in [0, {self.workers})")
+        room_code = self._next_fresh(self.workers + worker_id)
+        self.holds[room_code] = 1
+        return room_code
+
+    def claim(self, room_code: str) -> bool:
+        """Hold a specific room code if nobody holds it yet"""
+        if room_code in self.holds or self.moved_to(room_code) is not None:
+            return False
+        self.acquire(room_code)
+        return True
+
+    def acquire(self, room_code: str) -> None:
+        """Add a hold on a room code"""
+        self.holds[room_code] = self.holds.get(room_code, 0) + 1
+        self.released_at.pop(room_code, None)
+
+    def release(self, room_code: str) -> None:
+        """Drop a hold on a room code, the code cools down once nothing holds it"""
+        holds = self.holds.get(room_code)
+        if holds is None:
+            return
+        if holds > 1:
+            self.holds[room_code] = holds - 1
+            return
+
+        del self.holds[room_code]
+        now = self.clock()
+        self.released_at[room_code] = now
+        self.cooling.append((now, room_code))
+
+    def is_in_use(self, room_code: str) -> bool:
+        """Check if a room code is held or still cooling down"""
+        return room_code in self.holds or room_code in self.released_at
+
+    def worker_for_code(self, room_code: str) -> Optional[int]:
+        """Get the worker that hands out a room code, None if it isn't a valid code"""
+        if len(room_code) != ROOM_CODE_LENGTH or any(
+            c not in ROOM_CODE_ALPHABET for c in room_code
+        ):
+            return None
+        return self._unpermute(self._decode(room_code)) % self.workers
+
+    def record_moved(self, room_codes: Iterable[str], worker_id: int) -> None:
+        """Remember rooms handed to another worker, to send their clients there"""
+        now = time.time()
+        for room_code in room_codes:
+            self.moved[room_code] = (worker_id, now)
+        self._save_state()
+
+    def moved_to(self, room_code: str) -> Optional[int]:
+        """Get the worker a room of this worker was handed to, if it still is there"""
+        entry = self.moved.get(room_code)
+        if entry is None:
+            return None
+        if entry[1] + self.moved_ttl <= time.time():
+            del self.moved[room_code]
+            return None
+        return entry[0]
+
+    def _next_recycled(self) -> Optional[str]:
+        """Get the oldest released code of this worker that has cooled down"""
+        now = self.clock()
+        while self.cooling and self.cooling[0][0] + self.cooldown <= now:
+            released_at, room_code = self.cooling.popleft()
+            # Skip codes claimed again (or released again later) since
+            if self.released_at.get(room_code) != released_at:
+                continue
+            del self.released_at[room_code]
+            # Rooms migrated in from another worker leave their codes to their owner
+            if self.worker_for_code(room_code) == self.worker_id:
+                return room_code
+        return None
+
+    def _next_fresh(self, lane: int) -> str:
+        """Get the next never used code of a lane"""
+        counter = self.counters.get(lane, lane)
+        while counter < ROOM_CODE_SPACE:
+            if self.state_path and counter >= self.reserved.get(lane, lane):
+                self.reserved[lane] = counter + COUNTER_BLOCK * self.stride
+                self._save_state()
+            room_code = self._encode(self._permute(counter))
+            counter += self.stride
+            self.counters[lane] = counter
+            # Custom codes may have been claimed already
+            if not self.is_in_use(room_code):
+                return room_code
+        raise ValueError("No room codes left")
+
+    def _load_state(self) -> None:
+        """Pick the counters and moved rooms up from a previous process"""
+        if not self.state_path or not self.state_path.is_file():
+            return
+        try:
+            state = json.loads(self.state_path.read_text())
+            counters = {
+                int(lane): int(counter) for lane, counter in state["counters"].items()
+            }
+            moved = {
+                room_code: (int(worker_id), float(moved_at))
+                for room_code, (worker_id, moved_at) in state["moved"].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error(f"Ignoring unreadable room code state {self.state_path}: {e}")
+            return
+        for lane, counter in counters.items():
+            if not 0 <= lane < self.stride:
+                continue
+            # Round up to the lane's next counter value
+            counter += (lane - counter) % self.stride
+            self.counters[lane] = self.reserved[lane] = counter
+        self.moved = moved
+        for room_code in list(self.moved):
+            self.moved_to(room_code)
+
+    def _save_state(self) -> None:
+        """Write the reserved counters and the moved rooms to the state file"""
+        if not self.state_path:
+            return
+        state = {
+            "counters": self.reserved,
+            "moved": {
+                room_code: [worker_id, moved_at]
+                for room_code, (worker_id, moved_at) in self.moved.items()
+            },
+        }
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename, so a crash never leaves half a file behind
+        tmp_path = self.state_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(state))
+        os.replace(tmp_path, self.state_path)
+
+    def _round(self, i: int, half: int) -> int:
+        x = (half * 0x9E3779B1 + self.round_keys[i]) & 0xFFFFFFFF
+        x ^= x >> 15
+        x = (x * 0x85EBCA6B) & 0xFFFFFFFF
+        return (x ^ (x >> 13)) & _HALF_MASK
+
+    def _feistel(self, n: int) -> int:
+        left, right = n >> _HALF_BITS, n & _HALF_MASK
+        for i in range(_ROUNDS):
+            left, right = right, left ^ self._round(i, right)
+        return (left << _HALF_BITS) | right
+
+    def _unfeistel(self, n: int) -> int:
+        left, right = n >> _HALF_BITS, n & _HALF_MASK
+        for i in reversed(range(_ROUNDS)):
+            left, right = right ^ self._round(i, left), left
+        return (left << _HALF_BITS) | right
+
+    def _permute(self, n: int) -> int:
+        # Cycle-walk until the result lands in the code space, which keeps it a bijection
+        n = self._feistel(n)
+        while n >= ROOM_CODE_SPACE:
+            n = self._feistel(n)
+        return n
+
+    def _unpermute(self, n: int) -> int:
+        n = self._unfeistel(n)
+        while n >= ROOM_CODE_SPACE:
+            n = self._unfeistel(n)
+        return n
+
+    @staticmethod
+    def _encode(n: int) -> str:
+        chars = []
+        for _ in range(ROOM_CODE_LENGTH):
+            n, digit = divmod(n, len(ROOM_CODE_ALPHABET))
+            chars.append(ROOM_CODE_ALPHABET[digit])
+        return "".join(reversed(chars))
+
+    @staticmethod
+    def _decode(room_code: str) -> int:
+        n = 0
+        for c in room_code:
+            n = n * len(ROOM_CODE_ALPHABET) + ROOM_CODE_ALPHABET.index(c)
+        return n
+
+
+# Create a singleton instance, workers of one deployment share ROOM_CODE_KEY
+manager = RoomCodeAllocator(
+    key=os.getenv("ROOM_CODE_KEY"),
+    worker_id=int(os.getenv("ROOM_CODE_WORKER_ID", "0")),
+    workers=int(os.getenv("ROOM_CODE_WORKERS", "1")),
+    cooldown=float(os.getenv("ROOM_CODE_COOLDOWN_SECONDS", str(RECYCLE_COOLDOWN))),
+    state_path=os.getenv("ROOM_CODE_STATE_FILE"),
+    moved_ttl=float(os.getenv("ROOM_CODE_MOVED_TTL_SECONDS", str(MOVED_TTL))),
+)
@@ -0,0 +1,107 @@
+from typing import List, Optional
+import os
+
+from fastapi import Request, WebSocket
+
+from app.controllers.room_codes.allocator import RoomCodeAllocator
+from app.controllers.room_codes.allocator import manager as room_code_manager
+
+# Worker running the matchmaking queue, it spreads the matched rooms over every worker
+MATCHMAKING_WORKER = 0
+
+
+def format_worker_url(template: str, websocket: WebSocket) -> str:
+    """
+    Fill in the {scheme} (ws or wss) and {host} placeholders of a worker URL
+    from the connection, so one template works behind any host name.
+    """
+    scheme = "wss" if websocket.url.scheme in ("wss", "https") else "ws"
+    return template.format(scheme=scheme, host=websocket.url.hostname)
+
+
+def format_worker_http_url(template: str, request: Request) -> str:
+    """Fill in a worker URL for an HTTP request, with an http or https scheme"""
+    scheme = "https" if request.url.scheme in ("wss", "https") else "http"
+    url = template.format(scheme=scheme, host=request.url.hostname)
+    # Templates written out for WebSocket clients name their scheme
+    for ws_scheme, http_scheme in (("wss://", "https://"), ("ws://", "http://")):
+        if url.startswith(ws_scheme):
+            return http_scheme + url[len(ws_scheme) :]
+    return url
+
+
+class RoomRouter:
+    """
+    Sends connections to the worker that owns their room. Workers sharing a
+    listening port (SO_REUSEPORT) get connections the kernel spreads by
+    address, not by room, but a room only lives in one worker's memory. The
+    owner is recovered from the room code itself, so a worker that gets a
+    connection (or an HTTP request about a room) for a room it doesn't have
+    can tell the client where to go. A worker that handed a room to a peer
+    while restarting sends its clients on to the peer. The matchmaking queue
+    lives in one worker the same way.
+    """
+
+    def __init__(self, allocator: RoomCodeAllocator, worker_urls: List[str]):
+        self.allocator = allocator
+        # URL of each worker's own listener, by worker ID
+        self.worker_urls = worker_urls
+
+    @property
+    def enabled(self) -> bool:
+        """Whether clients can be sent to the other workers"""
+        return self.allocator.workers > 1 and len(self.worker_urls) == (
+            self.allocator.workers
+        )
+
+    def redirect_url(self, websocket: WebSocket, room_code: str) -> Optional[str]:
+        """Get the URL of the worker owning a room, None if it's this worker"""
+        template = self._worker_template(self._owner(room_code))
+        return format_worker_url(template, websocket) if template else None
+
+    def http_redirect_url(self, request: Request, room_code: str) -> Optional[str]:
+        """
+        Get the URL a request about a room has on the worker owning the room,
+        None if it's this worker
+        """
+        return self._http_url(request, self._owner(room_code))
+
+    def matchmaking_redirect_url(self, request: Request) -> Optional[str]:
+        """
+        Get the URL a matchmaking request has on the matchmaking worker, None
+        if it's this worker
+        """
+        return self._http_url(request, MATCHMAKING_WORKER)
+
+    def _owner(self, room_code: str) -> Optional[int]:
+        """Get the worker holding a room: the code's, unless it moved the room on"""
+        moved_to = self.allocator.moved_to(room_code)
+        if moved_to is not None:
+            return moved_to
+        return self.allocator.worker_for_code(room_code)
+
+    def _worker_template(self, worker_id: Optional[int]) -> Optional[str]:
+        """Get the URL template of another worker, None for this one or when unknown"""
+        if (
+            not self.enabled
+            or worker_id is None
+            or worker_id == self.allocator.worker_id
+        ):
+            return None
+        return self.worker_urls[worker_id]
+
+    def _http_url(self, request: Request, worker_id: Optional[int]) -> Optional[str]:
+        template = self._worker_template(worker_id)
+        if not template:
+            return None
+        url = format_worker_http_url(template, request).rstrip("/") + request.url.path
+        if request.url.query:
+            url += "?" + request.url.query
+        return url
+
+
+# Create a singleton instance, ROOM_CODE_WORKER_URLS lists the workers' URLs in ID order
+router = RoomRouter(
+    room_code_manager,
+    [url for url in os.getenv("ROOM_CODE_WORKER_URLS", "").split(",") if url],
+)
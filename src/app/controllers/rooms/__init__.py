@@ -1,3 +1,3 @@
-from app.controllers.rooms import controller, utils
+from app.controllers.rooms import controller, multiplexer, utils
 
-__all__ = ["controller", "utils"]
+__all__ = ["controller", "multiplexer", "utils"]
@@ -1,12 +1,27 @@
 from typing import Dict, List, Optional
+import asyncio
+import hashlib
 import logging
-from fastapi import WebSocket, WebSocketDisconnect
+from fastapi import HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 
 from app.controllers.websockets import manager as ws_manager
+from app.controllers.websockets import spectator_manager
 from app.controllers.websockets import process_message
+from app.controllers.admission import manager as admission_manager
+from app.controllers.chat import manager as chat_manager
 from app.controllers.game import manager as game_manager
+from app.controllers.lobby import manager as lobby_manager
+from app.controllers.migration import manager as migration_manager
+from app.controllers.player_tokens import manager as player_tokens
+from app.controllers.records import manager as archive_manager
+from app.controllers.room_codes import manager as room_code_manager
+from app.controllers.room_codes import router as room_router
+from app.controllers.tracing import tracer
 from app.controllers.rooms.utils import generate_room_code
-from app.models.game import GameStatus
+from app.models.game import GameState, GameStatus
+from app.models.admission import AdmissionRejection
+from app.models.lobby import LobbyPage
+from app.models.room import RoomVariation
 
 logger = logging.getLogger(__name__)
 
@@ -14,27 +29,78 @@ logger = logging.getLogger(__name__)
 def create_room(room_code: str = None) -> str:
     """
     Create a new room with the given code or generate a new one.
-    Returns the room code.
+    Returns the room code, held until release_room_code is called.
     """
     # Generate a unique room code if not provided
     if not room_code or room_code == "new":
-        room_code = generate_room_code()
+        return generate_room_code()
 
-    # Check if room already exists in the connection manager
-    if room_code in ws_manager.active_rooms:
+    # Check if the room code is already taken (open, or handed out by matchmaking)
+    if not room_code_manager.claim(room_code):
         raise ValueError("Room already exists")
 
     return room_code
 
 
+def release_room_code(room_code: str) -> None:
+    """
+    Release the hold create_room took on a room code.
+    """
+    room_code_manager.release(room_code)
+
+
 async def handle_room_connection(
-    websocket: WebSocket, room_code: str, player_name: str, create: bool = False
+    websocket: WebSocket,
+    room_code: str,
+    player_name: str,
+    create: bool = False,
+    variation: str = RoomVariation.COUP_O_CLOCK,
+    player_id: Optional[str] = None,
+    player_token: Optional[str] = None,
 ) -> None:
     """
     Handle a new WebSocket connection to a room.
     This function encapsulates the entire connection lifecycle.
+    With a player ID and its token, the player resumes their seat in a migrated game.
     """
+    # Nothing new is admitted while the worker drains, clients reconnect elsewhere
+    if migration_manager.draining:
+        await websocket.close(code=1012, reason="Server restarting")
+        return
+
+    # Rooms live in one worker, send the client to the one that owns the code
+    if not is_local_room(room_code):
+        url = room_router.redirect_url(websocket, room_code)
+        if url:
+            await redirect_connection(websocket, room_code, url)
+            return
+
+    # Games in progress keep their players, new rooms and joins wait out an overload
+    resumed = bool(player_id)
+    if not resumed:
+        rejection = admission_manager.check(
+            creates_room=create or room_code not in ws_manager.active_rooms
+        )
+        if rejection:
+            await reject_connection(websocket, rejection)
+            return
+
+    # Seats are dealt when a game starts, nobody new joins one in progress
+    if not resumed and is_game_in_progress(room_code):
+        await websocket.close(code=4003, reason="Game in progress")
+        return
+
     try:
+        if resumed:
+            player_name = migration_manager.resume_player(
+                room_code, player_id, player_token
+            )
+            if player_name is None:
+                await websocket.close(code=4004, reason="No seat to resume")
+                return
+            variation = game_manager.get_game(room_code).variation
+            create = False
+
         # If creating a new room, validate that the room code doesn't exist
         if create:
             try:
@@ -43,8 +109,14 @@ async def handle_room_connection(
                 await websocket.close(code=4000, reason="Room already exists")
                 return
 
-        # Connect to the room and get player ID
-        player_id = await ws_manager.connect(websocket, room_code, player_name)
+        # Connect to the room and get player ID, the open room holds its code from now on
+        try:
+            player_id = await ws_manager.connect(
+                websocket, room_code, player_name, variation, player_id
+            )
+        finally:
+            if create:
+                release_room_code(room_code)
 
         # Send initial room state to the client
         players = [p["name"] for p in ws_manager.get_room_players(room_code)]
@@ -56,27 +128,173 @@ async def handle_room_connection(
                 "players": players,
                 "is_creator": create,
                 "player_id": player_id,
+                "player_token": player_tokens.issue(room_code, player_id),
             },
         )
 
+        # A resumed player is already seated, catch them up with the game
+        if resumed:
+            ws_manager.set_player_ready(websocket, True)
+            lobby_manager.update_room(room_code, status=GameStatus.PLAYING)
+            await ws_manager.send_personal_text(
+                websocket,
+                encode_game_state_message(
+                    get_encoded_player_game_view(room_code, player_id)
+                ),
+            )
+
+        # Catch up with the chat so far
+        await send_chat_history(websocket, room_code)
+
         # Handle messages from this client
         try:
             while True:
                 data = await websocket.receive_text()
-                await process_message(websocket, data, room_code)
+                # The game was already handed off, the socket is about to close
+                if migration_manager.draining:
+                    continue
+                with tracer.span(
+                    "websocket.message", room_code=room_code, player_id=player_id
+                ):
+                    await process_message(websocket, data, room_code)
         except WebSocketDisconnect:
-            await ws_manager.disconnect(websocket)
+            # A migrated game outlives its room while players may still resume
+            await ws_manager.disconnect(
+                websocket, keep_game=migration_manager.is_resumable(room_code)
+            )
     except Exception as e:
         logger.error(f"Error in websocket connection: {str(e)}")
+        await ws_manager.disconnect(
+            websocket, keep_game=migration_manager.is_resumable(room_code)
+        )
+        if websocket.client_state.CONNECTED:
+            await websocket.close(code=1011, reason=f"Internal server error: {str(e)}")
+
+
+async def handle_spectator_connection(websocket: WebSocket, room_code: str) -> None:
+    """
+    Handle a new spectator WebSocket connection to a room.
+    Spectators only receive public frames and never join the room's players.
+    """
+    if not is_local_room(room_code):
+        url = room_router.redirect_url(websocket, room_code)
+        if url:
+            await redirect_connection(websocket, room_code, url)
+        else:
+            await websocket.close(code=4004, reason="Room not found")
+        return
+
+    rejection = admission_manager.check(creates_room=False)
+    if rejection:
+        await reject_connection(websocket, rejection)
+        return
+
+    try:
+        first_spectator = not spectator_manager.has_spectators(room_code)
+        watch_room(room_code)
+        await spectator_manager.connect(websocket, room_code)
+
+        # Send initial room state to the spectator
+        players = [p["name"] for p in ws_manager.get_room_players(room_code)]
+        await ws_manager.send_personal_message(
+            websocket,
+            {
+                "type": "spectator_joined",
+                "room_code": room_code,
+                "players": players,
+                "spectators": spectator_manager.get_spectator_count(room_code),
+            },
+        )
+
+        # Delayed spectators catch up from the game as it was the delay ago
+        if spectator_manager.delay > 0:
+            delayed_state = spectator_manager.get_delayed_state(room_code)
+            encoded_view = delayed_state[1] if delayed_state else None
+        elif game_manager.get_game(room_code):
+            encoded_view = get_encoded_spectator_game_view(room_code)
+        else:
+            encoded_view = None
+        if encoded_view:
+            await ws_manager.send_personal_text(
+                websocket, encode_game_state_message(encoded_view)
+            )
+        await send_chat_history(websocket, room_code, spectator_manager.delay)
+        if first_spectator and spectator_manager.delay > 0:
+            hold_back_recent_frames(room_code)
+
+        # Spectators can't send anything, just wait for them to leave
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            spectator_manager.disconnect(websocket)
+    except Exception as e:
+        logger.error(f"Error in spectator connection: {str(e)}")
+        spectator_manager.disconnect(websocket)
         if websocket.client_state.CONNECTED:
             await websocket.close(code=1011, reason=f"Internal server error: {str(e)}")
 
 
+async def reject_connection(
+    websocket: WebSocket, rejection: AdmissionRejection
+) -> None:
+    """
+    Turn a connection away because the server is overloaded. The socket is
+    accepted first, so the client gets the retry hint (browsers don't see
+    why a handshake was refused), then closed with 1013 (try again later).
+    """
+    await websocket.accept()
+    await websocket.send_json({"type": "server_busy", **rejection.model_dump()})
+    await websocket.close(
+        code=1013, reason=f"Server busy, retry in {rejection.retry_after}s"
+    )
+
+
+def is_local_room(room_code: str) -> bool:
+    """
+    Check if a room is open, or its game is held, in this worker.
+    """
+    return room_code in ws_manager.active_rooms or bool(
+        game_manager.get_game(room_code)
+    )
+
+
+def is_game_in_progress(room_code: str) -> bool:
+    """
+    Check if a room's game has started and isn't over yet.
+    """
+    game = game_manager.get_game(room_code)
+    return game is not None and game.status == GameStatus.PLAYING
+
+
+def redirect_room_request(request: Request, room_code: str) -> None:
+    """
+    Send an HTTP request about a room to the worker that owns it, with a 307
+    so the method and body are kept. Meant as a route dependency.
+    """
+    if is_local_room(room_code):
+        return
+    url = room_router.http_redirect_url(request, room_code)
+    if url:
+        raise HTTPException(status_code=307, headers={"Location": url})
+
+
+async def redirect_connection(websocket: WebSocket, room_code: str, url: str) -> None:
+    """
+    Send a connection to the worker owning its room. The client gets the
+    worker's URL and reconnects there with the same path and query.
+    """
+    await websocket.accept()
+    await websocket.send_json({"type": "redirect", "room_code": room_code, "url": url})
+    await websocket.close(code=1000, reason="Room is on another worker")
+
+
 def handle_chat_message(
     websocket: WebSocket, room_code: str, message_text: str
 ) -> dict:
     """
     Handle a chat message from a client.
+    The message is kept in the room's chat history.
     Returns the message to broadcast.
     """
     player_name = None
@@ -86,15 +304,23 @@ def handle_chat_message(
             break
 
     if player_name:
-        return {
-            "type": "chat",
-            "player": player_name,
-            "message": message_text,
-        }
+        return chat_manager.add(room_code, player_name, message_text)
 
     return None
 
 
+async def send_chat_history(
+    websocket: WebSocket, room_code: str, delay: float = 0.0
+) -> None:
+    """
+    Send a room's recent chat to a connection in one frame, if there is any.
+    With a delay, messages younger than it are left out.
+    """
+    frame = chat_manager.encode_history(room_code, delay)
+    if frame:
+        await ws_manager.send_personal_text(websocket, frame)
+
+
 def handle_player_ready(websocket: WebSocket, room_code: str, is_ready: bool) -> dict:
     """
     Handle a player ready status change.
@@ -118,7 +344,9 @@ def check_all_players_ready(room_code: str) -> bool:
     If they are, start the game.
     Returns True if the game was started, False otherwise.
     """
-    if not ws_manager.are_all_players_ready(room_code):
+    if not ws_manager.are_all_players_ready(room_code) or is_game_in_progress(
+        room_code
+    ):
         return False
 
     # Get all players in the room with their IDs
@@ -129,7 +357,10 @@ def check_all_players_ready(room_code: str) -> bool:
         player_info.append({"name": player["name"], "id": player_id})
 
     # Create a new game with the player IDs from the websocket manager
-    game_manager.create_game(room_code, player_info)
+    lobby_room = lobby_manager.get_room(room_code)
+    variation = lobby_room.variation if lobby_room else RoomVariation.COUP_O_CLOCK
+    game_manager.create_game(room_code, player_info, variation=variation)
+    lobby_manager.update_room(room_code, status=GameStatus.PLAYING)
 
     # Start the game
     game_manager.start_game(room_code)
@@ -137,8 +368,216 @@ def check_all_players_ready(room_code: str) -> bool:
     return True
 
 
+def mark_room_finished(room_code: str) -> None:
+    """
+    Mark a room's game as finished in the lobby and archive it.
+    """
+    lobby_manager.update_room(room_code, status=GameStatus.FINISHED)
+
+    game = game_manager.get_game(room_code)
+    if game:
+        # A game that can't be archived still ends normally for its players
+        try:
+            archive_manager.submit(game)
+        except Exception as e:
+            logger.error(f"Could not archive the game of room {room_code}: {str(e)}")
+
+
+def list_lobby_rooms(
+    status: Optional[GameStatus] = GameStatus.WAITING,
+    variation: Optional[str] = None,
+    min_free_seats: int = 1,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> LobbyPage:
+    """
+    List a page of rooms from the lobby directory.
+    """
+    return lobby_manager.list_rooms(status, variation, min_free_seats, limit, cursor)
+
+
+def import_migrated_rooms(snapshots: List[Dict]) -> List[str]:
+    """
+    Take over rooms handed off by a draining worker.
+    Returns the codes of the rooms that were imported.
+    """
+    return migration_manager.import_rooms(snapshots)
+
+
 def get_player_game_view(room_code: str, player_id: str) -> Optional[dict]:
     """
     Get the game state for a player.
     """
     return game_manager.get_player_view(room_code, player_id)
+
+
+def get_encoded_player_game_view(room_code: str, player_id: str) -> str:
+    """
+    Get the game state for a player, already JSON encoded.
+    """
+    return game_manager.get_encoded_player_view(room_code, player_id)
+
+
+def get_encoded_spectator_game_view(room_code: str) -> str:
+    """
+    Get the game state with every hand hidden, already JSON encoded.
+    """
+    return game_manager.get_encoded_spectator_view(room_code)
+
+
+def encode_game_state_message(encoded_view: str) -> str:
+    """Wrap an encoded game view in a game_state message"""
+    return '{"type": "game_state", "state": ' + encoded_view + "}"
+
+
+def watch_room(room_code: str) -> None:
+    """
+    Start keeping a room's public states for delayed readers, from its
+    current state, if nobody was watching it yet
+    """
+    if spectator_manager.delay <= 0 or spectator_manager.is_watched(room_code):
+        return
+    game = game_manager.get_game(room_code)
+    if game:
+        spectator_manager.record_state(
+            room_code, game.version, get_encoded_spectator_game_view(room_code)
+        )
+
+
+def hold_back_recent_frames(room_code: str) -> None:
+    """
+    Hold back for a room's first delayed spectator what was said and
+    played in the room but isn't due yet, oldest first
+    """
+    frames = chat_manager.recent_frames(room_code, spectator_manager.delay)
+    frames += [
+        (age, encode_game_state_message(encoded_view))
+        for age, encoded_view in spectator_manager.pending_states(room_code)
+    ]
+    if frames:
+        frames.sort(key=lambda frame: -frame[0])
+        spectator_manager.hold_back(room_code, frames)
+
+
+async def publish_spectator_game_state(room_code: str) -> None:
+    """
+    Send the public game state to a room's spectators, encoded once for all of them.
+    With a spectator delay, the state is also kept while the room is watched,
+    for readers that catch up later.
+    """
+    delayed = spectator_manager.delay > 0
+    if not spectator_manager.has_spectators(room_code) and not (
+        delayed and spectator_manager.is_watched(room_code)
+    ):
+        return
+
+    game = game_manager.get_game(room_code)
+    if not game:
+        return
+    encoded_view = get_encoded_spectator_game_view(room_code)
+    if delayed:
+        spectator_manager.record_state(room_code, game.version, encoded_view)
+    await spectator_manager.publish(room_code, encode_game_state_message(encoded_view))
+
+
+def game_etag(game: GameState, version: Optional[int] = None) -> str:
+    """
+    ETag of a game's state (at a version, the current one by default):
+    the version, qualified by a digest of the seed so a new game in a
+    recycled room never matches an old game's tag
+    """
+    seed = (game.seed or 0).to_bytes(8, "big")
+    version = game.version if version is None else version
+    return f'"{hashlib.blake2b(seed, digest_size=6).hexdigest()}-{version}"'
+
+
+async def handle_game_state_request(
+    room_code: str,
+    player_id: Optional[str] = None,
+    player_token: Optional[str] = None,
+    if_none_match: Optional[str] = None,
+    after_version: Optional[int] = None,
+    timeout: float = 0,
+) -> Response:
+    """
+    Handle a read-only request for a player's (or, without a player ID, a
+    spectator's) view of the game. A player's view needs the token the
+    player got in room_joined, and with a spectator delay everyone else sees
+    the game as it was the delay ago. The ETag changes with the game state,
+    so a client sending it back in If-None-Match gets a 304 until the game
+    changes. With after_version, the request is held until the version
+    moves past it or the timeout expires.
+    """
+    game = game_manager.get_game(room_code)
+    if not game:
+        return Response(status_code=404)
+
+    if player_id:
+        if not player_tokens.verify(room_code, player_id, player_token):
+            return Response(status_code=403)
+        if not any(p.id == player_id for p in game.players):
+            return Response(status_code=404)
+
+    delayed = not player_id and spectator_manager.delay > 0
+    if delayed:
+        watch_room(room_code)
+        spectator_manager.add_reader(room_code)
+        delayed_state = spectator_manager.get_delayed_state(room_code)
+        version = delayed_state[0] if delayed_state else -1
+    else:
+        version = game.version
+
+    if after_version is not None and version <= after_version:
+        if delayed:
+            await wait_for_delayed_version(room_code, after_version, timeout)
+        else:
+            await game_manager.wait_for_version(room_code, after_version, timeout)
+        # The game may have been removed while we were waiting
+        game = game_manager.get_game(room_code)
+        if not game:
+            return Response(status_code=404)
+
+    content = None
+    if delayed:
+        delayed_state = spectator_manager.get_delayed_state(room_code)
+        # Nothing of the game can be shown before it is older than the delay
+        if not delayed_state:
+            return Response(status_code=404)
+        version, content = delayed_state
+    else:
+        version = game.version
+
+    etag = game_etag(game, version)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache" if player_id else "no-cache",
+    }
+
+    if if_none_match:
+        client_etags = [
+            tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+        ]
+        if etag in client_etags or "*" in client_etags:
+            return Response(status_code=304, headers=headers)
+
+    if player_id:
+        content = game_manager.get_encoded_player_view(room_code, player_id)
+    elif content is None:
+        content = game_manager.get_encoded_spectator_view(room_code)
+
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+async def wait_for_delayed_version(
+    room_code: str, after_version: int, timeout: float
+) -> None:
+    """
+    Wait until the delayed view of a game is past after_version, or the
+    timeout expires: until the game moves on, then out the delay
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    await game_manager.wait_for_version(room_code, after_version, timeout)
+    due_at = spectator_manager.due_at(room_code, after_version)
+    if due_at is not None:
+        await asyncio.sleep(max(0.0, min(due_at, deadline) - loop.time()))
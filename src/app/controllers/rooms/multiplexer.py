@@ -0,0 +1,176 @@
+from typing import Dict, Optional, Set
+from fastapi import WebSocket, WebSocketDisconnect
+import asyncio
+import json
+import logging
+import os
+
+from app.controllers.migration import manager as migration_manager
+from app.controllers.rooms import controller as room_controller
+from app.controllers.websockets.channel_socket import ChannelSocket
+from app.models.room import RoomVariation
+
+logger = logging.getLogger(__name__)
+
+# Rooms one connection may be subscribed to at once
+MAX_CHANNELS = 64
+# Longest channel name a client may pick
+MAX_CHANNEL_LENGTH = 64
+
+
+class Multiplexer:
+    """
+    Carries several room subscriptions over one WebSocket. Each subscription
+    is a channel named by the client: it runs the same player or spectator
+    handler as a dedicated connection would, on a ChannelSocket, so admission,
+    draining, redirects and chat behave the same. Every frame either way
+    carries its channel; closing a channel sends channel_closed with the code
+    and reason a dedicated connection would have been closed with.
+    """
+
+    def __init__(self, max_channels: int = MAX_CHANNELS):
+        self.max_channels = max_channels
+        # Multiplexed connections currently open
+        self.connections: Set[WebSocket] = set()
+
+    async def handle(self, websocket: WebSocket) -> None:
+        """Handle a multiplexed connection for its whole lifetime"""
+        if migration_manager.draining:
+            await websocket.close(code=1012, reason="Server restarting")
+            return
+
+        await websocket.accept()
+        self.connections.add(websocket)
+        # Map of channel -> (channel socket, task running its handler)
+        channels: Dict[str, tuple] = {}
+        try:
+            while True:
+                data = await websocket.receive_text()
+                await self._route(websocket, channels, data)
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            logger.error(f"Error in multiplexed connection: {str(e)}")
+        finally:
+            self.connections.discard(websocket)
+            for channel_socket, _ in channels.values():
+                channel_socket.disconnect()
+            await asyncio.gather(
+                *(task for _, task in channels.values()), return_exceptions=True
+            )
+
+    async def _route(self, websocket: WebSocket, channels: Dict, data: str) -> None:
+        """Act on one frame from the client"""
+        try:
+            message = json.loads(data)
+        except json.JSONDecodeError:
+            await self._send_error(websocket, None, "Invalid JSON message")
+            return
+        if not isinstance(message, dict):
+            await self._send_error(websocket, None, "Invalid JSON message")
+            return
+
+        channel = message.get("channel")
+        if not isinstance(channel, str) or not 0 < len(channel) <= MAX_CHANNEL_LENGTH:
+            await self._send_error(websocket, None, "Missing or invalid channel")
+            return
+
+        message_type = message.get("type")
+        if message_type == "subscribe":
+            await self._subscribe(websocket, channels, channel, message)
+        elif channel not in channels:
+            await self._send_error(websocket, channel, "Not subscribed")
+        elif message_type == "unsubscribe":
+            channels[channel][0].disconnect()
+        else:
+            # The handler reads it like a frame of a dedicated connection
+            await channels[channel][0].inbox.put(data)
+
+    async def _subscribe(
+        self, websocket: WebSocket, channels: Dict, channel: str, message: dict
+    ) -> None:
+        """Open a channel running a player or spectator handler"""
+        if channel in channels:
+            await self._send_error(websocket, channel, "Channel already subscribed")
+            return
+        if len(channels) >= self.max_channels:
+            await self._send_error(websocket, channel, "Too many channels")
+            return
+        room_code = message.get("room_code")
+        if not isinstance(room_code, str) or not room_code:
+            await self._send_error(websocket, channel, "No room code specified")
+            return
+
+        if message.get("spectate"):
+            handler = room_controller.handle_spectator_connection
+            args = (room_code,)
+        else:
+            player_name = message.get("player_name")
+            if not isinstance(player_name, str) or not player_name:
+                await self._send_error(websocket, channel, "No player name specified")
+                return
+            try:
+                variation = RoomVariation(
+                    message.get("variation", RoomVariation.COUP_O_CLOCK)
+                )
+            except ValueError:
+                await self._send_error(websocket, channel, "Unknown variation")
+                return
+            handler = room_controller.handle_room_connection
+            args = (
+                room_code,
+                player_name,
+                bool(message.get("create", False)),
+                variation,
+                message.get("player_id") or None,
+                message.get("player_token") or None,
+            )
+
+        channel_socket = ChannelSocket(websocket, channel)
+        task = asyncio.create_task(
+            self._run_channel(websocket, channels, channel_socket, handler, args)
+        )
+        channels[channel] = (channel_socket, task)
+
+    async def _run_channel(
+        self, websocket: WebSocket, channels: Dict, channel_socket, handler, args
+    ) -> None:
+        """Run a channel's handler, then tell the client the channel is closed"""
+        try:
+            await handler(channel_socket, *args)
+        except Exception as e:
+            logger.error(f"Error in channel {channel_socket.channel}: {str(e)}")
+        finally:
+            channels.pop(channel_socket.channel, None)
+            channel_socket.disconnect()
+
+        if websocket not in self.connections:
+            return
+        if channel_socket.close_code is None:
+            code, reason = 1000, "Unsubscribed"
+        else:
+            code, reason = channel_socket.close_code, channel_socket.close_reason or ""
+        try:
+            await websocket.send_json(
+                {
+                    "channel": channel_socket.channel,
+                    "type": "channel_closed",
+                    "code": code,
+                    "reason": reason,
+                }
+            )
+        except Exception:
+            # The connection went away meanwhile
+            pass
+
+    async def _send_error(
+        self, websocket: WebSocket, channel: Optional[str], message: str
+    ) -> None:
+        frame = {"type": "error", "message": message}
+        if channel is not None:
+            frame = {"channel": channel, **frame}
+        await websocket.send_json(frame)
+
+
+# Create a singleton instance
+manager = Multiplexer(max_channels=int(os.getenv("MUX_MAX_CHANNELS", MAX_CHANNELS)))
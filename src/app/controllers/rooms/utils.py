@@ -1,7 +1,6 @@
-import random
-import string
+from app.controllers.room_codes import manager as room_code_manager
 
 
 def generate_room_code() -> str:
     """Generates a UNIQUE 5 character string. [A-Z0-9]"""
-    return "".join(random.choices(string.ascii_uppercase + string.digits, k=5))
+    return room_code_manager.allocate()
@@ -0,0 +1,20 @@
+from app.controllers.tracing.tracer import tracer, traced
+from app.controllers.tracing.exporters import (
+    FileSpanExporter,
+    JsonFileExporter,
+    OtlpJsonFileExporter,
+    RingBufferExporter,
+    SpanExporter,
+)
+from app.controllers.tracing.config import configure_tracing
+
+__all__ = [
+    "tracer",
+    "traced",
+    "configure_tracing",
+    "SpanExporter",
+    "FileSpanExporter",
+    "RingBufferExporter",
+    "JsonFileExporter",
+    "OtlpJsonFileExporter",
+]
@@ -0,0 +1,37 @@
+import os
+
+from app.controllers.tracing.exporters import (
+    JsonFileExporter,
+    OtlpJsonFileExporter,
+    RingBufferExporter,
+)
+from app.controllers.tracing.tracer import Tracer
+
+
+def configure_tracing(tracer: Tracer) -> None:
+    """
+    Set up a tracer from the environment:
+    - TRACE_SAMPLE_RATE: fraction of messages traced (default 0, off)
+    - TRACE_EXPORTERS: comma separated list of ring, json and otlp (default ring)
+    - TRACE_JSON_PATH / TRACE_OTLP_PATH: files the json and otlp exporters append to
+    - TRACES_ADMIN_TOKEN: token GET /traces needs to read the ring (off without one)
+    """
+    tracer.sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+    tracer.exporters = []
+
+    for name in os.getenv("TRACE_EXPORTERS", "ring").split(","):
+        name = name.strip()
+        if name == "ring":
+            tracer.add_exporter(
+                RingBufferExporter(token=os.getenv("TRACES_ADMIN_TOKEN"))
+            )
+        elif name == "json":
+            tracer.add_exporter(
+                JsonFileExporter(os.getenv("TRACE_JSON_PATH", "traces.jsonl"))
+            )
+        elif name == "otlp":
+            tracer.add_exporter(
+                OtlpJsonFileExporter(os.getenv("TRACE_OTLP_PATH", "traces.otlp.jsonl"))
+            )
+        elif name:
+            raise ValueError(f"Unknown trace exporter {name}")
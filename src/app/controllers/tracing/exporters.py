@@ -0,0 +1,193 @@
+from typing import Deque, Dict, List, Optional
+from abc import ABC, abstractmethod
+from collections import deque
+import json
+import logging
+import threading
+
+from app.controllers.tracing.tracer import Span
+
+logger = logging.getLogger(__name__)
+
+# Traces kept by the in-memory exporter, older traces are dropped first
+RING_BUFFER_SIZE = 1000
+# Seconds between writes of the file exporters
+FLUSH_INTERVAL = 1.0
+# Traces a file exporter holds while its writer catches up, older ones are dropped first
+MAX_PENDING_TRACES = 10000
+
+
+class SpanExporter(ABC):
+    """Receives the spans of every finished, sampled trace"""
+
+    @abstractmethod
+    def export(self, spans: List[Span]) -> None:
+        """Take a finished trace, called on the event loop so it must not block"""
+
+    def start(self) -> None:
+        """Start any background work, once the server is up"""
+
+    def stop(self) -> None:
+        """Finish any background work, before the server exits"""
+
+
+class RingBufferExporter(SpanExporter):
+    """Keeps the most recent traces in memory"""
+
+    def __init__(self, size: int = RING_BUFFER_SIZE, token: Optional[str] = None):
+        self.traces: Deque[List[Span]] = deque(maxlen=size)
+        # Admin token reading the traces over HTTP needs, off without one
+        self.token = token
+
+    def export(self, spans: List[Span]) -> None:
+        self.traces.append(spans)
+
+    def get_traces(
+        self, room_code: Optional[str] = None, limit: int = 50
+    ) -> List[List[Dict]]:
+        """Get the most recent traces, newest first, optionally of one room"""
+        traces = []
+        for spans in reversed(self.traces):
+            if room_code and not any(
+                span.attributes.get("room_code") == room_code for span in spans
+            ):
+                continue
+            traces.append([span.to_dict() for span in spans])
+            if len(traces) >= limit:
+                break
+        return traces
+
+
+class FileSpanExporter(SpanExporter):
+    """
+    Appends traces to a file from a background thread. export() only queues
+    the spans; the writer thread wakes up every flush interval, encodes what
+    was queued and writes it in one go, so the loop never waits on the disk.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_interval: float = FLUSH_INTERVAL,
+        max_pending: int = MAX_PENDING_TRACES,
+    ):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.pending: Deque[List[Span]] = deque(maxlen=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @abstractmethod
+    def encode(self, spans: List[Span]) -> str:
+        """Encode a trace as the lines written to the file"""
+
+    def export(self, spans: List[Span]) -> None:
+        self.pending.append(spans)
+
+    def start(self) -> None:
+        """Start the writer thread"""
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._write_loop, name="trace-file-writer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Write what is still queued and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+
+    def _write_loop(self) -> None:
+        try:
+            with open(self.path, "a") as file:
+                while not self._stopped.wait(self.flush_interval):
+                    self._flush(file)
+                self._flush(file)
+        except OSError as e:
+            logger.error(f"Error writing traces to {self.path}: {str(e)}")
+
+    def _flush(self, file) -> None:
+        """Write every queued trace, from the writer thread"""
+        lines = []
+        while self.pending:
+            try:
+                lines.append(self.encode(self.pending.popleft()))
+            except Exception as e:
+                logger.error(f"Error encoding trace: {str(e)}")
+        if lines:
+            file.write("".join(lines))
+            file.flush()
+
+
+class JsonFileExporter(FileSpanExporter):
+    """Appends every span to a file as a line of JSON"""
+
+    def encode(self, spans: List[Span]) -> str:
+        return "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+
+
+class OtlpJsonFileExporter(FileSpanExporter):
+    """
+    Appends every trace to a file as an OTLP/JSON export request, one per
+    line, the format read by the OpenTelemetry Collector's otlpjsonfile receiver.
+    """
+
+    def __init__(self, path: str, service_name: str = "coup-o-clock", **kwargs):
+        super().__init__(path, **kwargs)
+        self.resource = {
+            "attributes": [
+                {"key": "service.name", "value": {"stringValue": service_name}}
+            ]
+        }
+
+    def encode(self, spans: List[Span]) -> str:
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": self.resource,
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "app"},
+                            "spans": [self._encode_span(span) for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        return json.dumps(request) + "\n"
+
+    @staticmethod
+    def _encode_span(span: Span) -> Dict:
+        encoded = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            # SPAN_KIND_INTERNAL
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_time),
+            "endTimeUnixNano": str(span.end_time),
+            "attributes": [
+                {"key": key, "value": OtlpJsonFileExporter._encode_value(value)}
+                for key, value in span.attributes.items()
+            ],
+            # STATUS_CODE_OK / STATUS_CODE_ERROR
+            "status": {"code": 2 if span.status == "error" else 1},
+        }
+        if span.parent_id:
+            encoded["parentSpanId"] = span.parent_id
+        return encoded
+
+    @staticmethod
+    def _encode_value(value) -> Dict:
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, int):
+            return {"intValue": str(value)}
+        if isinstance(value, float):
+            return {"doubleValue": value}
+        return {"stringValue": str(value)}
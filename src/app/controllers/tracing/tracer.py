@@ -0,0 +1,194 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+import functools
+import inspect
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """A timed stage of a traced request"""
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start_time",
+        "end_time",
+        "attributes",
+        "status",
+        "trace_spans",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str],
+        trace_spans: List["Span"],
+        attributes: Dict[str, Any],
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        # Unix time in nanoseconds
+        self.start_time = time.time_ns()
+        self.end_time: Optional[int] = None
+        self.attributes = attributes
+        self.status = "ok"
+        # Finished spans of the whole trace, exported when the root span ends
+        self.trace_spans = trace_spans
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_time is None:
+            return None
+        return (self.end_time - self.start_time) / 1e6
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+
+class _NoopSpan:
+    """Stands in for spans of traces that weren't sampled"""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+# Span of the current request, NOOP_SPAN inside an unsampled trace
+_current_span: ContextVar[Optional[Any]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Creates spans for the stages of a request. The current span is carried in
+    a context variable, so it follows the request through awaits and into
+    tasks created from it. Whether a trace is recorded is decided once when
+    its root span starts (head sampling); spans of unsampled traces cost a
+    context variable lookup. Finished traces are handed to every exporter.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, exporters: Optional[List] = None):
+        # Fraction of traces recorded, between 0 and 1
+        self.sample_rate = sample_rate
+        self.exporters = exporters or []
+
+    def add_exporter(self, exporter) -> None:
+        """Plug in an exporter for finished traces"""
+        self.exporters.append(exporter)
+
+    def start(self) -> None:
+        """Start the exporters' background work"""
+        for exporter in self.exporters:
+            exporter.start()
+
+    def stop(self) -> None:
+        """Stop the exporters' background work, writing out what they hold"""
+        for exporter in self.exporters:
+            exporter.stop()
+
+    def get_exporter(self, exporter_type: type):
+        """Get the first exporter of a type"""
+        for exporter in self.exporters:
+            if isinstance(exporter, exporter_type):
+                return exporter
+        return None
+
+    def current_span(self):
+        """Get the span of the current request"""
+        return _current_span.get() or NOOP_SPAN
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator:
+        """Time a block as a span, a child of the current span if there is one"""
+        parent = _current_span.get()
+        if parent is NOOP_SPAN:
+            yield NOOP_SPAN
+            return
+
+        if parent is None:
+            # Head sampling, children follow the decision of their root
+            if not self.exporters or random.random() >= self.sample_rate:
+                token = _current_span.set(NOOP_SPAN)
+                try:
+                    yield NOOP_SPAN
+                finally:
+                    _current_span.reset(token)
+                return
+            span = Span(name, f"{random.getrandbits(128):032x}", None, [], attributes)
+        else:
+            span = Span(
+                name, parent.trace_id, parent.span_id, parent.trace_spans, attributes
+            )
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.attributes["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_time = time.time_ns()
+            span.trace_spans.append(span)
+            if parent is None:
+                self._export(span.trace_spans)
+
+    def _export(self, spans: List[Span]) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter.export(spans)
+            except Exception as e:
+                logger.error(f"Error exporting trace: {str(e)}")
+
+
+def traced(name: Optional[str] = None):
+    """Decorate a function or coroutine function so each call is a span"""
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(span_name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# Create a singleton instance, configured by configure_tracing
+tracer = Tracer()
@@ -1,4 +1,5 @@
 from app.controllers.websockets.connection_manager import manager
+from app.controllers.websockets.spectator_manager import manager as spectator_manager
 from app.controllers.websockets.message_handler import process_message
 
-__all__ = ["manager", "process_message"]
+__all__ = ["manager", "spectator_manager", "process_message"]
@@ -0,0 +1,75 @@
+from typing import Optional
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.websockets import WebSocketState
+import asyncio
+import json
+
+# Client frames waiting for a channel's handler before the connection stops reading
+CHANNEL_QUEUE_SIZE = 32
+
+
+class ChannelSocket:
+    """
+    One channel of a multiplexed connection, standing in for a WebSocket.
+    The room and spectator handlers run on it unchanged: frames they send go
+    out on the shared connection with the channel spliced in (no re-encoding),
+    frames the client sends on the channel are queued for receive_text, and
+    closing it ends the channel while the connection stays open.
+    """
+
+    def __init__(
+        self, websocket: WebSocket, channel: str, queue_size: int = CHANNEL_QUEUE_SIZE
+    ):
+        self.websocket = websocket
+        self.channel = channel
+        self.prefix = '{"channel": ' + json.dumps(channel) + ", "
+        self.inbox: asyncio.Queue = asyncio.Queue(queue_size)
+        self.client_state = WebSocketState.CONNECTED
+        # Close code and reason when the server side closed the channel
+        self.close_code: Optional[int] = None
+        self.close_reason: Optional[str] = None
+
+    @property
+    def url(self):
+        return self.websocket.url
+
+    async def accept(self) -> None:
+        """The shared connection is already accepted"""
+
+    async def send_text(self, text: str) -> None:
+        """Send an encoded JSON object on the channel"""
+        if self.client_state != WebSocketState.CONNECTED:
+            return
+        await self.websocket.send_text(self.tag(text))
+
+    async def send_json(self, data: dict) -> None:
+        await self.send_text(json.dumps(data))
+
+    def tag(self, text: str) -> str:
+        """Add the channel to an encoded JSON object"""
+        if text == "{}":
+            return self.prefix[:-2] + "}"
+        return self.prefix + text[1:]
+
+    async def receive_text(self) -> str:
+        """Wait for the client's next frame on the channel"""
+        text = await self.inbox.get()
+        if text is None:
+            raise WebSocketDisconnect(self.close_code or 1000)
+        return text
+
+    async def close(self, code: int = 1000, reason: Optional[str] = None) -> None:
+        """Close the channel from the server side"""
+        if self.client_state != WebSocketState.CONNECTED:
+            return
+        self.close_code = code
+        self.close_reason = reason
+        self.disconnect()
+
+    def disconnect(self) -> None:
+        """End the channel, waking its handler up if it's waiting for a frame"""
+        self.client_state = WebSocketState.DISCONNECTED
+        # Frames still queued are dropped, the handler only needs to see the end
+        while not self.inbox.empty():
+            self.inbox.get_nowait()
+        self.inbox.put_nowait(None)
@@ -1,8 +1,28 @@
 from typing import Dict, List, Set, Optional
 from fastapi import WebSocket
+from app.controllers.websockets.spectator_manager import manager as spectator_manager
+from app.controllers.chat import manager as chat_manager
+from app.controllers.game import manager as game_manager
+from app.controllers.lobby import manager as lobby_manager
+from app.controllers.room_codes import manager as room_code_manager
+from app.controllers.metrics import BROADCAST_BYTES, BROADCAST_SECONDS
+from app.controllers.tracing import tracer, traced
+from app.models.room import RoomVariation
 import json
+import time
 import uuid
 
+# Room broadcasts spectators see too, everything else only goes to the players
+SPECTATOR_FRAME_TYPES = {
+    "player_joined",
+    "player_left",
+    "player_ready",
+    "chat",
+    "game_start",
+    "game_action_result",
+    "game_over",
+}
+
 
 class ConnectionManager:
     def __init__(self):
@@ -16,19 +36,29 @@ class ConnectionManager:
         self.player_ids: Dict[WebSocket, str] = {}
 
     async def connect(
-        self, websocket: WebSocket, room_code: str, player_name: str
+        self,
+        websocket: WebSocket,
+        room_code: str,
+        player_name: str,
+        variation: str = RoomVariation.COUP_O_CLOCK,
+        player_id: Optional[str] = None,
     ) -> str:
-        """Connect a websocket to a room and return the player ID"""
+        """
+        Connect a websocket to a room and return the player ID. A player
+        resuming a seat (e.g. after a migration) passes their old player ID.
+        """
         await websocket.accept()
 
         # Generate a unique player ID
-        player_id = str(uuid.uuid4())
+        player_id = player_id or str(uuid.uuid4())
         self.player_ids[websocket] = player_id
 
         # Create room if it doesn't exist
         if room_code not in self.active_rooms:
             self.active_rooms[room_code] = set()
             self.room_players[room_code] = []
+            lobby_manager.add_room(room_code, variation)
+            room_code_manager.acquire(room_code)
 
         # Add connection to room
         self.active_rooms[room_code].add(websocket)
@@ -37,6 +67,7 @@ class ConnectionManager:
         # Add player to room
         player_info = {"name": player_name, "websocket": websocket, "is_ready": False}
         self.room_players[room_code].append(player_info)
+        lobby_manager.update_room(room_code, players=len(self.room_players[room_code]))
 
         # Notify all clients in the room about the new player
         await self.broadcast_to_room(
@@ -50,8 +81,12 @@ class ConnectionManager:
 
         return player_id
 
-    async def disconnect(self, websocket: WebSocket):
-        """Disconnect a websocket from its room"""
+    async def disconnect(self, websocket: WebSocket, keep_game: bool = False):
+        """
+        Disconnect a websocket from its room. The room's game goes with the
+        room's last connection, unless keep_game (e.g. while a migrated game
+        waits for its other players).
+        """
         if websocket not in self.connection_rooms:
             return
 
@@ -77,7 +112,10 @@ class ConnectionManager:
         if not self.active_rooms[room_code]:
             del self.active_rooms[room_code]
             del self.room_players[room_code]
+            self._release_room(room_code, keep_game)
         else:
+            self._update_lobby_counts(room_code)
+
             # Notify remaining clients about the player leaving
             await self.broadcast_to_room(
                 room_code,
@@ -88,18 +126,84 @@ class ConnectionManager:
                 },
             )
 
+    async def close_room(self, room_code: str, code: int, reason: str) -> None:
+        """Close every connection of a room at once, without player_left notices"""
+        connections = self.active_rooms.pop(room_code, set())
+        self.room_players.pop(room_code, None)
+        for websocket in connections:
+            self.connection_rooms.pop(websocket, None)
+            self.player_ids.pop(websocket, None)
+        self._release_room(room_code)
+
+        for websocket in connections:
+            try:
+                await websocket.close(code=code, reason=reason)
+            except Exception:
+                # Already gone
+                pass
+
+    def _release_room(self, room_code: str, keep_game: bool = False) -> None:
+        """Drop what a closed room held, then let its code go"""
+        lobby_manager.remove_room(room_code)
+        chat_manager.remove_room(room_code)
+        spectator_manager.remove_room(room_code)
+        # Remove the game before the code can be handed out to another room
+        if not keep_game:
+            game_manager.remove_game(room_code)
+        room_code_manager.release(room_code)
+
+    @traced()
     async def broadcast_to_room(self, room_code: str, message: dict):
         """Send a message to all connections in a room"""
         if room_code not in self.active_rooms:
             return
 
-        for connection in self.active_rooms[room_code]:
-            await connection.send_text(json.dumps(message))
+        start = time.perf_counter()
+
+        # Encode once for every player and spectator (JSON is ASCII, so one character is one byte)
+        text = json.dumps(message)
+        connections = self.active_rooms[room_code]
+        tracer.current_span().set_attribute("recipients", len(connections))
+        for connection in connections:
+            await connection.send_text(text)
+        BROADCAST_BYTES.inc(len(text) * len(connections), "player")
 
+        spectator_frame = self._spectator_frame(message)
+        if spectator_frame is not None:
+            await spectator_manager.publish(
+                room_code,
+                text if spectator_frame is message else json.dumps(spectator_frame),
+            )
+        BROADCAST_SECONDS.observe(time.perf_counter() - start)
+
+    @staticmethod
+    def _spectator_frame(message: dict) -> Optional[dict]:
+        """
+        The part of a room broadcast spectators may see, None if nothing:
+        frames of other types stay with the players, and action results are
+        rebuilt from their public fields
+        """
+        if message.get("type") not in SPECTATOR_FRAME_TYPES:
+            return None
+        if message["type"] != "game_action_result":
+            return message
+        return {
+            "type": "game_action_result",
+            "action_type": message.get("action_type"),
+            "player": message.get("player"),
+            "result": game_manager.public_result(message.get("result") or {}),
+        }
+
+    @traced()
     async def send_personal_message(self, websocket: WebSocket, message: dict):
         """Send a message to a specific connection"""
         await websocket.send_text(json.dumps(message))
 
+    @traced()
+    async def send_personal_text(self, websocket: WebSocket, text: str):
+        """Send an already encoded message to a specific connection"""
+        await websocket.send_text(text)
+
     def get_room_players(self, room_code: str) -> List[Dict]:
         """Get all players in a room"""
         return self.room_players.get(room_code, [])
@@ -118,6 +222,7 @@ class ConnectionManager:
         for player in self.room_players[room_code]:
             if player["websocket"] == websocket:
                 player["is_ready"] = is_ready
+                self._update_lobby_counts(room_code)
                 return True
 
         return False
@@ -129,6 +234,15 @@ class ConnectionManager:
 
         return all(player["is_ready"] for player in self.room_players[room_code])
 
+    def _update_lobby_counts(self, room_code: str) -> None:
+        """Refresh a room's player and ready counts in the lobby"""
+        players = self.room_players[room_code]
+        lobby_manager.update_room(
+            room_code,
+            players=len(players),
+            ready_players=sum(1 for player in players if player["is_ready"]),
+        )
+
 
 # Create a singleton instance
 manager = ConnectionManager()
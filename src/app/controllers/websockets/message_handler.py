@@ -1,21 +1,44 @@
 import json
 import logging
+import time
 from fastapi import WebSocket
 from typing import Dict, Any
 
 from app.controllers.websockets import manager as ws_manager
 from app.controllers.rooms import controller as room_controller
 from app.controllers.game import manager as game_manager
+from app.controllers.loop_lag import monitor as stall_monitor
+from app.controllers.metrics import MESSAGE_SECONDS
+from app.controllers.tracing import tracer, traced
 from app.models.game import GameStatus
 
 logger = logging.getLogger(__name__)
 
+# Message and action types get their own metrics, anything else is counted as "other"
+MESSAGE_TYPES = {"chat", "ready", "game_action"}
+GAME_ACTION_TYPES = {
+    "perform_action",
+    "challenge",
+    "pass_challenge",
+    "counter",
+    "pass_counter",
+    "complete_exchange",
+}
 
+
+@traced("process_message")
 async def process_message(websocket: WebSocket, data: str, room_code: str) -> None:
     """Process a message from a client"""
+    start = time.perf_counter()
+    message_type = action_type = None
     try:
+        stall_monitor.annotate(room_code=room_code)
         message = json.loads(data)
         message_type = message.get("type")
+        tracer.current_span().set_attribute("message_type", message_type)
+        stall_monitor.annotate(
+            message_type=message_type if message_type in MESSAGE_TYPES else "other"
+        )
         player_id = ws_manager.get_player_id(websocket)
 
         if not player_id:
@@ -34,6 +57,13 @@ async def process_message(websocket: WebSocket, data: str, room_code: str) -> No
                     await ws_manager.broadcast_to_room(room_code, chat_message)
 
         elif message_type == "ready":
+            # Readiness only counts before a game starts
+            if room_controller.is_game_in_progress(room_code):
+                await ws_manager.send_personal_message(
+                    websocket, {"type": "error", "message": "Game already in progress"}
+                )
+                return
+
             # Handle player ready status
             is_ready = message.get("ready", False)
             ready_message = room_controller.handle_player_ready(
@@ -65,16 +95,20 @@ async def process_message(websocket: WebSocket, data: str, room_code: str) -> No
                     player_ws = player["websocket"]
                     player_id = ws_manager.get_player_id(player_ws)
                     if player_id:
-                        player_view = room_controller.get_player_game_view(
+                        player_view = room_controller.get_encoded_player_game_view(
                             room_code, player_id
                         )
                         logger.info(
                             f"Sending game state to player {player['name']} (ID: {player_id}): {player_view}"
                         )
-                        await ws_manager.send_personal_message(
-                            player_ws, {"type": "game_state", "state": player_view}
+                        await ws_manager.send_personal_text(
+                            player_ws,
+                            room_controller.encode_game_state_message(player_view),
                         )
 
+                # Send the public game state to spectators
+                await room_controller.publish_spectator_game_state(room_code)
+
         elif message_type == "game_action":
             # Get the game state
             game_state = game_manager.get_game(room_code)
@@ -87,6 +121,10 @@ async def process_message(websocket: WebSocket, data: str, room_code: str) -> No
             # Process the game action based on the action type
             action = message.get("action", {})
             action_type = action.get("action_type")
+            tracer.current_span().set_attribute("action_type", action_type)
+            stall_monitor.annotate(
+                action_type=action_type if action_type in GAME_ACTION_TYPES else "other"
+            )
 
             logger.info(f"Received game action: {action}")
 
@@ -158,7 +196,7 @@ async def process_message(websocket: WebSocket, data: str, room_code: str) -> No
                 {
                     "type": "game_action_result",
                     "action_type": action_type,
-                    "result": result,
+                    "result": game_manager.public_result(result),
                     "player": player_name or "Unknown",
                 },
             )
@@ -172,6 +210,8 @@ async def process_message(websocket: WebSocket, data: str, room_code: str) -> No
                         winner = player.name
                         break
 
+                room_controller.mark_room_finished(room_code)
+
                 # Send game over message
                 await ws_manager.broadcast_to_room(
                     room_code,
@@ -186,13 +226,17 @@ async def process_message(websocket: WebSocket, data: str, room_code: str) -> No
                 player_ws = player["websocket"]
                 player_id = ws_manager.get_player_id(player_ws)
                 if player_id:
-                    player_view = room_controller.get_player_game_view(
+                    player_view = room_controller.get_encoded_player_game_view(
                         room_code, player_id
                     )
-                    await ws_manager.send_personal_message(
-                        player_ws, {"type": "game_state", "state": player_view}
+                    await ws_manager.send_personal_text(
+                        player_ws,
+                        room_controller.encode_game_state_message(player_view),
                     )
 
+            # Update game state for spectators
+            await room_controller.publish_spectator_game_state(room_code)
+
     except json.JSONDecodeError:
         await ws_manager.send_personal_message(
             websocket, {"type": "error", "message": "Invalid JSON message"}
@@ -203,3 +247,10 @@ async def process_message(websocket: WebSocket, data: str, room_code: str) -> No
             websocket,
             {"type": "error", "message": f"Error processing message: {str(e)}"},
         )
+    finally:
+        stall_monitor.clear()
+        MESSAGE_SECONDS.observe(
+            time.perf_counter() - start,
+            message_type if message_type in MESSAGE_TYPES else "other",
+            action_type if action_type in GAME_ACTION_TYPES else "",
+        )
@@ -0,0 +1,234 @@
+from typing import Deque, Dict, List, Optional, Set, Tuple
+from collections import deque
+from fastapi import WebSocket
+from app.controllers.metrics import BROADCAST_BYTES
+from app.controllers.tracing import traced
+import asyncio
+import contextvars
+import os
+
+# Frames held back for delayed spectators, older frames are dropped first
+SPECTATOR_BUFFER_SIZE = 256
+# Seconds a seatless HTTP read keeps a room's delayed states recorded
+READER_TTL = 60.0
+
+
+class SpectatorManager:
+    """
+    Spectators subscribe to a room's public frames without joining it, so they
+    never count towards readiness or game membership. Every frame is encoded
+    once and the same string is sent to every spectator of the room. With a
+    delay, frames are held back while a room has spectators, and its public
+    states are kept until they are due while it is watched (by spectators,
+    or recently read over HTTP without a seat), so those readers get the
+    game as it was the delay ago. Rooms nobody watches hold nothing.
+    """
+
+    def __init__(
+        self,
+        delay: float = 0.0,
+        buffer_size: int = SPECTATOR_BUFFER_SIZE,
+        reader_ttl: float = READER_TTL,
+    ):
+        # Seconds to hold frames back before spectators see them
+        self.delay = delay
+        self.buffer_size = buffer_size
+        self.reader_ttl = reader_ttl
+        # Map of room_code -> set of spectator connections
+        self.room_spectators: Dict[str, Set[WebSocket]] = {}
+        # Map of websocket -> room_code
+        self.spectator_rooms: Dict[WebSocket, str] = {}
+        # Map of room_code -> ring buffer of (publish time, frame) waiting for the delay
+        self.buffers: Dict[str, Deque[Tuple[float, str]]] = {}
+        # Map of room_code -> task sending buffered frames once they are due
+        self.drain_tasks: Dict[str, asyncio.Task] = {}
+        # Map of room_code -> (publish time, version, encoded public view),
+        # the newest due state first, kept while the room is watched
+        self.delayed_states: Dict[str, Deque[Tuple[float, int, str]]] = {}
+        # Map of room_code -> loop time until which seatless HTTP reads watch it
+        self.readers: Dict[str, float] = {}
+
+    async def connect(self, websocket: WebSocket, room_code: str) -> None:
+        """Subscribe a websocket to a room's spectator frames"""
+        await websocket.accept()
+
+        if room_code not in self.room_spectators:
+            self.room_spectators[room_code] = set()
+        self.room_spectators[room_code].add(websocket)
+        self.spectator_rooms[websocket] = room_code
+
+    def disconnect(self, websocket: WebSocket) -> None:
+        """Unsubscribe a spectator from its room"""
+        room_code = self.spectator_rooms.pop(websocket, None)
+        if room_code is None:
+            return
+
+        spectators = self.room_spectators.get(room_code)
+        if spectators is not None:
+            spectators.discard(websocket)
+            if not spectators:
+                self._remove_room(room_code)
+
+    def has_spectators(self, room_code: str) -> bool:
+        """Check if anyone is watching a room"""
+        return bool(self.room_spectators.get(room_code))
+
+    def get_spectator_count(self, room_code: str) -> int:
+        """Get the number of spectators of a room"""
+        return len(self.room_spectators.get(room_code, ()))
+
+    def add_reader(self, room_code: str) -> None:
+        """Watch a room for a while on behalf of a seatless HTTP reader"""
+        self.readers[room_code] = asyncio.get_running_loop().time() + self.reader_ttl
+
+    def is_watched(self, room_code: str) -> bool:
+        """
+        Check if a room has spectators or recent seatless readers. The kept
+        states of a room nobody watches anymore are dropped.
+        """
+        if self.has_spectators(room_code) or self._has_readers(room_code):
+            return True
+        self.delayed_states.pop(room_code, None)
+        return False
+
+    def record_state(self, room_code: str, version: int, encoded_view: str) -> None:
+        """Keep a room's new public state until the delay lets it be seen"""
+        if room_code not in self.delayed_states:
+            self.delayed_states[room_code] = deque(maxlen=self.buffer_size)
+        self._drop_stale_states(room_code)
+        self.delayed_states[room_code].append(
+            (asyncio.get_running_loop().time(), version, encoded_view)
+        )
+
+    def get_delayed_state(self, room_code: str) -> Optional[Tuple[int, str]]:
+        """
+        Get the (version, encoded public view) of a room's game as it was the
+        delay ago, None if the game is younger than that
+        """
+        self._drop_stale_states(room_code)
+        states = self.delayed_states.get(room_code)
+        if not states or not self._is_due(states[0][0]):
+            return None
+        _, version, encoded_view = states[0]
+        return version, encoded_view
+
+    def pending_states(self, room_code: str) -> List[Tuple[float, str]]:
+        """Get the (age in seconds, encoded view) of a room's states not due yet, oldest first"""
+        now = asyncio.get_running_loop().time()
+        return [
+            (now - published_at, encoded_view)
+            for published_at, _, encoded_view in self.delayed_states.get(room_code, ())
+            if not self._is_due(published_at)
+        ]
+
+    def due_at(self, room_code: str, after_version: int) -> Optional[float]:
+        """Get the loop time a room's first state past a version is due"""
+        for published_at, version, _ in self.delayed_states.get(room_code, ()):
+            if version > after_version:
+                return published_at + self.delay
+        return None
+
+    def remove_room(self, room_code: str) -> None:
+        """
+        Forget the states kept for a closed room. Its buffered frames still
+        go out to the spectators watching when they are due.
+        """
+        self.delayed_states.pop(room_code, None)
+        self.readers.pop(room_code, None)
+
+    def _has_readers(self, room_code: str) -> bool:
+        """Check if seatless HTTP readers still watch a room"""
+        until = self.readers.get(room_code)
+        if until is None:
+            return False
+        if until <= asyncio.get_running_loop().time():
+            del self.readers[room_code]
+            return False
+        return True
+
+    def _drop_stale_states(self, room_code: str) -> None:
+        """Drop the states of a room that a newer due state replaces"""
+        states = self.delayed_states.get(room_code)
+        while states and len(states) > 1 and self._is_due(states[1][0]):
+            states.popleft()
+
+    def _is_due(self, published_at: float) -> bool:
+        return published_at + self.delay <= asyncio.get_running_loop().time()
+
+    @traced()
+    async def publish(self, room_code: str, frame: str):
+        """
+        Send an encoded frame to every spectator of a room, after the
+        spectator delay if one is configured
+        """
+        if not self.has_spectators(room_code):
+            return
+        if self.delay <= 0:
+            await self._send_to_spectators(room_code, frame)
+            return
+        self.hold_back(room_code, [(0.0, frame)])
+
+    def hold_back(self, room_code: str, frames: List[Tuple[float, str]]) -> None:
+        """
+        Buffer (age in seconds, frame) pairs, oldest first, to send to a
+        room's spectators once they are the delay old
+        """
+        if room_code not in self.buffers:
+            self.buffers[room_code] = deque(maxlen=self.buffer_size)
+        now = asyncio.get_running_loop().time()
+        self.buffers[room_code].extend((now - age, frame) for age, frame in frames)
+
+        if room_code not in self.drain_tasks:
+            # Delayed frames are sent outside the trace of the message that produced them
+            self.drain_tasks[room_code] = asyncio.create_task(
+                self._drain(room_code), context=contextvars.Context()
+            )
+
+    async def _drain(self, room_code: str) -> None:
+        """Send buffered frames of a room as they become due"""
+        loop = asyncio.get_running_loop()
+        try:
+            buffer = self.buffers.get(room_code)
+            while buffer:
+                published_at, frame = buffer[0]
+                wait = published_at + self.delay - loop.time()
+                if wait > 0:
+                    # The buffer may have dropped this frame meanwhile, so look again
+                    await asyncio.sleep(wait)
+                    continue
+                buffer.popleft()
+                await self._send_to_spectators(room_code, frame)
+        finally:
+            # A room whose spectators all left may have a new drain already
+            if self.drain_tasks.get(room_code) is asyncio.current_task():
+                del self.drain_tasks[room_code]
+                if not self.buffers.get(room_code):
+                    self.buffers.pop(room_code, None)
+
+    async def _send_to_spectators(self, room_code: str, frame: str):
+        """Fan a frame out to all spectators of a room concurrently"""
+        spectators = list(self.room_spectators.get(room_code, ()))
+        BROADCAST_BYTES.inc(len(frame) * len(spectators), "spectator")
+        results = await asyncio.gather(
+            *(spectator.send_text(frame) for spectator in spectators),
+            return_exceptions=True,
+        )
+
+        # Drop spectators whose connection is gone
+        for spectator, result in zip(spectators, results):
+            if isinstance(result, Exception):
+                self.disconnect(spectator)
+
+    def _remove_room(self, room_code: str) -> None:
+        """Forget a room without spectators, with the frames held back for them"""
+        self.room_spectators.pop(room_code, None)
+        self.buffers.pop(room_code, None)
+        task = self.drain_tasks.pop(room_code, None)
+        if task is not None:
+            task.cancel()
+        if not self._has_readers(room_code):
+            self.delayed_states.pop(room_code, None)
+
+
+# Create a singleton instance
+manager = SpectatorManager(delay=float(os.getenv("SPECTATOR_DELAY_SECONDS", "0")))
@@ -1,11 +1,54 @@
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from app.routers import rooms, websockets
+from contextlib import asynccontextmanager
+from app.routers import (
+    analytics,
+    assets,
+    games,
+    lobby,
+    matchmaking,
+    memory,
+    metrics,
+    migration,
+    rooms,
+    traces,
+    websockets,
+)
+from app.controllers.analytics import manager as analytics_manager
+from app.controllers.assets import manager as asset_manager
+from app.controllers.game import manager as game_manager
+from app.controllers.loop_lag import monitor as stall_monitor
+from app.controllers.loop_lag import probe as loop_lag_probe
+from app.controllers.matchmaking import manager as matchmaking_manager
+from app.controllers.migration import manager as migration_manager
+from app.controllers.metrics import registry as metrics_registry
+from app.controllers.metrics.gauges import register_gauges
+from app.controllers.records import manager as archive_manager
+from app.controllers.tracing import configure_tracing, tracer
 from pathlib import Path
 import fastapi
 import uvicorn
 
 
+@asynccontextmanager
+async def lifespan(app: fastapi.FastAPI):
+    # Pick up games a previous process spooled while draining
+    migration_manager.import_spool()
+    # Move games elsewhere on SIGTERM before the server closes the connections
+    migration_manager.install_signal_handler()
+
+    # Start background services
+    loop_lag_probe.start()
+    stall_monitor.start()
+    tracer.start()
+    archive_manager.start()
+    matchmaking_manager.start()
+    yield
+    await matchmaking_manager.stop()
+    await loop_lag_probe.stop()
+    stall_monitor.stop()
+    tracer.stop()
+    archive_manager.stop()
+
+
 def create_app() -> fastapi.FastAPI:
     app = fastapi.FastAPI(
         title="Coup O' Clock API",
@@ -13,23 +56,34 @@ def create_app() -> fastapi.FastAPI:
         version="0.1.0",
         docs_url="/docs",
         redoc_url="/redoc",
+        lifespan=lifespan,
     )
 
     # Include routers
     # app.include_router(rooms.router)
     app.include_router(websockets.router)
+    app.include_router(games.router)
+    app.include_router(matchmaking.router)
+    app.include_router(lobby.router)
+    app.include_router(metrics.router)
+    app.include_router(traces.router)
+    app.include_router(migration.router)
+    app.include_router(analytics.router)
+    app.include_router(memory.router)
+
+    # Expose the size of the in-memory state at /metrics
+    register_gauges(metrics_registry)
+
+    # Keep running game analytics from the engine's events
+    game_manager.add_observer(analytics_manager)
+
+    # Trace messages from the WebSocket down to the game engine
+    configure_tracing(tracer)
 
-    # Mount static files
+    # Serve the built client, precompressed, from the catch-all routes (keep them last)
     static_dir = Path(__file__).parent.parent.parent / "dist"
-    if static_dir.exists():
-        app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
-
-    @app.get("/")
-    async def get_index():
-        index_path = static_dir / "index.html"
-        if index_path.exists():
-            return FileResponse(str(index_path))
-        return {"message": "Welcome to Coup O' Clock API"}
+    asset_manager.load(static_dir)
+    app.include_router(assets.router)
 
     return app
 
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+
+
+class AdmissionRejection(BaseModel):
+    # Which limit was crossed: loop_lag, rooms or connections
+    reason: str
+    # Seconds the client should wait before trying again
+    retry_after: int
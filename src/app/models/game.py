@@ -1,6 +1,7 @@
 from typing import List, Dict, Optional
 from pydantic import BaseModel, Field
 from enum import Enum
+from app.models.room import RoomVariation
 
 
 class GameStatus(str, Enum):
@@ -20,6 +21,7 @@ class PlayerState(BaseModel):
 
 class GameState(BaseModel):
     room_code: str
+    variation: str = RoomVariation.COUP_O_CLOCK.value
     status: GameStatus = GameStatus.WAITING
     players: List[PlayerState] = Field(default_factory=list)
     current_player_index: int = 0
@@ -27,6 +29,9 @@ class GameState(BaseModel):
     discard_pile: List[str] = Field(default_factory=list)
     turn_number: int = 0
     last_action: Optional[Dict] = None
+    seed: Optional[int] = None  # Seed of the game's RNG, used for replays
+    action_log: List[Dict] = Field(default_factory=list)
+    version: int = 0  # Bumped on every mutation, used for caching and ETags
 
     def is_game_over(self) -> bool:
         """Check if the game is over (only one player alive)"""
@@ -0,0 +1,23 @@
+from typing import List, Optional
+from pydantic import BaseModel, computed_field
+from app.models.game import GameStatus
+from app.models.room import MAX_TABLE_SIZE, RoomVariation
+
+
+class LobbyRoom(BaseModel):
+    code: str
+    variation: RoomVariation = RoomVariation.COUP_O_CLOCK
+    status: GameStatus = GameStatus.WAITING
+    players: int = 0
+    ready_players: int = 0
+    max_players: int = MAX_TABLE_SIZE
+
+    @computed_field
+    @property
+    def free_seats(self) -> int:
+        return max(0, self.max_players - self.players)
+
+
+class LobbyPage(BaseModel):
+    rooms: List[LobbyRoom]
+    next_cursor: Optional[str] = None
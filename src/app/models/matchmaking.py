@@ -0,0 +1,27 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+from enum import Enum
+from app.models.room import MAX_TABLE_SIZE, MIN_TABLE_SIZE, RoomVariation
+
+
+class TicketStatus(str, Enum):
+    QUEUED = "queued"
+    MATCHED = "matched"
+    CANCELLED = "cancelled"
+
+
+class MatchmakingRequest(BaseModel):
+    player_name: str
+    variation: RoomVariation = RoomVariation.COUP_O_CLOCK
+    table_size: int = Field(default=4, ge=MIN_TABLE_SIZE, le=MAX_TABLE_SIZE)
+
+
+class MatchmakingTicket(BaseModel):
+    id: str
+    player_name: str
+    variation: RoomVariation
+    table_size: int
+    joined_at: float  # time.monotonic() when the player joined the queue
+    status: TicketStatus = TicketStatus.QUEUED
+    room_code: Optional[str] = None
+    connect_path: Optional[str] = None
@@ -0,0 +1,11 @@
+from typing import Dict, List
+from pydantic import BaseModel
+
+
+class MigrationImport(BaseModel):
+    # Room snapshots taken by the draining worker
+    rooms: List[Dict]
+
+
+class MigrationResult(BaseModel):
+    imported: List[str]
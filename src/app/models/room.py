@@ -2,6 +2,10 @@ from pydantic import BaseModel, Field
 from typing import List
 from enum import Enum
 
+# Coup needs at least 2 players, and the deck runs out past 6
+MIN_TABLE_SIZE = 2
+MAX_TABLE_SIZE = 6
+
 
 class RoomVariation(str, Enum):
     COUP_O_CLOCK = "coup-o-clock"
@@ -0,0 +1,28 @@
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException
+from app.controllers.analytics import manager as analytics_manager
+import logging
+import secrets
+
+router = APIRouter(tags=["Analytics"])
+
+logger = logging.getLogger(__name__)
+
+
+def check_token(x_admin_token: Optional[str]) -> None:
+    """Only let admins in, the endpoint is off when ANALYTICS_ADMIN_TOKEN isn't set"""
+    if not analytics_manager.token or not secrets.compare_digest(
+        x_admin_token or "", analytics_manager.token
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.get("/analytics", response_model=dict)
+async def get_analytics(x_admin_token: Optional[str] = Header(None)):
+    """
+    Get the running aggregates over the games played since the server started:
+    win rate by starting hand, bluff and challenge success rates per character,
+    game length by table size and variation, and coin flow.
+    """
+    check_token(x_admin_token)
+    return analytics_manager.report()
@@ -0,0 +1,45 @@
+from typing import Optional
+from fastapi import APIRouter, Header
+from app.controllers.assets import manager as asset_manager
+import logging
+
+router = APIRouter(tags=["Assets"])
+
+logger = logging.getLogger(__name__)
+
+
+@router.get("/")
+async def get_index(
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Serve the client's index.html
+    """
+    if not asset_manager.get_asset("index.html"):
+        return {"message": "Welcome to Coup O' Clock API"}
+    return asset_manager.response("index.html", accept_encoding, if_none_match)
+
+
+@router.get("/static/{path:path}", include_in_schema=False)
+async def get_static_file(
+    path: str,
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Serve a file of the built client
+    """
+    return asset_manager.response(path, accept_encoding, if_none_match)
+
+
+@router.get("/{path:path}", include_in_schema=False)
+async def get_client_file(
+    path: str,
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Serve a file of the built client at the path Vite built it for (e.g. /assets/...)
+    """
+    return asset_manager.response(path, accept_encoding, if_none_match)
@@ -0,0 +1,100 @@
+from typing import Optional
+from datetime import datetime, timezone
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+)
+from fastapi.responses import StreamingResponse
+from app.controllers.records import manager as archive_manager
+from app.controllers.records import export_ndjson, parse_cursor
+from app.controllers.rooms import controller as room_controller
+from app.models.room import RoomVariation
+import logging
+import math
+
+router = APIRouter(tags=["Games"])
+
+logger = logging.getLogger(__name__)
+
+
+@router.get(
+    "/room/{room_code}/state",
+    dependencies=[Depends(room_controller.redirect_room_request)],
+)
+async def get_game_state(
+    room_code: str,
+    player_id: Optional[str] = Query(None),
+    x_player_token: Optional[str] = Header(None),
+    after_version: Optional[int] = Query(None),
+    timeout: float = Query(25.0, ge=0, le=60),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Read-only view of a game, for clients that poll instead of holding a WebSocket.
+    Without a player_id, the spectator view (all cards hidden) is returned.
+    A player's view needs the player_token from room_joined in X-Player-Token.
+    Supports If-None-Match (304 while the game state is unchanged) and
+    long-polling with after_version, which waits up to timeout seconds for a newer state.
+    Rooms of another worker are redirected there with a 307.
+    """
+    return await room_controller.handle_game_state_request(
+        room_code, player_id, x_player_token, if_none_match, after_version, timeout
+    )
+
+
+@router.get("/games/export", response_class=StreamingResponse)
+async def export_games(
+    finished_after: Optional[datetime] = Query(None),
+    finished_before: Optional[datetime] = Query(None),
+    variation: Optional[RoomVariation] = Query(None),
+    player: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1),
+    events: bool = Query(True),
+):
+    """
+    Stream archived games as NDJSON, oldest first, one game per line.
+    Filters by finish time (ISO 8601 or unix seconds, UTC when no zone is
+    given; after is inclusive, before exclusive), variation and player ID
+    or name. Every line has a cursor: pass the last one received to resume
+    right after it. Set events=false to leave the moves out.
+    """
+    if not archive_manager.enabled:
+        raise HTTPException(status_code=404, detail="The game archive is not enabled")
+    if cursor is not None:
+        try:
+            positions = parse_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not all(
+            archive_manager.is_record_boundary(shard, segment, offset)
+            for shard, (segment, offset) in positions.items()
+        ):
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+
+    # The sync generator runs in the threadpool, reading the archive as it is sent
+    return StreamingResponse(
+        export_ndjson(
+            archive_manager,
+            cursor,
+            unix_time(finished_after),
+            unix_time(finished_before),
+            variation.value if variation else None,
+            player,
+            limit,
+            events,
+        ),
+        media_type="application/x-ndjson",
+    )
+
+
+def unix_time(value: Optional[datetime]) -> Optional[int]:
+    """Whole unix seconds of a datetime, rounded up (archived times are whole seconds)"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return math.ceil(value.timestamp())
@@ -0,0 +1,30 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from app.controllers.rooms import controller as room_controller
+from app.models.game import GameStatus
+from app.models.lobby import LobbyPage
+from app.models.room import RoomVariation
+import logging
+
+router = APIRouter(prefix="/lobby", tags=["Lobby"])
+
+logger = logging.getLogger(__name__)
+
+
+@router.get("/rooms", response_model=LobbyPage)
+async def list_rooms(
+    status: Optional[GameStatus] = Query(GameStatus.WAITING),
+    variation: Optional[RoomVariation] = Query(None),
+    min_free_seats: int = Query(1, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+):
+    """
+    List rooms in the lobby, oldest first.
+    Pass the returned next_cursor back as cursor to get the next page.
+    """
+    if cursor is not None and not cursor.isdigit():
+        raise HTTPException(status_code=400, detail=f"Invalid cursor {cursor}")
+    return room_controller.list_lobby_rooms(
+        status, variation, min_free_seats, limit, cursor
+    )
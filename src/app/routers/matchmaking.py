@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from app.controllers.matchmaking import manager as matchmaking_manager
+from app.controllers.room_codes import router as room_router
+from app.models.matchmaking import MatchmakingRequest, MatchmakingTicket
+import logging
+
+
+def redirect_to_matchmaking_worker(request: Request) -> None:
+    """
+    Send matchmaking requests to the one worker holding the queue, with a
+    307 so the method and body are kept
+    """
+    url = room_router.matchmaking_redirect_url(request)
+    if url:
+        raise HTTPException(status_code=307, headers={"Location": url})
+
+
+router = APIRouter(
+    prefix="/matchmaking",
+    tags=["Matchmaking"],
+    dependencies=[Depends(redirect_to_matchmaking_worker)],
+)
+
+logger = logging.getLogger(__name__)
+
+
+@router.post("/queue", response_model=MatchmakingTicket)
+async def join_queue(request: MatchmakingRequest):
+    """
+    Join the matchmaking queue for a variation and table size.
+    Poll the returned ticket until it is matched, then connect to its connect_path.
+    """
+    return matchmaking_manager.join(request)
+
+
+@router.get("/queue/{ticket_id}", response_model=MatchmakingTicket)
+async def get_ticket(ticket_id: str):
+    """
+    Get the status of a matchmaking ticket
+    """
+    ticket = matchmaking_manager.get_ticket(ticket_id)
+    if not ticket:
+        raise HTTPException(status_code=404, detail=f"Ticket {ticket_id} not found")
+    return ticket
+
+
+@router.delete("/queue/{ticket_id}", response_model=dict)
+async def leave_queue(ticket_id: str):
+    """
+    Leave the matchmaking queue
+    """
+    if not matchmaking_manager.leave(ticket_id):
+        raise HTTPException(
+            status_code=404, detail=f"No queued ticket {ticket_id} found"
+        )
+    return {"message": f"Ticket {ticket_id} left the queue"}
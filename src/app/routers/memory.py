@@ -0,0 +1,69 @@
+from typing import List, Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from app.controllers.memory import manager as memory_manager
+from app.controllers.memory import tracker as allocation_tracker
+import logging
+import secrets
+
+router = APIRouter(prefix="/memory", tags=["Memory"])
+
+logger = logging.getLogger(__name__)
+
+
+def check_token(x_admin_token: Optional[str]) -> None:
+    """Only let admins in, the endpoints are off when MEMORY_ADMIN_TOKEN isn't set"""
+    if not memory_manager.token or not secrets.compare_digest(
+        x_admin_token or "", memory_manager.token
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.get("", response_model=dict)
+async def get_memory(
+    room_code: Optional[List[str]] = Query(None),
+    limit: int = Query(50, ge=1, le=1000),
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    Get the approximate memory held per room (the largest first) by game,
+    players, spectators, outbound frames, chat and lobby entry, and the size
+    of every manager dict with the entries that outlived their room.
+    Pass room_code (repeatable) to measure only those rooms.
+    """
+    check_token(x_admin_token)
+    return memory_manager.report(room_code, limit)
+
+
+@router.post("/baseline", response_model=dict)
+def take_baseline(x_admin_token: Optional[str] = Header(None)):
+    """
+    Start tracing allocations, if not already, and take the baseline the
+    diff compares to. Tracing slows the server down until it is stopped.
+    """
+    check_token(x_admin_token)
+    return allocation_tracker.take_baseline()
+
+
+@router.get("/diff", response_model=dict)
+def get_allocation_diff(
+    limit: int = Query(20, ge=1, le=200),
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    Get the allocation growth since the baseline, by subsystem, with the
+    sites that allocated the most in each.
+    """
+    check_token(x_admin_token)
+    diff = allocation_tracker.diff(limit)
+    if diff is None:
+        raise HTTPException(status_code=409, detail="No baseline taken")
+    return diff
+
+
+@router.delete("/baseline", status_code=204)
+def stop_tracing(x_admin_token: Optional[str] = Header(None)):
+    """
+    Drop the baseline and stop tracing allocations
+    """
+    check_token(x_admin_token)
+    allocation_tracker.stop()
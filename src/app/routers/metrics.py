@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.controllers.metrics import registry
+import logging
+
+router = APIRouter(tags=["Metrics"])
+
+logger = logging.getLogger(__name__)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Get the server metrics in the Prometheus text format
+    """
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,32 @@
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException
+from app.controllers.migration import manager as migration_manager
+from app.controllers.rooms import controller as room_controller
+from app.models.migration import MigrationImport, MigrationResult
+import logging
+import secrets
+
+router = APIRouter(prefix="/internal/migration", tags=["Migration"])
+
+logger = logging.getLogger(__name__)
+
+
+@router.post("/rooms", response_model=MigrationResult)
+async def import_rooms(
+    request: MigrationImport,
+    x_migration_token: Optional[str] = Header(None),
+):
+    """
+    Take over rooms from a draining worker.
+    Only enabled when MIGRATION_TOKEN is set, and the worker must send it.
+    Refused while this worker drains itself.
+    """
+    if not migration_manager.token or not secrets.compare_digest(
+        x_migration_token or "", migration_manager.token
+    ):
+        raise HTTPException(status_code=403, detail="Invalid migration token")
+    # A draining worker can't keep rooms either, the sender spools them instead
+    if migration_manager.draining:
+        raise HTTPException(status_code=503, detail="Worker is draining")
+    imported = room_controller.import_migrated_rooms(request.rooms)
+    return MigrationResult(imported=imported)
@@ -0,0 +1,32 @@
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from app.controllers.tracing import RingBufferExporter, tracer
+import logging
+import secrets
+
+router = APIRouter(tags=["Tracing"])
+
+logger = logging.getLogger(__name__)
+
+
+@router.get("/traces", response_model=list)
+async def get_traces(
+    room_code: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=1000),
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    Get the most recent sampled traces, newest first.
+    Each trace is the list of its spans, the root span last.
+    Off when TRACES_ADMIN_TOKEN isn't set.
+    """
+    exporter = tracer.get_exporter(RingBufferExporter)
+    if not exporter:
+        raise HTTPException(
+            status_code=404, detail="The in-memory trace exporter is not enabled"
+        )
+    if not exporter.token or not secrets.compare_digest(
+        x_admin_token or "", exporter.token
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    return exporter.get_traces(room_code, limit)
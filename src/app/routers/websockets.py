@@ -1,9 +1,12 @@
+from typing import Optional
 from fastapi import (
     APIRouter,
     WebSocket,
     Query,
 )
 from app.controllers.rooms import controller as room_controller
+from app.controllers.rooms import multiplexer
+from app.models.room import RoomVariation
 import logging
 
 router = APIRouter(tags=["WebSockets"])
@@ -17,12 +20,38 @@ async def websocket_room_endpoint(
     room_code: str,
     player_name: str = Query(...),
     create: bool = Query(False),
+    variation: RoomVariation = Query(RoomVariation.COUP_O_CLOCK),
+    player_id: Optional[str] = Query(None),
+    player_token: Optional[str] = Query(None),
 ):
     """
     WebSocket endpoint for connecting to a room.
     If create=True, a new room will be created with the given code.
     Otherwise, the player will join an existing room.
+    The variation only applies to the player who opens the room.
+    A player_id with its player_token (from a reconnect message) resumes a
+    seat in a migrated game.
     """
     await room_controller.handle_room_connection(
-        websocket, room_code, player_name, create
+        websocket, room_code, player_name, create, variation, player_id, player_token
     )
+
+
+@router.websocket("/ws/room/{room_code}/spectate")
+async def websocket_spectate_endpoint(websocket: WebSocket, room_code: str):
+    """
+    WebSocket endpoint for watching a room.
+    Spectators receive the public game state (all hands hidden) and room
+    broadcasts, and never count as players.
+    """
+    await room_controller.handle_spectator_connection(websocket, room_code)
+
+
+@router.websocket("/ws/mux")
+async def websocket_mux_endpoint(websocket: WebSocket):
+    """
+    WebSocket endpoint carrying several rooms over one connection.
+    Clients subscribe channels to rooms, as a player or a spectator, and
+    every frame either way is tagged with its channel.
+    """
+    await multiplexer.manager.handle(websocket)
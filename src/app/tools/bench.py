@@ -0,0 +1,518 @@
+"""
+Microbenchmarks of the engine, view building and serialization hot paths.
+
+Every benchmark runs a fixed, seeded scenario. Setup (such as building a
+fresh game to act on) is excluded from the timings, the garbage collector is
+off while timing, and the median of several rounds is reported, so results
+are comparable between runs on the same machine.
+
+    uv run -m app.tools.bench --save-baseline bench-baseline.json
+    uv run -m app.tools.bench --baseline bench-baseline.json --max-regression 0.15
+    uv run -m app.tools.bench --filter view --json results.json
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import gc
+import inspect
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+
+# The rooms controller has to load before the websockets package, as it does in the app
+from app.controllers.rooms import controller as room_controller  # noqa: F401
+from app.controllers.game.coup_game import CoupGame
+from app.controllers.game.game_manager import GameManager
+from app.controllers.game.rules import CHARACTERS
+from app.controllers.websockets import manager as ws_manager
+from app.controllers.websockets import process_message
+from app.controllers.game import manager as game_manager
+from app.controllers.websockets.connection_manager import ConnectionManager
+from app.models.game import GameState, GameStatus, PlayerState
+
+SEED = 1234
+
+
+class Benchmark:
+    """
+    A timed function. Without setup, a round calls it `number` times in a
+    loop. With setup, every call gets a fresh argument from setup and only
+    the call itself is timed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable,
+        setup: Optional[Callable[[], Any]] = None,
+        number: int = 1000,
+    ):
+        self.name = name
+        self.func = func
+        self.setup = setup
+        self.number = number
+        self.is_async = inspect.iscoroutinefunction(func)
+
+    def run_round(self) -> float:
+        """Run one round and return the mean nanoseconds per call"""
+        if self.is_async:
+            return asyncio.run(self._run_async_round())
+
+        total = 0
+        if self.setup is None:
+            func = self.func
+            start = time.perf_counter_ns()
+            for _ in range(self.number):
+                func()
+            total = time.perf_counter_ns() - start
+        else:
+            for _ in range(self.number):
+                arg = self.setup()
+                start = time.perf_counter_ns()
+                self.func(arg)
+                total += time.perf_counter_ns() - start
+        return total / self.number
+
+    async def _run_async_round(self) -> float:
+        total = 0
+        for _ in range(self.number):
+            arg = self.setup() if self.setup else None
+            if inspect.isawaitable(arg):
+                arg = await arg
+            start = time.perf_counter_ns()
+            if self.setup:
+                await self.func(arg)
+            else:
+                await self.func()
+            total += time.perf_counter_ns() - start
+        return total / self.number
+
+
+BENCHMARKS: List[Benchmark] = []
+
+
+def benchmark(name: str, setup: Optional[Callable] = None, number: int = 1000):
+    """Register a function as a benchmark"""
+
+    def decorator(func):
+        BENCHMARKS.append(Benchmark(name, func, setup, number))
+        return func
+
+    return decorator
+
+
+# Scenario helpers
+
+
+def new_game(players: int = 4, seed: int = SEED) -> CoupGame:
+    """Start a seeded game"""
+    game_state = GameState(
+        room_code="BENCH",
+        players=[PlayerState(id=f"p{i}", name=f"player {i}") for i in range(players)],
+    )
+    coup_game = CoupGame(game_state, seed)
+    game_state.deck = coup_game.create_deck()
+    coup_game.start()
+    return coup_game
+
+
+def play(coup_game: CoupGame, player_id: str, move: Dict) -> Dict:
+    """Play a move in the legal_moves shape"""
+    move_type = move["action_type"]
+    if move_type == "perform_action":
+        args = [move["game_action"]]
+    elif move_type == "counter":
+        args = [move["counter_action"]]
+    elif move_type == "complete_exchange":
+        args = [move["kept_indices"]]
+    else:
+        args = []
+    return coup_game.apply({"type": move_type, "player_id": player_id, "args": args})
+
+
+def find_move(coup_game: CoupGame, player_id: str, move_type: str) -> Dict:
+    for move in coup_game.get_legal_moves()[player_id]:
+        if move["action_type"] == move_type:
+            return move
+    raise ValueError(f"{player_id} can't {move_type}")
+
+
+def game_with_pending(action: Dict, coins: int = 2) -> CoupGame:
+    """A game where p0 took an action and nobody answered yet"""
+    coup_game = new_game()
+    coup_game.game_state.players[0].coins = coins
+    coup_game.perform_action("p0", action)
+    return coup_game
+
+
+def pass_all_but_last(coup_game: CoupGame, move_type: str) -> str:
+    """Pass with every player but one, return the one left"""
+    players = [
+        player_id
+        for player_id, moves in coup_game.get_legal_moves().items()
+        if any(move["action_type"] == move_type for move in moves)
+    ]
+    for player_id in players[:-1]:
+        play(coup_game, player_id, {"action_type": move_type})
+    return players[-1]
+
+
+# Engine: one benchmark per action type, acting on a fresh game each call
+
+ACTIONS = {
+    "income": ({"action_type": "income"}, 2),
+    "foreign_aid": ({"action_type": "foreign_aid"}, 2),
+    "tax": ({"action_type": "tax"}, 2),
+    "steal": ({"action_type": "steal", "target_id": "p1"}, 2),
+    "assassinate": ({"action_type": "assassinate", "target_id": "p1"}, 3),
+    "exchange": ({"action_type": "exchange"}, 2),
+    "coup": ({"action_type": "coup", "target_id": "p1"}, 7),
+}
+
+
+def _register_action_benchmark(action_type: str, action: Dict, coins: int) -> None:
+    def setup():
+        coup_game = new_game()
+        coup_game.game_state.players[0].coins = coins
+        return coup_game
+
+    @benchmark(f"engine.perform_action.{action_type}", setup, number=300)
+    def run(coup_game):
+        coup_game.perform_action("p0", dict(action))
+
+
+for _action_type, (_action, _coins) in ACTIONS.items():
+    _register_action_benchmark(_action_type, _action, _coins)
+
+
+def _last_challenge_pass():
+    coup_game = game_with_pending({"action_type": "tax"})
+    return coup_game, pass_all_but_last(coup_game, "pass_challenge")
+
+
+@benchmark("engine.resolve.pass_challenge", _last_challenge_pass, number=300)
+def bench_pass_challenge(arg):
+    coup_game, player_id = arg
+    coup_game.pass_challenge(player_id)
+
+
+@benchmark(
+    "engine.resolve.challenge",
+    lambda: game_with_pending({"action_type": "tax"}),
+    number=300,
+)
+def bench_challenge(coup_game):
+    coup_game.challenge("p1")
+
+
+def _pending_block():
+    coup_game = game_with_pending({"action_type": "foreign_aid"})
+    return coup_game, find_move(coup_game, "p1", "counter")["counter_action"]
+
+
+@benchmark("engine.resolve.counter", _pending_block, number=300)
+def bench_counter(arg):
+    coup_game, counter_action = arg
+    coup_game.counter("p1", counter_action)
+
+
+def _last_counter_pass():
+    coup_game = game_with_pending({"action_type": "foreign_aid"})
+    return coup_game, pass_all_but_last(coup_game, "pass_counter")
+
+
+@benchmark("engine.resolve.pass_counter", _last_counter_pass, number=300)
+def bench_pass_counter(arg):
+    coup_game, player_id = arg
+    coup_game.pass_counter(player_id)
+
+
+def _pending_exchange():
+    coup_game = game_with_pending({"action_type": "exchange"})
+    play(
+        coup_game,
+        pass_all_but_last(coup_game, "pass_challenge"),
+        {"action_type": "pass_challenge"},
+    )
+    return coup_game, find_move(coup_game, "p0", "complete_exchange")["kept_indices"]
+
+
+@benchmark("engine.resolve.complete_exchange", _pending_exchange, number=300)
+def bench_complete_exchange(arg):
+    coup_game, kept_indices = arg
+    coup_game.complete_exchange("p0", kept_indices)
+
+
+# Game state bookkeeping at large player counts
+
+
+def _crowded_state(players: int) -> GameState:
+    """A state where every other player is out"""
+    return GameState(
+        room_code="BENCH",
+        players=[
+            PlayerState(id=f"p{i}", name=f"player {i}", is_alive=i % 2 == 0)
+            for i in range(players)
+        ],
+    )
+
+
+for _players in (10, 100, 1000):
+    _state = _crowded_state(_players)
+    benchmark(f"state.next_player.{_players}")(_state.next_player)
+    benchmark(f"state.is_game_over.{_players}")(_state.is_game_over)
+
+
+# Views, for 2 to 10 players
+
+
+def _view_manager(players: int) -> GameManager:
+    """A manager holding a playing game with hands dealt by hand (the deck only has 15 cards)"""
+    manager = GameManager()
+    game_state = GameState(
+        room_code="BENCH",
+        status=GameStatus.PLAYING,
+        players=[
+            PlayerState(
+                id=f"p{i}",
+                name=f"player {i}",
+                cards=[CHARACTERS[i % 5], CHARACTERS[(i + 1) % 5]],
+            )
+            for i in range(players)
+        ],
+    )
+    manager.games["BENCH"] = game_state
+    manager.coup_games["BENCH"] = CoupGame(game_state, SEED)
+    return manager
+
+
+def _register_view_benchmarks(players: int) -> None:
+    manager = _view_manager(players)
+    coup_game = manager.coup_games["BENCH"]
+
+    def invalidate():
+        # A new state version, so the shared view is rebuilt
+        coup_game.bump_version()
+        return manager
+
+    benchmark(f"view.player.cold.{players}", invalidate)(
+        lambda m: m.get_player_view("BENCH", "p0")
+    )
+    benchmark(f"view.player.warm.{players}")(
+        lambda: manager.get_player_view("BENCH", "p0")
+    )
+    benchmark(f"view.player_encoded.cold.{players}", invalidate)(
+        lambda m: m.get_encoded_player_view("BENCH", "p0")
+    )
+    benchmark(f"view.player_encoded.warm.{players}")(
+        lambda: manager.get_encoded_player_view("BENCH", "p0")
+    )
+
+
+for _players in (2, 4, 6, 8, 10):
+    _register_view_benchmarks(_players)
+
+
+# Broadcast encoding and fan-out
+
+
+class FakeWebSocket:
+    """Accepts and drops everything sent to it"""
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        pass
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+
+BROADCAST_MESSAGE = {
+    "type": "game_action_result",
+    "action_type": "perform_action",
+    "result": {
+        "success": True,
+        "message": "Player player 0 took foreign aid (2 coins)",
+        "action": {"action_type": "foreign_aid"},
+    },
+    "player": "player 0",
+}
+
+
+def _register_broadcast_benchmark(connections: int) -> None:
+    manager = ConnectionManager()
+    manager.active_rooms["BENCH"] = {FakeWebSocket() for _ in range(connections)}
+
+    @benchmark(f"broadcast.{connections}")
+    async def run():
+        await manager.broadcast_to_room("BENCH", BROADCAST_MESSAGE)
+
+
+for _connections in (2, 6, 10):
+    _register_broadcast_benchmark(_connections)
+
+
+# process_message end to end, against the real singletons and fake sockets
+
+
+class ProcessMessageRoom:
+    """A room of fake sockets in the singleton managers"""
+
+    code = "BNCH0"
+
+    def __init__(self):
+        self.sockets: List[FakeWebSocket] = []
+
+    async def ensure_connected(self, players: int = 4) -> None:
+        if self.sockets:
+            return
+        for i in range(players):
+            websocket = FakeWebSocket()
+            await ws_manager.connect(websocket, self.code, f"player {i}")
+            self.sockets.append(websocket)
+
+    async def new_game(self) -> str:
+        """Start a fresh seeded game, return the socket of the player to move"""
+        await self.ensure_connected()
+        game_manager.remove_game(self.code)
+        player_info = [
+            {"name": p["name"], "id": ws_manager.get_player_id(p["websocket"])}
+            for p in ws_manager.get_room_players(self.code)
+        ]
+        game_manager.create_game(self.code, player_info, seed=SEED)
+        game_manager.start_game(self.code)
+        return self.sockets[0]
+
+
+_room = ProcessMessageRoom()
+
+
+@benchmark("process_message.chat", _room.ensure_connected, number=1000)
+async def bench_process_chat(_):
+    await process_message(
+        _room.sockets[0], '{"type": "chat", "message": "hi"}', _room.code
+    )
+
+
+@benchmark("process_message.game_action.income", _room.new_game, number=300)
+async def bench_process_income(websocket):
+    await process_message(
+        websocket,
+        '{"type": "game_action", "action": {"action_type": "perform_action", '
+        '"game_action": {"action_type": "income"}}}',
+        _room.code,
+    )
+
+
+# Running and comparing
+
+
+def run_benchmarks(
+    benchmarks: List[Benchmark], rounds: int, warmup: int
+) -> Dict[str, Dict]:
+    results = {}
+    for bench in benchmarks:
+        for _ in range(warmup):
+            bench.run_round()
+
+        gc.collect()
+        gc.disable()
+        try:
+            samples = [bench.run_round() for _ in range(rounds)]
+        finally:
+            gc.enable()
+
+        results[bench.name] = {
+            "median_ns": statistics.median(samples),
+            "min_ns": min(samples),
+            "stdev_ns": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+            "rounds": rounds,
+            "calls_per_round": bench.number,
+        }
+        print(
+            f"{bench.name:<45}{results[bench.name]['median_ns'] / 1000:>12.2f} µs"
+            f"  ± {results[bench.name]['stdev_ns'] / 1000:.2f}",
+            flush=True,
+        )
+    return results
+
+
+def compare(
+    results: Dict[str, Dict], baseline: Dict[str, Dict], max_regression: float
+) -> List[str]:
+    """List the benchmarks whose median got slower than allowed"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        change = result["median_ns"] / before["median_ns"] - 1
+        if change > max_regression:
+            regressions.append(
+                f"{name}: {before['median_ns'] / 1000:.2f} µs -> "
+                f"{result['median_ns'] / 1000:.2f} µs ({change:+.0%})"
+            )
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--filter", help="Only run benchmarks containing this text")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Compare against this saved result file")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.15,
+        help="Fail if a median is slower than the baseline by more than this fraction",
+    )
+    parser.add_argument("--save-baseline", help="Save the results as a baseline")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    # Benchmarks measure the code, not the log handlers
+    logging.disable(logging.CRITICAL)
+
+    benchmarks = [
+        bench for bench in BENCHMARKS if not args.filter or args.filter in bench.name
+    ]
+    results = run_benchmarks(benchmarks, args.rounds, args.warmup)
+    report = {
+        "meta": {
+            "python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"\n{len(regressions)} benchmarks regressed:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.max_regression:.0%} of the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,579 @@
+"""
+Randomized invariant fuzzer for the game engine.
+
+Plays seeded games through GameManager with a mix of legal moves (picked from
+legal_moves) and junk: out-of-turn actions, unknown action types and players,
+bad targets, challenges and passes with nothing pending, counters with the
+wrong character and exchange indices that are out of range or repeated. Now
+and then the room itself acts mid-game, as when every player of a room sends
+ready again (with the same roster, someone gone or a newcomer) or the game is
+started again. The engine's invariants are checked after every step:
+
+- cards: the deck, hands, revealed cards and cards drawn for an exchange are
+  always exactly the rule set's deck
+- coins: nobody ever has a negative number of coins
+- players: the living are the players with cards left, a finished game has
+  one of them, a game in play has a current player who is alive
+- windows: the challenge and block windows, pending action, block and
+  exchange agree with each other
+- restart: readying or starting a game in play leaves it as it was, the
+  same game with the same players and no new cards dealt
+
+A failing game is shrunk to the shortest sequence of steps that still breaks
+the same invariant, then written out as a case that --replay runs again. The
+steps use the action log's entry shape. Runs are deterministic per --seed.
+With --steps in the tens of thousands a run takes seconds, so it can sit in
+CI next to the benchmarks.
+
+    uv run -m app.tools.fuzz --steps 50000
+    uv run -m app.tools.fuzz --seed 7 --steps 2000000 --json failure.json
+    uv run -m app.tools.fuzz --replay failure.json
+"""
+
+from typing import Callable, Dict, List, Optional
+from collections import Counter
+import argparse
+import json
+import logging
+import random
+import sys
+import time
+
+# The game engine logs every move it rejects, and the fuzzer sends plenty
+logging.disable(logging.CRITICAL)
+
+from app.controllers.game.game_manager import GameManager
+from app.controllers.game.rules import CHARACTERS
+from app.models.game import GameStatus
+from app.models.room import RoomVariation
+
+ROOM_CODE = "FUZZ"
+# A player ID that is not in the game
+GHOST = "ghost"
+# Steps after which a game that hasn't finished is abandoned for a new one
+MAX_GAME_STEPS = 300
+# Share of steps picked from the legal moves, the rest are junk
+LEGAL_FRACTION = 0.7
+# Move types of the action log
+MOVE_TYPES = [
+    "perform_action",
+    "challenge",
+    "pass_challenge",
+    "counter",
+    "pass_counter",
+    "complete_exchange",
+]
+# Steps of the room around the game, as the room controller would take them
+ROOM_STEP_TYPES = ["ready", "start"]
+# Share of steps that are room steps
+ROOM_STEP_FRACTION = 0.02
+
+
+class InvariantViolation(Exception):
+    """An invariant that doesn't hold, named so shrinking keeps the same failure"""
+
+    def __init__(self, invariant: str, message: str):
+        super().__init__(f"{invariant}: {message}")
+        self.invariant = invariant
+
+
+class FuzzCase:
+    """A game to play: its seed, table and the steps played in it"""
+
+    def __init__(
+        self,
+        seed: int,
+        players: int,
+        variation: str = RoomVariation.COUP_O_CLOCK.value,
+        steps: Optional[List[Dict]] = None,
+    ):
+        self.seed = seed
+        self.players = players
+        self.variation = variation
+        self.steps = steps if steps is not None else []
+
+    def with_steps(self, steps: List[Dict]) -> "FuzzCase":
+        return FuzzCase(self.seed, self.players, self.variation, steps)
+
+    def to_json(self) -> Dict:
+        return {
+            "seed": self.seed,
+            "players": self.players,
+            "variation": self.variation,
+            "steps": self.steps,
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict) -> "FuzzCase":
+        return cls(data["seed"], data["players"], data["variation"], data["steps"])
+
+
+class Failure:
+    """The first step of a case after which something was wrong"""
+
+    def __init__(self, step: int, invariant: str, message: str):
+        self.step = step
+        self.invariant = invariant
+        self.message = message
+
+    def to_json(self) -> Dict:
+        return {"step": self.step, "invariant": self.invariant, "message": self.message}
+
+
+def player_ids(players: int) -> List[str]:
+    return [f"p{i}" for i in range(players)]
+
+
+def start_game(case: FuzzCase) -> GameManager:
+    """Start the case's game in a manager of its own"""
+    manager = GameManager()
+    manager.create_game(
+        ROOM_CODE,
+        [
+            {"id": player_id, "name": player_id}
+            for player_id in player_ids(case.players)
+        ],
+        case.seed,
+        case.variation,
+    )
+    manager.start_game(ROOM_CODE)
+    return manager
+
+
+def apply_step(manager: GameManager, step: Dict) -> Optional[Dict]:
+    """Play a step through the manager, as the message handler would"""
+    if step["type"] in ROOM_STEP_TYPES:
+        return apply_room_step(manager, step)
+    moves: Dict[str, Callable] = {
+        "perform_action": manager.perform_action,
+        "challenge": manager.challenge_action,
+        "pass_challenge": manager.pass_challenge,
+        "counter": manager.counter_action,
+        "pass_counter": manager.pass_counter,
+        "complete_exchange": manager.complete_exchange,
+    }
+    return moves[step["type"]](ROOM_CODE, step["player_id"], *step["args"])
+
+
+def apply_room_step(manager: GameManager, step: Dict) -> None:
+    """
+    Ready (everyone in a roster, creating then starting the game as the room
+    controller does) or start the room's game, and raise InvariantViolation
+    if that changed a game in play
+    """
+    game_state = manager.get_game(ROOM_CODE)
+    in_play = game_state.status == GameStatus.PLAYING
+    before = (
+        [(p.id, list(p.cards), list(p.revealed_cards)) for p in game_state.players],
+        list(game_state.deck),
+        game_state.version,
+    )
+
+    if step["type"] == "ready":
+        roster, seed = step["args"]
+        manager.create_game(
+            ROOM_CODE,
+            [{"id": player_id, "name": player_id} for player_id in roster],
+            seed,
+            game_state.variation,
+        )
+    manager.start_game(ROOM_CODE)
+
+    if not in_play:
+        return
+    after = manager.get_game(ROOM_CODE)
+    if after is not game_state:
+        raise InvariantViolation("restart", f"{step['type']} replaced a game in play")
+    now = (
+        [(p.id, list(p.cards), list(p.revealed_cards)) for p in after.players],
+        list(after.deck),
+        after.version,
+    )
+    if now != before:
+        raise InvariantViolation("restart", f"{step['type']} changed a game in play")
+
+
+def check_invariants(manager: GameManager) -> None:
+    """Raise InvariantViolation if the game is in a state it should never reach"""
+    coup_game = manager.get_coup_game(ROOM_CODE)
+    game_state = coup_game.game_state
+    rules = coup_game.rules
+
+    # Cards drawn for an exchange are in neither the deck nor a hand until it completes
+    cards = list(game_state.deck)
+    exchanging = coup_game._get_player(coup_game.pending_exchange)
+    if exchanging and game_state.last_action:
+        cards += game_state.last_action.get("cards", [])[len(exchanging.cards) :]
+    for player in game_state.players:
+        cards += player.cards
+        cards += player.revealed_cards
+    cards.sort()
+    if cards != sorted(rules.deck):
+        missing = Counter(rules.deck) - Counter(cards)
+        extra = Counter(cards) - Counter(rules.deck)
+        raise InvariantViolation(
+            "cards", f"missing {dict(missing)}, extra {dict(extra)}"
+        )
+
+    for player in game_state.players:
+        if player.coins < 0:
+            raise InvariantViolation("coins", f"{player.id} has {player.coins} coins")
+        if player.is_alive != bool(player.cards):
+            raise InvariantViolation(
+                "players",
+                f"{player.id} is_alive={player.is_alive} with {len(player.cards)} cards",
+            )
+        if len(player.cards) + len(player.revealed_cards) != rules.cards_per_player:
+            raise InvariantViolation(
+                "cards",
+                f"{player.id} has {len(player.cards)} cards and "
+                f"{len(player.revealed_cards)} revealed",
+            )
+
+    alive = [p for p in game_state.players if p.is_alive]
+    if game_state.status == GameStatus.FINISHED:
+        if len(alive) != 1:
+            raise InvariantViolation(
+                "players", f"game finished with {len(alive)} alive"
+            )
+        if (
+            coup_game.challenge_window_open
+            or coup_game.counteraction_window_open
+            or coup_game.pending_action
+            or coup_game.pending_exchange
+        ):
+            raise InvariantViolation("windows", "game finished with a move pending")
+        return
+
+    if len(alive) < 2:
+        raise InvariantViolation("players", f"game in play with {len(alive)} alive")
+    current_player = game_state.get_current_player()
+    if not current_player or not current_player.is_alive:
+        raise InvariantViolation(
+            "players",
+            f"current player {current_player.id if current_player else None} is not alive",
+        )
+
+    if coup_game.challenge_window_open and coup_game.counteraction_window_open:
+        raise InvariantViolation("windows", "challenge and block windows both open")
+    if coup_game.challenge_window_open and not coup_game.pending_action:
+        raise InvariantViolation(
+            "windows", "challenge window open with nothing pending"
+        )
+    if coup_game.counteraction_window_open and (
+        not coup_game.pending_action or coup_game.pending_counteraction
+    ):
+        raise InvariantViolation(
+            "windows", "block window open without a lone pending action"
+        )
+    if coup_game.pending_counteraction and not coup_game.challenge_window_open:
+        raise InvariantViolation("windows", "pending block without a challenge window")
+    if coup_game.pending_action and not (
+        coup_game.challenge_window_open or coup_game.counteraction_window_open
+    ):
+        raise InvariantViolation("windows", "pending action with every window closed")
+    if coup_game.pending_action and (
+        coup_game.pending_action["player_id"] != current_player.id
+    ):
+        raise InvariantViolation("windows", "pending action of a player out of turn")
+    if coup_game.pending_exchange and (
+        coup_game.pending_action or coup_game.pending_exchange != current_player.id
+    ):
+        raise InvariantViolation(
+            "windows", "pending exchange alongside another move or out of turn"
+        )
+
+
+def run_case(case: FuzzCase) -> Optional[Failure]:
+    """Play a case from the start, checking the invariants after every step"""
+    manager = start_game(case)
+    for index, step in enumerate(case.steps):
+        try:
+            apply_step(manager, step)
+            check_invariants(manager)
+        except InvariantViolation as e:
+            return Failure(index, e.invariant, str(e))
+        except Exception as e:
+            return Failure(
+                index, f"crash:{type(e).__name__}", f"{type(e).__name__}: {e}"
+            )
+    return None
+
+
+def shrink(case: FuzzCase, failure: Failure) -> FuzzCase:
+    """
+    Remove steps while the same invariant still breaks, first in large
+    chunks then one by one, and stop the case at the step that breaks it.
+    """
+    steps = case.steps[: failure.step + 1]
+    chunk = max(1, len(steps) // 2)
+    while True:
+        index = 0
+        shrunk = False
+        while index < len(steps):
+            candidate = steps[:index] + steps[index + chunk :]
+            result = run_case(case.with_steps(candidate))
+            if result and result.invariant == failure.invariant:
+                steps = candidate[: result.step + 1]
+                shrunk = True
+            else:
+                index += chunk
+        if chunk == 1 and not shrunk:
+            return case.with_steps(steps)
+        if not shrunk:
+            chunk = max(1, chunk // 2)
+
+
+class StepGenerator:
+    """Picks the next step of a game, legal or not"""
+
+    def __init__(
+        self,
+        rng: random.Random,
+        legal_fraction: float = LEGAL_FRACTION,
+        room_step_fraction: float = ROOM_STEP_FRACTION,
+    ):
+        self.rng = rng
+        self.legal_fraction = legal_fraction
+        self.room_step_fraction = room_step_fraction
+
+    def next_step(self, manager: GameManager, players: List[str]) -> Dict:
+        coup_game = manager.get_coup_game(ROOM_CODE)
+        legal = [
+            (player_id, move)
+            for player_id, moves in coup_game.get_legal_moves().items()
+            for move in moves
+        ]
+        if self.room_step_fraction and self.rng.random() < self.room_step_fraction:
+            return self.room_step(players)
+        roll = self.rng.random()
+        if legal and roll < self.legal_fraction:
+            return self.legal_step(*self.rng.choice(legal))
+        # Half the junk is a legal move with one thing wrong, which gets past most checks
+        if legal and roll < (1 + self.legal_fraction) / 2:
+            return self.near_miss_step(
+                self.legal_step(*self.rng.choice(legal)), coup_game, players
+            )
+        return self.junk_step(coup_game, players)
+
+    @staticmethod
+    def legal_step(player_id: str, move: Dict) -> Dict:
+        """Turn a legal move into an action log entry"""
+        move_type = move["action_type"]
+        if move_type == "perform_action":
+            args = [move["game_action"]]
+        elif move_type == "counter":
+            args = [move["counter_action"]]
+        elif move_type == "complete_exchange":
+            args = [move["kept_indices"]]
+        else:
+            args = []
+        return {"type": move_type, "player_id": player_id, "args": args}
+
+    def near_miss_step(self, step: Dict, coup_game, players: List[str]) -> Dict:
+        """Break one thing about a legal step: its player or one of its arguments"""
+        rng = self.rng
+        if not step["args"] or rng.random() < 0.3:
+            return {**step, "player_id": rng.choice(players + [GHOST])}
+
+        arg = step["args"][0]
+        if step["type"] == "complete_exchange":
+            kept = list(arg)
+            mutation = rng.randrange(3)
+            if mutation == 0:
+                # Keep the same card twice
+                kept[-1] = kept[0]
+            elif mutation == 1:
+                kept[rng.randrange(len(kept))] = rng.choice([-1, len(kept) + 2])
+            else:
+                kept = kept + [0] if rng.random() < 0.5 else kept[:-1]
+            return {**step, "args": [kept]}
+
+        arg = dict(arg)
+        if step["type"] == "counter":
+            arg["character"] = rng.choice(CHARACTERS)
+        else:
+            arg["target_id"] = rng.choice(players + [GHOST, step["player_id"]])
+            if rng.random() < 0.3:
+                arg["card_index"] = rng.randint(-2, 3)
+        return {**step, "args": [arg]}
+
+    def room_step(self, players: List[str]) -> Dict:
+        """Ready everyone again, maybe with someone gone or new, or start again"""
+        rng = self.rng
+        player_id = rng.choice(players)
+        if rng.random() < 0.5:
+            return {"type": "start", "player_id": player_id, "args": []}
+
+        roster = list(players)
+        change = rng.randrange(3)
+        if change == 1 and len(roster) > 2:
+            roster.remove(rng.choice(roster))
+        elif change == 2:
+            roster.append(f"p{len(players)}")
+        return {
+            "type": "ready",
+            "player_id": player_id,
+            "args": [roster, rng.getrandbits(32)],
+        }
+
+    def junk_step(self, coup_game, players: List[str]) -> Dict:
+        """Make up a move, most likely out of turn or malformed"""
+        rng = self.rng
+        player_id = rng.choice(players + [GHOST])
+        move_type = rng.choice(MOVE_TYPES)
+
+        if move_type == "perform_action":
+            action = {
+                "action_type": rng.choice(list(coup_game.rules.actions) + ["fly"])
+            }
+            if rng.random() < 0.8:
+                action["target_id"] = rng.choice(players + [GHOST, player_id])
+            if rng.random() < 0.2:
+                action["card_index"] = rng.randint(-2, 3)
+            args = [action]
+        elif move_type == "counter":
+            counter_types = [counter_type for _, counter_type in coup_game.rules.blocks]
+            args = [
+                {
+                    "counter_type": rng.choice(counter_types + ["block_everything"]),
+                    "character": rng.choice(CHARACTERS),
+                }
+            ]
+        elif move_type == "complete_exchange":
+            args = [[rng.randint(-1, 4) for _ in range(rng.randint(0, 4))]]
+        else:
+            args = []
+        return {"type": move_type, "player_id": player_id, "args": args}
+
+
+def fuzz(
+    seed: int,
+    steps: int,
+    players: Optional[int] = None,
+    variation: Optional[str] = None,
+    legal_fraction: float = LEGAL_FRACTION,
+) -> Dict:
+    """Play random games until the step budget is spent or an invariant breaks"""
+    rng = random.Random(seed)
+    generator = StepGenerator(rng, legal_fraction)
+    variations = [v.value for v in RoomVariation]
+    games = steps_played = 0
+    start = time.perf_counter()
+
+    while steps_played < steps:
+        case = FuzzCase(
+            rng.getrandbits(32),
+            players or rng.randint(2, 6),
+            variation or rng.choice(variations),
+        )
+        ids = player_ids(case.players)
+        manager = start_game(case)
+        games += 1
+
+        failure = None
+        for _ in range(min(MAX_GAME_STEPS, steps - steps_played)):
+            step = generator.next_step(manager, ids)
+            case.steps.append(step)
+            steps_played += 1
+            try:
+                apply_step(manager, step)
+                check_invariants(manager)
+            except InvariantViolation as e:
+                failure = Failure(len(case.steps) - 1, e.invariant, str(e))
+            except Exception as e:
+                failure = Failure(
+                    len(case.steps) - 1,
+                    f"crash:{type(e).__name__}",
+                    f"{type(e).__name__}: {e}",
+                )
+            if failure or manager.get_game(ROOM_CODE).status == GameStatus.FINISHED:
+                break
+
+        if failure:
+            shrunk = shrink(case, failure)
+            return {
+                "seed": seed,
+                "games": games,
+                "steps": steps_played,
+                "elapsed_s": time.perf_counter() - start,
+                "failure": run_case(shrunk).to_json(),
+                "case": shrunk.to_json(),
+            }
+
+    return {
+        "seed": seed,
+        "games": games,
+        "steps": steps_played,
+        "elapsed_s": time.perf_counter() - start,
+        "failure": None,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Fuzz the game engine's invariants")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--steps", type=int, default=50_000)
+    parser.add_argument(
+        "--players", type=int, default=None, help="Players per game (default 2-6)"
+    )
+    parser.add_argument(
+        "--variation",
+        choices=[v.value for v in RoomVariation],
+        default=None,
+        help="Room variation (default: random per game)",
+    )
+    parser.add_argument(
+        "--legal-fraction",
+        type=float,
+        default=LEGAL_FRACTION,
+        help="Share of steps picked from the legal moves",
+    )
+    parser.add_argument("--json", help="Write the report, with any failing case, here")
+    parser.add_argument("--replay", help="Play a failing case written by --json again")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    if args.replay:
+        with open(args.replay) as f:
+            data = json.load(f)
+        data = data.get("case") or data
+        if "steps" not in data:
+            print(f"No failing case in {args.replay}")
+            return 2
+        case = FuzzCase.from_json(data)
+        failure = run_case(case)
+        if failure:
+            print(f"Step {failure.step} of {len(case.steps)}: {failure.message}")
+            return 1
+        print(f"All {len(case.steps)} steps hold the invariants")
+        return 0
+
+    report = fuzz(
+        args.seed, args.steps, args.players, args.variation, args.legal_fraction
+    )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    print(
+        f"{report['steps']} steps in {report['games']} games, "
+        f"{report['elapsed_s']:.1f}s ({report['steps'] / report['elapsed_s']:.0f} steps/s)"
+    )
+    failure = report["failure"]
+    if failure:
+        print(
+            f"Invariant broken after {len(report['case']['steps'])} steps: {failure['message']}"
+        )
+        for step in report["case"]["steps"]:
+            print(f"  {json.dumps(step)}")
+        return 1
+    print("All invariants held")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
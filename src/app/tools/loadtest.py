@@ -0,0 +1,401 @@
+"""
+WebSocket load generator.
+
+Starts the app from app.main:app in a separate process (or targets a running
+server with --url) and opens rooms full of bot clients. Bots ready up and play
+whole games through the real game_action protocol, picking a random move from
+the legal_moves of every game state they receive, then throughput and latency
+percentiles per message type are reported.
+
+    uv run -m app.tools.loadtest --rooms 500 --players 4 --games 2
+    uv run -m app.tools.loadtest --profile slow-reader --slow-fraction 0.2
+    uv run -m app.tools.loadtest --profile disconnect-storm --storm-at 10
+"""
+
+from typing import Dict, List, Optional
+from urllib.parse import quote
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+from websockets.asyncio.client import connect
+
+PROFILES = ["normal", "slow-reader", "disconnect-storm"]
+
+
+class LatencyStats:
+    """Collects response latencies per message type"""
+
+    def __init__(self):
+        # Map of message type -> latencies in seconds
+        self.latencies: Dict[str, List[float]] = {}
+        self.messages_sent = 0
+        self.messages_received = 0
+        self.games_completed = 0
+        self.stalls = 0
+        self.disconnects = 0
+        self.errors = 0
+        self.connect_failures = 0
+
+    def record(self, message_type: str, seconds: float) -> None:
+        if message_type not in self.latencies:
+            self.latencies[message_type] = []
+        self.latencies[message_type].append(seconds)
+
+    def summary(self, elapsed: float) -> Dict:
+        latency = {}
+        for message_type, values in sorted(self.latencies.items()):
+            values.sort()
+            latency[message_type] = {
+                "count": len(values),
+                "p50_ms": _percentile(values, 50) * 1000,
+                "p95_ms": _percentile(values, 95) * 1000,
+                "p99_ms": _percentile(values, 99) * 1000,
+                "max_ms": values[-1] * 1000,
+            }
+        return {
+            "elapsed_s": elapsed,
+            "messages_sent": self.messages_sent,
+            "messages_received": self.messages_received,
+            "throughput_msgs_per_s": (self.messages_sent + self.messages_received)
+            / elapsed,
+            "games_completed": self.games_completed,
+            "games_per_s": self.games_completed / elapsed,
+            "stalls": self.stalls,
+            "disconnects": self.disconnects,
+            "errors": self.errors,
+            "connect_failures": self.connect_failures,
+            "latency": latency,
+        }
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Room:
+    """Shared state of the bots playing one game"""
+
+    def __init__(self, slot: int, game: int):
+        self.slot = slot
+        self.game = game
+        # Resolved with the room code once the first bot created the room
+        self.code: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class Bot:
+    """A client that joins a room, readies up and plays random legal moves"""
+
+    def __init__(
+        self,
+        args: argparse.Namespace,
+        room: Room,
+        index: int,
+        stats: LatencyStats,
+        storm: asyncio.Event,
+        rng: random.Random,
+    ):
+        self.args = args
+        self.room = room
+        self.index = index
+        self.stats = stats
+        self.storm = storm
+        self.rng = rng
+        self.name = f"bot-{room.slot}-{room.game}-{index}"
+        self.slow = args.profile == "slow-reader" and rng.random() < args.slow_fraction
+        self.storm_victim = (
+            args.profile == "disconnect-storm" and rng.random() < args.storm_fraction
+        )
+        # (message type, send time) of the request waiting for its response
+        self.pending: Optional[tuple] = None
+        self.ready_sent = False
+        self.last_version = -1
+
+    def _path(self, code: Optional[str]) -> str:
+        name = quote(self.name)
+        if code is None:
+            return f"/ws/room/new?player_name={name}&create=true"
+        return f"/ws/room/{code}?player_name={name}"
+
+    async def run(self) -> None:
+        code = None
+        if self.index > 0:
+            code = await self.room.code
+        try:
+            async with connect(
+                self.args.url + self._path(code),
+                open_timeout=self.args.idle_timeout,
+                ping_interval=None,
+                max_size=None,
+            ) as ws:
+                await self._play(ws)
+        except (OSError, asyncio.TimeoutError) as e:
+            self.stats.connect_failures += 1
+            if not self.room.code.done():
+                self.room.code.set_exception(e)
+        except Exception:
+            # The server closed the connection under us
+            self.stats.disconnects += 1
+
+    async def _play(self, ws) -> None:
+        while True:
+            if self.storm_victim and self.storm.is_set():
+                # Drop the connection without a closing handshake
+                self.stats.disconnects += 1
+                ws.transport.abort()
+                return
+
+            if self.slow:
+                await asyncio.sleep(self.args.read_delay)
+
+            try:
+                data = await asyncio.wait_for(ws.recv(), self.args.idle_timeout)
+            except asyncio.TimeoutError:
+                self.stats.stalls += 1
+                return
+
+            self.stats.messages_received += 1
+            message = json.loads(data)
+            message_type = message.get("type")
+            now = time.perf_counter()
+
+            if message_type == "room_joined" and not self.room.code.done():
+                self.room.code.set_result(message["room_code"])
+
+            if message_type in ("room_joined", "player_joined"):
+                if len(message["players"]) == self.args.players and not self.ready_sent:
+                    self.ready_sent = True
+                    await self._send(ws, "ready", {"type": "ready", "ready": True})
+
+            elif message_type == "player_ready":
+                if message.get("player") == self.name:
+                    self._resolve(now)
+
+            elif message_type == "game_action_result":
+                if message.get("player") == self.name:
+                    self._resolve(now)
+
+            elif message_type == "error":
+                self.stats.errors += 1
+                self._resolve(now)
+
+            elif message_type == "game_over":
+                if self.index == 0:
+                    self.stats.games_completed += 1
+                return
+
+            elif message_type == "game_state":
+                await self._act(ws, message["state"])
+
+    async def _act(self, ws, state: Dict) -> None:
+        """Play a random legal move, once per state version"""
+        version = state.get("version", 0)
+        moves = state.get("legal_moves") or []
+        if not moves or self.pending or version <= self.last_version:
+            return
+        self.last_version = version
+
+        if self.args.think_time:
+            await asyncio.sleep(self.rng.uniform(0, self.args.think_time))
+
+        move = self.rng.choice(moves)
+        await self._send(
+            ws, move["action_type"], {"type": "game_action", "action": move}
+        )
+
+    async def _send(self, ws, message_type: str, message: Dict) -> None:
+        self.pending = (message_type, time.perf_counter())
+        self.stats.messages_sent += 1
+        await ws.send(json.dumps(message))
+
+    def _resolve(self, now: float) -> None:
+        if self.pending:
+            message_type, sent_at = self.pending
+            self.stats.record(message_type, now - sent_at)
+            self.pending = None
+
+
+async def run_slot(
+    args: argparse.Namespace,
+    slot: int,
+    stats: LatencyStats,
+    storm: asyncio.Event,
+) -> None:
+    """Play games one after another in fresh rooms"""
+    rng = random.Random(args.seed * 1_000_003 + slot)
+    # Spread connections over the ramp up
+    await asyncio.sleep(rng.uniform(0, args.ramp))
+
+    for game in range(args.games):
+        room = Room(slot, game)
+        bots = [
+            Bot(args, room, index, stats, storm, rng) for index in range(args.players)
+        ]
+        await asyncio.gather(*(bot.run() for bot in bots))
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    stats = LatencyStats()
+    storm = asyncio.Event()
+
+    async def trigger_storm():
+        await asyncio.sleep(args.storm_at)
+        storm.set()
+
+    storm_task = None
+    if args.profile == "disconnect-storm":
+        storm_task = asyncio.create_task(trigger_storm())
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(run_slot(args, slot, stats, storm) for slot in range(args.rooms))
+    )
+    elapsed = time.perf_counter() - start
+
+    if storm_task:
+        storm_task.cancel()
+    return stats.summary(elapsed)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int) -> subprocess.Popen:
+    """Start app.main:app with uvicorn and wait until it accepts connections"""
+    app_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+            "--app-dir",
+            app_dir,
+        ],
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("Server did not start in time")
+
+
+def raise_file_limit() -> None:
+    """Allow as many open sockets as the hard limit permits"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def print_report(report: Dict) -> None:
+    print(
+        f"{report['elapsed_s']:.1f}s, {report['games_completed']} games "
+        f"({report['games_per_s']:.1f}/s), "
+        f"{report['throughput_msgs_per_s']:.0f} msgs/s"
+    )
+    print(
+        f"stalls {report['stalls']}, disconnects {report['disconnects']}, "
+        f"errors {report['errors']}, connect failures {report['connect_failures']}"
+    )
+    print(f"{'message type':<20}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for message_type, latency in report["latency"].items():
+        print(
+            f"{message_type:<20}{latency['count']:>8}{latency['p50_ms']:>10.2f}"
+            f"{latency['p95_ms']:>10.2f}{latency['p99_ms']:>10.2f}"
+        )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--url", help="WebSocket base URL of a running server, e.g. ws://host:8080"
+    )
+    parser.add_argument("--rooms", type=int, default=100, help="Concurrent rooms")
+    parser.add_argument("--players", type=int, default=4, help="Bots per room")
+    parser.add_argument("--games", type=int, default=1, help="Games per room")
+    parser.add_argument("--profile", choices=PROFILES, default="normal")
+    parser.add_argument(
+        "--ramp", type=float, default=2.0, help="Seconds to spread room starts over"
+    )
+    parser.add_argument(
+        "--think-time", type=float, default=0.0, help="Max seconds a bot waits to move"
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=10.0,
+        help="Seconds without a message before a bot counts its game as stalled",
+    )
+    parser.add_argument(
+        "--slow-fraction", type=float, default=0.1, help="Share of slow readers"
+    )
+    parser.add_argument(
+        "--read-delay",
+        type=float,
+        default=0.05,
+        help="Seconds a slow reader waits before each read",
+    )
+    parser.add_argument(
+        "--storm-at", type=float, default=5.0, help="Seconds until the storm hits"
+    )
+    parser.add_argument(
+        "--storm-fraction",
+        type=float,
+        default=0.5,
+        help="Share of bots dropping their connection in the storm",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the bots' moves")
+    parser.add_argument("--json", help="Write the report to this file as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    raise_file_limit()
+
+    server = None
+    if not args.url:
+        port = _free_port()
+        server = start_server(port)
+        args.url = f"ws://127.0.0.1:{port}"
+
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    report["config"] = {
+        key: value for key, value in vars(args).items() if key != "json"
+    }
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
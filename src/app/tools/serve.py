@@ -0,0 +1,389 @@
+"""
+Production server launcher.
+
+Runs app.main:app in one process per core. Every worker listens on the public
+port through its own SO_REUSEPORT socket, so the kernel spreads connections
+across them without a shared accept lock, and also on a port of its own
+(--worker-port-base + worker ID). Rooms live in one worker's memory, so the
+launcher wires the workers into the room code sharding (ROOM_CODE_*): a
+connection for a room on another worker is redirected to that worker's own
+port. It also wires them into draining (MIGRATION_*): each worker hands its
+games to the next one when it stops.
+
+The supervisor restarts workers that die. On SIGHUP it restarts them one at
+a time, so every worker drains into a running peer and no game is lost. On
+SIGTERM or SIGINT it drains and stops all of them; their games go to
+--spool-dir for the next launch.
+
+    uv run -m app.tools.serve --workers 8 --port 8080
+    uv run -m app.tools.serve --spool-dir /var/lib/coup/spool --ws-max-size 65536
+    uv run -m app.tools.serve --workers 1 --loop asyncio --no-cpu-affinity
+"""
+
+from typing import Dict, List, Optional, Tuple
+import argparse
+import importlib.util
+import logging
+import multiprocessing
+import os
+import secrets
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+# Seconds before a dead worker is started again, doubled while it keeps dying
+RESPAWN_DELAY = 1.0
+MAX_RESPAWN_DELAY = 30.0
+# Seconds a worker has to run to count as healthy again
+HEALTHY_AFTER = 30.0
+# Seconds a restarted worker has to start listening
+STARTUP_TIMEOUT = 30.0
+# Seconds between checks on the workers
+POLL_INTERVAL = 0.5
+
+
+def available_cpus() -> List[int]:
+    """Get the CPUs this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def resolve_implementation(choice: str, fast: str, fallback: str) -> str:
+    """Pick the fast implementation (uvloop, httptools) for auto when it's installed"""
+    if choice != "auto":
+        return choice
+    return fast if importlib.util.find_spec(fast) else fallback
+
+
+def bind_socket(host: str, port: int, reuse_port: bool) -> socket.socket:
+    """Create a bound TCP socket, the server starts listening with its backlog"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def worker_environment(args: argparse.Namespace, worker_id: int) -> Dict[str, str]:
+    """
+    Get the settings a worker runs with. ROOM_CODE_WORKER_URLS can be set to
+    the workers' public URLs when a proxy sits in front of their ports.
+    """
+    env = {
+        "ROOM_CODE_WORKER_ID": str(worker_id),
+        "ROOM_CODE_WORKERS": str(args.workers),
+        "ROOM_CODE_KEY": args.room_code_key,
+        "MIGRATION_TOKEN": args.migration_token,
+        "PLAYER_TOKEN_KEY": args.player_token_key,
+        # Segment files take appends from one process, exports read every shard
+        "GAME_ARCHIVE_SHARD": f"worker-{worker_id}",
+        # A restarted worker goes on counting where it was, not over its peers' rooms
+        "ROOM_CODE_STATE_FILE": os.path.join(
+            args.state_dir, f"worker-{worker_id}-room-codes.json"
+        ),
+    }
+    if args.workers > 1:
+        env["ROOM_CODE_WORKER_URLS"] = os.getenv("ROOM_CODE_WORKER_URLS") or ",".join(
+            f"{{scheme}}://{{host}}:{args.worker_port_base + i}"
+            for i in range(args.workers)
+        )
+        peer_id = (worker_id + 1) % args.workers
+        peer_port = args.worker_port_base + peer_id
+        env["MIGRATION_PEER_URL"] = f"http://127.0.0.1:{peer_port}"
+        env["MIGRATION_PEER_WORKER_ID"] = str(peer_id)
+        env["MIGRATION_RECONNECT_URL"] = f"{{scheme}}://{{host}}:{peer_port}"
+    if args.spool_dir:
+        # Each worker's spooled games come back on the same worker, where they're redirected to
+        env["MIGRATION_SPOOL_DIR"] = os.path.join(args.spool_dir, f"worker-{worker_id}")
+    return env
+
+
+def run_worker(args: argparse.Namespace, worker_id: int) -> None:
+    """Serve the app in this process, as one of the launcher's workers"""
+    os.environ.update(worker_environment(args, worker_id))
+
+    if args.cpu_affinity and hasattr(os, "sched_setaffinity"):
+        cpus = available_cpus()
+        os.sched_setaffinity(0, {cpus[worker_id % len(cpus)]})
+
+    sockets = [bind_socket(args.host, args.port, reuse_port=True)]
+    if args.workers > 1:
+        sockets.append(
+            bind_socket(args.host, args.worker_port_base + worker_id, reuse_port=False)
+        )
+
+    config = uvicorn.Config(
+        "app.main:app",
+        loop=args.loop,
+        http=args.http,
+        ws="auto",
+        backlog=args.backlog,
+        timeout_keep_alive=args.keepalive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        limit_concurrency=args.limit_concurrency,
+        ws_max_size=args.ws_max_size,
+        ws_ping_interval=args.ws_ping_interval,
+        ws_ping_timeout=args.ws_ping_timeout,
+        ws_per_message_deflate=args.ws_per_message_deflate,
+        proxy_headers=args.proxy_headers,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+        access_log=args.access_log,
+        log_level=args.log_level,
+    )
+    uvicorn.Server(config).run(sockets=sockets)
+
+
+class Supervisor:
+    """
+    Starts the workers and keeps them running. Signals only set flags; the
+    supervisor loop acts on them between checks on the workers.
+    """
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.context = multiprocessing.get_context("spawn")
+        # Map of worker ID -> worker process
+        self.workers: Dict[int, multiprocessing.Process] = {}
+        # Map of worker ID -> start time of its process
+        self.started_at: Dict[int, float] = {}
+        # Map of worker ID -> (delay before its next start, earliest next start)
+        self.respawns: Dict[int, Tuple[float, Optional[float]]] = {}
+        self.stopping = False
+        self.reload_requested = False
+
+    def spawn(self, worker_id: int) -> None:
+        """Start a worker process"""
+        process = self.context.Process(
+            target=run_worker,
+            args=(self.args, worker_id),
+            name=f"coup-worker-{worker_id}",
+        )
+        process.start()
+        self.workers[worker_id] = process
+        self.started_at[worker_id] = time.monotonic()
+        logger.info(f"Started worker {worker_id} (pid {process.pid})")
+
+    def stop_worker(self, worker_id: int) -> None:
+        """Drain and stop a worker, killing it if it takes too long"""
+        process = self.workers[worker_id]
+        if process.is_alive():
+            process.terminate()
+        process.join(self.args.graceful_timeout + self.args.drain_timeout)
+        if process.is_alive():
+            logger.warning(f"Worker {worker_id} did not stop in time, killing it")
+            process.kill()
+            process.join()
+
+    def wait_until_listening(self, worker_id: int) -> bool:
+        """Wait for a worker to accept connections on its own port"""
+        port = (
+            self.args.worker_port_base + worker_id
+            if self.args.workers > 1
+            else self.args.port
+        )
+        host = "127.0.0.1" if self.args.host in ("0.0.0.0", "") else self.args.host
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline and self.workers[worker_id].is_alive():
+            try:
+                socket.create_connection((host, port), timeout=0.5).close()
+                return True
+            except OSError:
+                time.sleep(0.1)
+        logger.warning(f"Worker {worker_id} did not start listening")
+        return False
+
+    def reload(self) -> None:
+        """Restart the workers one by one, each drains into a running peer"""
+        logger.info("Restarting workers")
+        for worker_id in sorted(self.workers):
+            if self.stopping:
+                return
+            self.stop_worker(worker_id)
+            self.spawn(worker_id)
+            # The next worker drains into this one, it has to be up first
+            self.wait_until_listening(worker_id)
+
+    def check_workers(self) -> None:
+        """Start dead workers again, backing off while they keep dying"""
+        now = time.monotonic()
+        for worker_id, process in list(self.workers.items()):
+            if process.is_alive():
+                if now - self.started_at[worker_id] > HEALTHY_AFTER:
+                    self.respawns.pop(worker_id, None)
+                continue
+
+            delay, not_before = self.respawns.get(worker_id, (RESPAWN_DELAY, None))
+            if not_before is None:
+                logger.warning(
+                    f"Worker {worker_id} exited with code {process.exitcode}, "
+                    f"restarting it in {delay:.0f}s"
+                )
+                self.respawns[worker_id] = (delay, now + delay)
+            elif now >= not_before:
+                self.respawns[worker_id] = (min(delay * 2, MAX_RESPAWN_DELAY), None)
+                self.spawn(worker_id)
+
+    def run(self) -> None:
+        """Start every worker and supervise them until told to stop"""
+
+        def handle_stop(sig, frame):
+            self.stopping = True
+
+        def handle_reload(sig, frame):
+            self.reload_requested = True
+
+        signal.signal(signal.SIGTERM, handle_stop)
+        signal.signal(signal.SIGINT, handle_stop)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, handle_reload)
+
+        for worker_id in range(self.args.workers):
+            self.spawn(worker_id)
+
+        while not self.stopping:
+            time.sleep(POLL_INTERVAL)
+            if self.reload_requested:
+                self.reload_requested = False
+                self.reload()
+            self.check_workers()
+
+        logger.info("Stopping workers")
+        for process in self.workers.values():
+            if process.is_alive():
+                process.terminate()
+        for worker_id in self.workers:
+            self.stop_worker(worker_id)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    cpus = available_cpus()
+    parser = argparse.ArgumentParser(description="Run the game server on every core")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=len(cpus),
+        help="Worker processes (default: one per available CPU)",
+    )
+    parser.add_argument(
+        "--worker-port-base",
+        type=int,
+        default=None,
+        help="Worker N also listens on this port + N (default: --port + 1)",
+    )
+    parser.add_argument("--loop", choices=["auto", "asyncio", "uvloop"], default="auto")
+    parser.add_argument("--http", choices=["auto", "h11", "httptools"], default="auto")
+    parser.add_argument(
+        "--cpu-affinity",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Pin each worker to its own CPU",
+    )
+    parser.add_argument(
+        "--backlog", type=int, default=2048, help="Pending connections per listener"
+    )
+    parser.add_argument(
+        "--keepalive",
+        type=int,
+        default=5,
+        help="Seconds idle HTTP connections stay open",
+    )
+    parser.add_argument(
+        "--limit-concurrency",
+        type=int,
+        default=None,
+        help="Connections per worker above which HTTP requests get 503",
+    )
+    parser.add_argument(
+        "--ws-max-size",
+        type=int,
+        default=64 * 1024,
+        help="Largest WebSocket message accepted, in bytes",
+    )
+    parser.add_argument("--ws-ping-interval", type=float, default=20.0)
+    parser.add_argument("--ws-ping-timeout", type=float, default=20.0)
+    parser.add_argument(
+        "--ws-per-message-deflate",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Compress WebSocket messages (costs CPU on every broadcast)",
+    )
+    parser.add_argument(
+        "--graceful-timeout",
+        type=int,
+        default=30,
+        help="Seconds a stopping worker waits for its connections to close",
+    )
+    parser.add_argument(
+        "--drain-timeout",
+        type=int,
+        default=15,
+        help="Extra seconds a stopping worker gets to hand its games off",
+    )
+    parser.add_argument(
+        "--spool-dir",
+        default=os.getenv("MIGRATION_SPOOL_DIR"),
+        help="Where stopping workers leave their games for the next launch",
+    )
+    parser.add_argument(
+        "--state-dir",
+        default=None,
+        help="Where workers keep state across restarts (default: --spool-dir, "
+        "or a directory made for this launch)",
+    )
+    parser.add_argument(
+        "--proxy-headers", action=argparse.BooleanOptionalAction, default=True
+    )
+    parser.add_argument("--forwarded-allow-ips", default=None)
+    parser.add_argument(
+        "--access-log", action=argparse.BooleanOptionalAction, default=False
+    )
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.worker_port_base is None:
+        args.worker_port_base = args.port + 1
+    args.loop = resolve_implementation(args.loop, "uvloop", "asyncio")
+    args.http = resolve_implementation(args.http, "httptools", "h11")
+    if args.state_dir is None:
+        args.state_dir = args.spool_dir or tempfile.mkdtemp(prefix="coup-state-")
+    # Every worker has to agree on these, generate them once for all of them
+    args.room_code_key = os.getenv("ROOM_CODE_KEY") or secrets.token_hex(16)
+    args.migration_token = os.getenv("MIGRATION_TOKEN") or secrets.token_hex(16)
+    args.player_token_key = os.getenv("PLAYER_TOKEN_KEY") or secrets.token_hex(16)
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(message)s"
+    )
+    if args.workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+        logger.error("SO_REUSEPORT is not available here, run with --workers 1")
+        return 1
+
+    logger.info(
+        f"Serving on {args.host}:{args.port} with {args.workers} workers "
+        f"(loop {args.loop}, http {args.http}, "
+        f"CPU affinity {'on' if args.cpu_affinity else 'off'})"
+    )
+    Supervisor(args).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,45 @@
+// Close code the server uses when it restarts and hands the game to another worker
+const SERVICE_RESTART = 1012;
+
+interface ReconnectMessage {
+    room_code: string;
+    player_id: string;
+    url: string | null;
+    resumable: boolean;
+}
+
+interface RedirectMessage {
+    room_code: string;
+    url: string;
+}
+
 export class WebSocketService {
     private socket: WebSocket | null = null;
     private messageHandlers: Map<string, (data: any) => void> = new Map();
+    private playerName = '';
+    private pendingReconnect: ReconnectMessage | null = null;
+    private pendingRedirect: RedirectMessage | null = null;
 
     connect(roomCode: string, playerName: string, isCreate: boolean): Promise<void> {
-        return new Promise((resolve, reject) => {
-            const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-            const wsUrl = `${protocol}//${window.location.host}/ws/room/${roomCode}?player_name=${encodeURIComponent(playerName)}&create=${isCreate}`;
+        this.playerName = playerName;
+        const wsUrl = `${this.defaultBaseUrl()}/ws/room/${roomCode}?player_name=${encodeURIComponent(playerName)}&create=${isCreate}`;
+        return this.open(wsUrl);
+    }
 
+    private defaultBaseUrl(): string {
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        return `${protocol}//${window.location.host}`;
+    }
+
+    private resume(reconnect: ReconnectMessage) {
+        const baseUrl = reconnect.url || this.defaultBaseUrl();
+        const wsUrl = `${baseUrl}/ws/room/${reconnect.room_code}?player_name=${encodeURIComponent(this.playerName)}&player_id=${encodeURIComponent(reconnect.player_id)}`;
+        this.open(wsUrl).catch(error => console.error('Error resuming game:', error));
+    }
+
+    private open(wsUrl: string): Promise<void> {
+        return new Promise((resolve, reject) => {
+            const { pathname, search } = new URL(wsUrl);
             this.socket = new WebSocket(wsUrl);
 
             this.socket.onopen = () => {
@@ -25,7 +58,17 @@ export class WebSocketService {
 
             this.socket.onclose = event => {
                 console.log('Disconnected from room', event.code, event.reason);
-                if (event.code === 4000) {
+                const reconnect = this.pendingReconnect;
+                const redirect = this.pendingRedirect;
+                this.pendingReconnect = null;
+                this.pendingRedirect = null;
+                if (redirect) {
+                    // The room lives on another worker, connect there the same way
+                    this.open(`${redirect.url}${pathname}${search}`).then(resolve, reject);
+                } else if (event.code === SERVICE_RESTART && reconnect?.resumable) {
+                    // The game moved to another worker, take our seat back there
+                    this.resume(reconnect);
+                } else if (event.code === 4000) {
                     reject(new Error('Room already exists. Please try a different code.'));
                 } else if (event.code !== 1000) {
                     reject(new Error(`Connection closed: ${event.reason || 'Unknown reason'}`));
@@ -69,6 +112,12 @@ export class WebSocketService {
     private handleMessage(message: any) {
         console.log('Received message:', message);
 
+        if (message.type === 'reconnect') {
+            this.pendingReconnect = message;
+        } else if (message.type === 'redirect') {
+            this.pendingRedirect = message;
+        }
+
         const handler = this.messageHandlers.get(message.type);
         if (handler) {
             handler(message);
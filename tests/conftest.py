@@ -0,0 +1,30 @@
+import random
+
+import pytest
+
+# Load the controllers in dependency order, the way the app does
+import app.main  # noqa: F401
+from app.controllers.game.game_manager import GameManager
+from app.models.game import GameStatus
+from app.tools import fuzz
+
+
+def play(seed: int, players: int = 3, variation: str = "coup-o-clock") -> GameManager:
+    """Play a game of legal moves only, picked at random, to the end"""
+    case = fuzz.FuzzCase(seed, players, variation)
+    manager = fuzz.start_game(case)
+    generator = fuzz.StepGenerator(
+        random.Random(seed), legal_fraction=1.0, room_step_fraction=0
+    )
+    ids = fuzz.player_ids(players)
+    for _ in range(fuzz.MAX_GAME_STEPS * 10):
+        if manager.get_game(fuzz.ROOM_CODE).status == GameStatus.FINISHED:
+            break
+        result = fuzz.apply_step(manager, generator.next_step(manager, ids))
+        assert result.get("success"), result
+    return manager
+
+
+@pytest.fixture
+def play_game():
+    return play
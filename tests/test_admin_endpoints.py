@@ -0,0 +1,50 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.controllers.analytics import manager as analytics_manager
+from app.controllers.game import manager as game_manager
+from app.controllers.tracing import RingBufferExporter, tracer
+from app.main import app
+
+TOKEN = "admin"
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+def test_analytics_needs_the_admin_token(client, monkeypatch):
+    monkeypatch.setattr(analytics_manager, "token", None)
+    assert client.get("/analytics", headers={"X-Admin-Token": ""}).status_code == 403
+
+    monkeypatch.setattr(analytics_manager, "token", TOKEN)
+    assert client.get("/analytics").status_code == 403
+    assert (
+        client.get("/analytics", headers={"X-Admin-Token": "nope"}).status_code == 403
+    )
+    response = client.get("/analytics", headers={"X-Admin-Token": TOKEN})
+    assert response.status_code == 200
+    assert "games_started" in response.json()
+
+
+def test_traces_need_the_admin_token(client, monkeypatch):
+    exporter = tracer.get_exporter(RingBufferExporter)
+    monkeypatch.setattr(exporter, "token", None)
+    assert client.get("/traces").status_code == 403
+
+    monkeypatch.setattr(exporter, "token", TOKEN)
+    assert client.get("/traces", headers={"X-Admin-Token": "nope"}).status_code == 403
+    response = client.get("/traces", headers={"X-Admin-Token": TOKEN})
+    assert response.status_code == 200
+
+
+def test_starting_hands_are_kept_by_room_and_seed():
+    players = [{"id": "a", "name": "A"}, {"id": "b", "name": "B"}]
+    game_manager.create_game("HAND", players, seed=3)
+    try:
+        game_manager.start_game("HAND")
+        assert ("HAND", 3) in analytics_manager.starting_hands
+    finally:
+        game_manager.remove_game("HAND")
@@ -0,0 +1,36 @@
+from app.controllers.admission.admission_controller import AdmissionController
+from app.controllers.websockets import manager as ws_manager
+
+
+class Probe:
+    def __init__(self, lag: float = 0.0):
+        self.lag = lag
+
+
+def test_admits_when_idle():
+    assert AdmissionController(Probe(), max_loop_lag=0.25).check(True) is None
+
+
+def test_rejects_on_loop_lag_with_growing_hint():
+    probe = Probe(0.5)
+    controller = AdmissionController(probe, max_loop_lag=0.25, retry_after=5)
+    rejection = controller.check(creates_room=False)
+    assert rejection.reason == "loop_lag"
+    assert rejection.retry_after == 10
+
+    # The hint is capped
+    probe.lag = 100
+    assert controller.check(creates_room=False).retry_after == 30
+
+
+def test_room_limit_only_applies_to_new_rooms(monkeypatch):
+    monkeypatch.setattr(ws_manager, "active_rooms", {"AAAAA": set(), "BBBBB": set()})
+    controller = AdmissionController(Probe(), max_rooms=2)
+    assert controller.check(creates_room=True).reason == "rooms"
+    assert controller.check(creates_room=False) is None
+
+
+def test_connection_limit(monkeypatch):
+    monkeypatch.setattr(ws_manager, "connection_rooms", {object(): "AAAAA"})
+    controller = AdmissionController(Probe(), max_connections=1)
+    assert controller.check(creates_room=False).reason == "connections"
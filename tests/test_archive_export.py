@@ -0,0 +1,139 @@
+import json
+
+import pytest
+
+from app.controllers.records import export_ndjson, parse_cursor
+from app.controllers.records.archive import ShardedArchive
+from app.tools import fuzz
+
+GAMES = 300
+
+
+@pytest.fixture
+def archive(tmp_path, play_game):
+    game_state = play_game(1, players=3).get_game(fuzz.ROOM_CODE)
+    archive = ShardedArchive(str(tmp_path), segment_bytes=4096)
+    for i in range(GAMES):
+        game_state.room_code = f"R{i:04d}"
+        game_state.players[1].name = "carl" if i % 7 == 0 else "bob"
+        archive.append(game_state, finished_at=1_000 + i)
+    assert len(archive.archive("").segments()) > 1
+    return archive
+
+
+def export(archive, **filters):
+    return [
+        json.loads(line)
+        for chunk in export_ndjson(archive, **filters)
+        for line in chunk.decode().splitlines()
+    ]
+
+
+def test_exports_every_game_in_order(archive):
+    games = export(archive, events=False)
+    assert [game["room_code"] for game in games] == [f"R{i:04d}" for i in range(GAMES)]
+    assert "events" not in games[0]
+
+
+def test_cursor_resumes_right_after_a_game(archive):
+    codes = []
+    cursor = None
+    while True:
+        page = export(archive, cursor=cursor, limit=70, events=False)
+        if not page:
+            break
+        codes += [game["room_code"] for game in page]
+        cursor = page[-1]["cursor"]
+    assert codes == [f"R{i:04d}" for i in range(GAMES)]
+    positions = parse_cursor(cursor)
+    assert set(positions) == {""}
+    assert archive.is_record_boundary("", *positions[""])
+
+
+def test_filters(archive):
+    games = export(archive, finished_after=1_050, finished_before=1_100)
+    assert [game["finished_at"] for game in games] == list(range(1_050, 1_100))
+    assert all(game["events"] for game in games)
+
+    games = export(archive, player="carl", events=False)
+    assert len(games) == len(range(0, GAMES, 7))
+    assert not export(archive, variation="nope")
+
+
+def test_invalid_cursors(archive):
+    with pytest.raises(ValueError):
+        parse_cursor("nope")
+    with pytest.raises(ValueError):
+        parse_cursor("1:2,1:3")
+    assert not archive.is_record_boundary("", archive.archive("").segments()[0], 3)
+    assert not archive.is_record_boundary("worker-9", 1, 0)
+
+
+@pytest.fixture
+def worker_archives(tmp_path, play_game):
+    """Two workers archiving to shards of one directory, finishing interleaved"""
+    game_state = play_game(1, players=3).get_game(fuzz.ROOM_CODE)
+    workers = [
+        ShardedArchive(str(tmp_path), f"worker-{i}", segment_bytes=4096)
+        for i in range(2)
+    ]
+    for i in range(GAMES):
+        game_state.room_code = f"R{i:04d}"
+        # Worker 1 finishes its games in bursts, later than worker 0's
+        worker = i % 3 == 0
+        workers[worker].append(game_state, finished_at=1_000 + i + 5 * worker)
+    return ShardedArchive(str(tmp_path), segment_bytes=4096)
+
+
+def test_exports_every_worker_in_finishing_order(worker_archives):
+    assert worker_archives.shards() == ["worker-0", "worker-1"]
+    games = export(worker_archives, events=False)
+    times = [game["finished_at"] for game in games]
+    assert len(games) == GAMES
+    assert times == sorted(times)
+
+    # Worker 1's games finishing after the bound don't end worker 0's early
+    games = export(worker_archives, finished_after=1_100, finished_before=1_200)
+    assert [game["finished_at"] for game in games] == sorted(
+        1_000 + i + 5 * (i % 3 == 0)
+        for i in range(GAMES)
+        if 1_100 <= 1_000 + i + 5 * (i % 3 == 0) < 1_200
+    )
+
+
+def test_cursor_resumes_across_workers(worker_archives):
+    everything = [game["room_code"] for game in export(worker_archives, events=False)]
+    codes = []
+    cursor = None
+    while True:
+        page = export(worker_archives, cursor=cursor, limit=70, events=False)
+        if not page:
+            break
+        codes += [game["room_code"] for game in page]
+        cursor = page[-1]["cursor"]
+    assert codes == everything
+    positions = parse_cursor(cursor)
+    assert set(positions) == {"worker-0", "worker-1"}
+    assert all(
+        worker_archives.is_record_boundary(shard, *position)
+        for shard, position in positions.items()
+    )
+
+
+def test_finished_games_are_archived_off_the_loop(tmp_path, play_game):
+    archive = ShardedArchive(str(tmp_path), segment_bytes=4096)
+    archive.start()
+    seeds = [1, 2, 3]
+    for seed in seeds:
+        archive.submit(play_game(seed, players=3).get_game(fuzz.ROOM_CODE))
+    archive.stop()
+
+    assert not archive.pending
+    assert [game["seed"] for game in export(archive, events=False)] == seeds
+    # Stopping closes the shard's open segment and mappings
+    shard = archive.archive("")
+    assert shard._writer is None
+    mapped = list(shard._maps.values())
+    assert mapped
+    archive.stop()
+    assert all(buf.closed for buf in mapped)
@@ -0,0 +1,26 @@
+from app.controllers.assets.asset_store import (
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL,
+    AssetStore,
+)
+
+
+def test_only_hashed_vite_assets_are_immutable(tmp_path):
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "assets" / "index-B7a3xQ9c.js").write_text("built")
+    # Copied from public/ as they are, dashes and all
+    (tmp_path / "foo-background.png").write_bytes(b"png")
+    (tmp_path / "team-logos.svg").write_text("<svg/>")
+    (tmp_path / "index.html").write_text("<html></html>")
+
+    store = AssetStore()
+    store.load(tmp_path)
+    cache_control = {
+        path: store.response(path).headers["Cache-Control"] for path in store.assets
+    }
+    assert cache_control == {
+        "assets/index-B7a3xQ9c.js": IMMUTABLE_CACHE_CONTROL,
+        "foo-background.png": REVALIDATE_CACHE_CONTROL,
+        "team-logos.svg": REVALIDATE_CACHE_CONTROL,
+        "index.html": REVALIDATE_CACHE_CONTROL,
+    }
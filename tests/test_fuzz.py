@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from app.tools import fuzz
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2, 3])
+def test_engine_invariants_hold(seed):
+    report = fuzz.fuzz(seed, steps=5_000)
+    assert report["failure"] is None, json.dumps(report, indent=2)
+
+
+def test_case_replays_from_json(tmp_path, play_game):
+    manager = play_game(11, players=4)
+    steps = manager.get_game(fuzz.ROOM_CODE).action_log
+    case = fuzz.FuzzCase(11, 4, steps=steps)
+    assert fuzz.run_case(case) is None
+
+    path = tmp_path / "report.json"
+    path.write_text(json.dumps({"failure": None, "case": case.to_json()}))
+    assert fuzz.main(["--replay", str(path)]) == 0
+
+
+def test_replay_without_case(tmp_path):
+    path = tmp_path / "report.json"
+    path.write_text(json.dumps({"failure": None}))
+    assert fuzz.main(["--replay", str(path)]) == 2
+
+
+def test_readying_or_starting_again_leaves_the_game_alone():
+    steps = [
+        {"type": "ready", "player_id": "p0", "args": [["p0", "p1", "p2"], 5]},
+        {"type": "ready", "player_id": "p1", "args": [["p0", "p1"], 6]},
+        {"type": "ready", "player_id": "p2", "args": [["p0", "p1", "p2", "p3"], 7]},
+        {"type": "start", "player_id": "p2", "args": []},
+    ]
+    assert fuzz.run_case(fuzz.FuzzCase(11, 3, steps=steps)) is None
@@ -0,0 +1,119 @@
+import random
+
+import pytest
+
+from app.controllers.game.coup_game import CoupGame
+from app.controllers.records import GameRecord, encode_game, iter_records
+from app.models.game import GameStatus
+from app.models.room import RoomVariation
+from app.tools import fuzz
+
+
+def public_state(coup_game: CoupGame) -> dict:
+    """Everything replay has to reproduce"""
+    game_state = coup_game.game_state
+    return {
+        "status": game_state.status,
+        "current_player_index": game_state.current_player_index,
+        "players": [player.model_dump() for player in game_state.players],
+        "deck": game_state.deck,
+        "discard_pile": game_state.discard_pile,
+        "turn_number": game_state.turn_number,
+    }
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("variation", [v.value for v in RoomVariation])
+def test_record_round_trip_replays_the_game(play_game, seed, variation):
+    manager = play_game(seed, players=2 + seed % 5, variation=variation)
+    game_state = manager.get_game(fuzz.ROOM_CODE)
+    original = manager.get_coup_game(fuzz.ROOM_CODE)
+
+    record = GameRecord(encode_game(game_state, finished_at=1234), 0)
+    assert record.finished_at == 1234
+    assert record.seed == game_state.seed
+    assert record.variation == variation
+    assert record.players == [(p.id, p.name) for p in game_state.players]
+    assert record.event_count == len(game_state.action_log)
+    assert public_state(record.replay()) == public_state(original)
+
+
+def test_replay_from_the_action_log(play_game):
+    manager = play_game(3, players=5)
+    replayed = manager.replay_game(manager.get_game(fuzz.ROOM_CODE))
+    assert public_state(replayed) == public_state(manager.get_coup_game(fuzz.ROOM_CODE))
+
+
+def test_records_concatenate(play_game):
+    games = [play_game(seed).get_game(fuzz.ROOM_CODE) for seed in range(3)]
+    buf = b"".join(encode_game(game, i) for i, game in enumerate(games))
+    records = list(iter_records(buf))
+    assert [record.finished_at for record in records] == [0, 1, 2]
+    assert records[-1].end == len(buf)
+
+
+def test_uuid_and_string_player_ids(play_game):
+    game_state = play_game(5, players=2).get_game(fuzz.ROOM_CODE)
+    game_state.players[0].id = "4b0c8a4e-7f0e-4a4c-9a53-0a3c5e8f1b2d"
+    game_state.action_log = []
+    record = GameRecord(encode_game(game_state, 0), 0)
+    assert record.players[0][0] == "4b0c8a4e-7f0e-4a4c-9a53-0a3c5e8f1b2d"
+    assert record.players[1][0] == "p1"
+
+
+def test_not_a_record():
+    with pytest.raises(ValueError):
+        GameRecord(b"nope", 0)
+
+
+def test_counter_without_a_character_is_recorded():
+    manager = fuzz.start_game(fuzz.FuzzCase(0, 2))
+    coup_game = manager.get_coup_game(fuzz.ROOM_CODE)
+    first, second = [p.id for p in coup_game.game_state.players]
+    if coup_game.game_state.get_current_player().id != first:
+        first, second = second, first
+    assert coup_game.perform_action(first, {"action_type": "foreign_aid"})["success"]
+    assert coup_game.counter(second, {"counter_type": "block_foreign_aid"})["success"]
+    assert coup_game.game_state.action_log[-1]["args"][0]["character"] == "duke"
+
+    record = GameRecord(encode_game(coup_game.game_state, 0), 0)
+    assert list(record.events())[-1]["args"][0]["character"] == "duke"
+    assert public_state(record.replay()) == public_state(coup_game)
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_card_index_round_trips(seed):
+    """Coups and assassinations that pick the target's second card replay the same"""
+    manager = fuzz.start_game(fuzz.FuzzCase(seed, 3))
+    generator = fuzz.StepGenerator(
+        random.Random(seed), legal_fraction=1.0, room_step_fraction=0
+    )
+    ids = fuzz.player_ids(3)
+    while manager.get_game(fuzz.ROOM_CODE).status != GameStatus.FINISHED:
+        step = generator.next_step(manager, ids)
+        if step["type"] == "perform_action" and step["args"][0]["action_type"] in (
+            "coup",
+            "assassinate",
+        ):
+            step["args"][0] = {**step["args"][0], "card_index": 1}
+        assert fuzz.apply_step(manager, step).get("success")
+    game_state = manager.get_game(fuzz.ROOM_CODE)
+    original = manager.get_coup_game(fuzz.ROOM_CODE)
+
+    record = GameRecord(encode_game(game_state, 0), 0)
+    logged = [entry["args"] for entry in game_state.action_log]
+    decoded = [event["args"] for event in record.events()]
+    assert decoded == logged
+    assert public_state(record.replay()) == public_state(original)
+
+
+def test_version_1_records_are_read(play_game):
+    game_state = play_game(2).get_game(fuzz.ROOM_CODE)
+    data = bytearray(encode_game(game_state, 0))
+    # Without card indices, version 2 events are laid out as in version 1
+    data[2] = 1
+    record = GameRecord(bytes(data), 0)
+    assert record.format_version == 1
+    assert public_state(record.replay()) == public_state(
+        play_game(2).get_coup_game(fuzz.ROOM_CODE)
+    )
@@ -0,0 +1,127 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.controllers.game import manager as game_manager
+from app.controllers.game.game_manager import GameManager
+from app.controllers.player_tokens import manager as player_tokens
+from app.main import app
+
+PLAYERS = [{"id": "a", "name": "A"}, {"id": "b", "name": "B"}]
+
+
+@pytest.fixture
+def client():
+    game_manager.create_game("POLL", PLAYERS, seed=1)
+    game_manager.start_game("POLL")
+    with TestClient(app) as client:
+        yield client
+    game_manager.remove_game("POLL")
+
+
+def test_player_view_needs_the_token(client):
+    url = "/room/POLL/state?player_id=a"
+    assert client.get(url).status_code == 403
+    assert client.get(url, headers={"X-Player-Token": "nope"}).status_code == 403
+    # The token of another seat doesn't open this one
+    other = player_tokens.issue("POLL", "b")
+    assert client.get(url, headers={"X-Player-Token": other}).status_code == 403
+
+    token = player_tokens.issue("POLL", "a")
+    response = client.get(url, headers={"X-Player-Token": token})
+    assert response.status_code == 200
+    players = response.json()["players"]
+    assert "hidden" not in players[0]["cards"]
+    assert [p["id"] for p in players] == ["a", "b"]
+
+
+def test_spectator_view_hides_player_ids(client):
+    response = client.get("/room/POLL/state")
+    assert response.status_code == 200
+    for player in response.json()["players"]:
+        assert "id" not in player
+        assert set(player["cards"]) == {"hidden"}
+
+
+def test_etag_differs_between_games_of_a_room(client):
+    etag = client.get("/room/POLL/state").headers["ETag"]
+    assert (
+        client.get("/room/POLL/state", headers={"If-None-Match": etag}).status_code
+        == 304
+    )
+
+    # Another game in the same room, at the same version
+    game_manager.remove_game("POLL")
+    game_manager.create_game("POLL", PLAYERS, seed=2)
+    game_manager.start_game("POLL")
+    assert game_manager.get_game("POLL").version > 0
+    response = client.get("/room/POLL/state", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_exchange_cards_only_reach_the_exchanging_player():
+    manager = GameManager()
+    manager.create_game("SWAP", PLAYERS, seed=1)
+    manager.start_game("SWAP")
+    game = manager.get_game("SWAP")
+    actor = game.get_current_player().id
+    other = "b" if actor == "a" else "a"
+    manager.perform_action("SWAP", actor, {"action_type": "exchange"})
+    result = manager.pass_challenge("SWAP", other)
+    assert "cards" in result["action_result"]
+    assert "cards" not in manager.public_result(result)["action_result"]
+
+    drawn = game.last_action["cards"]
+    assert manager.get_player_view("SWAP", actor)["last_action"]["cards"] == drawn
+    encoded = json.loads(manager.get_encoded_player_view("SWAP", actor))
+    assert encoded["last_action"]["cards"] == drawn
+    for view in (
+        manager.get_player_view("SWAP", other),
+        json.loads(manager.get_encoded_player_view("SWAP", other)),
+        manager.get_spectator_view("SWAP"),
+        json.loads(manager.get_encoded_spectator_view("SWAP")),
+    ):
+        assert view["last_action"] == {
+            "type": "exchange",
+            "player": game.last_action["player"],
+        }
+
+    manager.complete_exchange("SWAP", actor, [0, 1])
+    assert "cards" not in manager.get_player_view("SWAP", actor)["last_action"]
+
+
+def test_a_failed_challenge_leaves_the_action_open_to_a_block():
+    players = PLAYERS + [{"id": "c", "name": "C"}]
+    manager = GameManager()
+    manager.create_game("STEAL", players, seed=1)
+    manager.start_game("STEAL")
+    game = manager.get_game("STEAL")
+    actor = game.get_current_player()
+    target, gone = [p for p in game.players if p is not actor]
+    actor.cards = ["captain", "duke"]
+    gone.revealed_cards += gone.cards
+    gone.cards = []
+    gone.is_alive = False
+
+    action = {"action_type": "steal", "target_id": target.id}
+    assert manager.perform_action("STEAL", actor.id, action)["success"]
+    for respond in (manager.challenge_action, manager.pass_challenge):
+        result = respond("STEAL", gone.id)
+        assert result == {
+            "success": False,
+            "message": "Eliminated players cannot respond",
+        }
+
+    # The captain was there, but the target may still block the steal
+    result = manager.challenge_action("STEAL", target.id)
+    assert result["message"].startswith("Challenge failed!")
+    assert result["action_result"]["state"] == "counteraction_window"
+    assert manager.get_coup_game("STEAL").counteraction_window_open
+    assert target.coins == 2
+
+    result = manager.pass_counter("STEAL", actor.id)
+    assert result == {"success": False, "message": "You cannot pass on your own action"}
+    assert manager.pass_counter("STEAL", target.id)["success"]
+    assert (actor.coins, target.coins) == (4, 0)
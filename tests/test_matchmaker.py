@@ -0,0 +1,85 @@
+import pytest
+
+from app.controllers.matchmaking import matchmaker as matchmaker_module
+from app.controllers.matchmaking.matchmaker import Matchmaker
+from app.controllers.room_codes.allocator import RoomCodeAllocator
+from app.models.matchmaking import MatchmakingRequest
+
+
+@pytest.fixture(autouse=True)
+def room_codes(monkeypatch):
+    """Codes of their own, so the shared allocator isn't touched"""
+    monkeypatch.setattr(matchmaker_module, "room_code_manager", RoomCodeAllocator())
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def join(matchmaker, clock, name, table_size, at):
+    clock.now = at
+    return matchmaker.join(MatchmakingRequest(player_name=name, table_size=table_size))
+
+
+def seated(tables):
+    return [sorted(ticket.player_name for ticket in table) for table in tables]
+
+
+def test_exact_tables_first():
+    clock = Clock()
+    matchmaker = Matchmaker(relax_interval=10, clock=clock)
+    for i in range(5):
+        join(matchmaker, clock, f"p{i}", 2, at=i)
+    tables = matchmaker.form_matches()
+    assert seated(tables) == [["p0", "p1"], ["p2", "p3"]]
+    assert matchmaker.get_queue_size() == 1
+
+
+def test_relaxed_tables_take_the_longest_waiting_across_buckets():
+    clock = Clock()
+    matchmaker = Matchmaker(relax_interval=10, clock=clock)
+    # Wanting 4 and 5 seats, interleaved in time
+    for i in range(6):
+        join(matchmaker, clock, f"p{i}", 4 if i % 2 else 5, at=i)
+
+    # Nobody waited long enough for a smaller table yet
+    clock.now = 9
+    assert matchmaker.form_matches() == []
+
+    # At 14, p0-p4 accept 4 seats (p5 is one second short), nobody accepts 3
+    clock.now = 14
+    tables = matchmaker.form_matches()
+    assert seated(tables) == [["p0", "p1", "p2", "p3"]]
+    assert matchmaker.get_queue_size() == 2
+
+    # Those wanting 5 seats take 3 after twice the interval
+    join(matchmaker, clock, "p6", 3, at=14)
+    clock.now = 23
+    assert matchmaker.form_matches() == []
+    clock.now = 24
+    tables += matchmaker.form_matches()
+    assert seated(tables[1:]) == [["p4", "p5", "p6"]]
+    assert matchmaker.get_queue_size() == 0
+
+
+def test_matched_rooms_are_spread_over_the_workers(monkeypatch):
+    from app.controllers.room_codes.routing import RoomRouter
+
+    allocator = RoomCodeAllocator(key="shared", worker_id=0, workers=3)
+    monkeypatch.setattr(matchmaker_module, "room_code_manager", allocator)
+    monkeypatch.setattr(
+        matchmaker_module,
+        "room_router",
+        RoomRouter(allocator, [f"http://w{i}" for i in range(3)]),
+    )
+    clock = Clock()
+    matchmaker = Matchmaker(clock=clock)
+    for i in range(8):
+        join(matchmaker, clock, f"p{i}", 2, at=i)
+    tables = matchmaker.form_matches()
+    owners = [allocator.worker_for_code(table[0].room_code) for table in tables]
+    assert owners == [0, 1, 2, 0]
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.controllers.game import manager as game_manager
+from app.controllers.migration import manager as migration_manager
+from app.controllers.player_tokens import manager as player_tokens
+from app.controllers.room_codes import manager as room_code_manager
+from app.main import app
+
+PLAYERS = [{"id": "a", "name": "Ann"}, {"id": "b", "name": "Bob"}]
+
+
+def receive_until(websocket, message_type):
+    while True:
+        message = websocket.receive_json()
+        if message["type"] == message_type:
+            return message
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """A client, with a game of Ann and Bob migrated into room MOVE"""
+    monkeypatch.setattr(room_code_manager, "cooldown", 0)
+    game_manager.create_game("MOVE", PLAYERS, seed=1)
+    game_manager.start_game("MOVE")
+    snapshot = migration_manager.snapshot_room("MOVE")
+    game_manager.remove_game("MOVE")
+    with TestClient(app) as client:
+        assert migration_manager.restore_room(snapshot)
+        yield client
+    migration_manager.resumable.pop("MOVE", None)
+    room_code_manager.release("MOVE")
+    game_manager.remove_game("MOVE")
+
+
+def test_resume_needs_the_player_token(client):
+    for query in ("player_id=a", "player_id=a&player_token=nope"):
+        with pytest.raises(WebSocketDisconnect) as closed:
+            with client.websocket_connect(
+                f"/ws/room/MOVE?player_name=Eve&{query}"
+            ) as websocket:
+                websocket.receive_json()
+        assert closed.value.code == 4004
+    assert migration_manager.is_resumable("MOVE")
+
+    token = player_tokens.issue("MOVE", "a")
+    with client.websocket_connect(
+        f"/ws/room/MOVE?player_name=Ann&player_id=a&player_token={token}"
+    ) as websocket:
+        joined = receive_until(websocket, "room_joined")
+        assert joined["player_id"] == "a"
+        assert joined["player_token"] == token
+        receive_until(websocket, "game_state")
+
+
+def test_mux_resume_needs_the_player_token(client):
+    with client.websocket_connect("/ws/mux") as websocket:
+        websocket.send_text(
+            json.dumps(
+                {
+                    "channel": "x",
+                    "type": "subscribe",
+                    "room_code": "MOVE",
+                    "player_name": "Eve",
+                    "player_id": "b",
+                }
+            )
+        )
+        closed = receive_until(websocket, "channel_closed")
+        assert closed["code"] == 4004
+
+        websocket.send_text(
+            json.dumps(
+                {
+                    "channel": "y",
+                    "type": "subscribe",
+                    "room_code": "MOVE",
+                    "player_name": "Bob",
+                    "player_id": "b",
+                    "player_token": player_tokens.issue("MOVE", "b"),
+                }
+            )
+        )
+        joined = receive_until(websocket, "room_joined")
+        assert joined["channel"] == "y"
+        assert joined["player_id"] == "b"
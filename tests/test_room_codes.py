@@ -0,0 +1,130 @@
+import pytest
+
+from app.controllers.room_codes.allocator import (
+    ROOM_CODE_ALPHABET,
+    ROOM_CODE_LENGTH,
+    RoomCodeAllocator,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_codes_are_unique_and_well_formed():
+    allocator = RoomCodeAllocator(key="test")
+    codes = [allocator.allocate() for _ in range(20_000)]
+    assert len(set(codes)) == len(codes)
+    assert all(
+        len(code) == ROOM_CODE_LENGTH and set(code) <= set(ROOM_CODE_ALPHABET)
+        for code in codes
+    )
+
+
+def test_released_code_cools_down_before_reuse():
+    clock = Clock()
+    allocator = RoomCodeAllocator(key="test", cooldown=10, clock=clock)
+    code = allocator.allocate()
+    allocator.release(code)
+    assert allocator.is_in_use(code)
+
+    clock.now = 5
+    assert allocator.allocate() != code
+    clock.now = 10
+    assert allocator.allocate() == code
+
+
+def test_code_is_free_once_every_hold_is_released():
+    allocator = RoomCodeAllocator(key="test", cooldown=0)
+    code = allocator.allocate()
+    allocator.acquire(code)
+    allocator.release(code)
+    assert code in allocator.holds
+    allocator.release(code)
+    assert code not in allocator.holds
+
+
+def test_claim_refuses_held_codes():
+    allocator = RoomCodeAllocator(key="test")
+    assert allocator.claim("ABCDE")
+    assert not allocator.claim("ABCDE")
+    # Fresh codes skip claimed ones
+    assert "ABCDE" not in {allocator.allocate() for _ in range(1_000)}
+
+
+def test_workers_hand_out_disjoint_codes():
+    workers = [
+        RoomCodeAllocator(key="shared", worker_id=i, workers=3) for i in range(3)
+    ]
+    codes = [{worker.allocate() for _ in range(2_000)} for worker in workers]
+    assert (
+        not codes[0] & codes[1] and not codes[1] & codes[2] and not codes[0] & codes[2]
+    )
+    for worker_id, worker_codes in enumerate(codes):
+        assert {workers[0].worker_for_code(code) for code in worker_codes} == {
+            worker_id
+        }
+
+
+def test_worker_for_invalid_code():
+    assert RoomCodeAllocator(key="test").worker_for_code("nope") is None
+
+
+def test_worker_id_must_be_in_range():
+    with pytest.raises(ValueError):
+        RoomCodeAllocator(worker_id=2, workers=2)
+
+
+def test_restarted_worker_goes_on_counting(tmp_path):
+    path = str(tmp_path / "worker-1.json")
+    before = RoomCodeAllocator(key="shared", worker_id=1, workers=2, state_path=path)
+    issued = {before.allocate() for _ in range(10)}
+
+    # The rooms went to the peer, the new process must not hand their codes out
+    after = RoomCodeAllocator(key="shared", worker_id=1, workers=2, state_path=path)
+    codes = {after.allocate() for _ in range(5_000)}
+    assert not issued & codes
+    assert {after.worker_for_code(code) for code in codes} == {1}
+
+
+def test_moved_rooms_are_sent_to_the_peer(tmp_path):
+    from app.controllers.room_codes.routing import RoomRouter
+
+    path = str(tmp_path / "worker-0.json")
+    before = RoomCodeAllocator(key="shared", worker_id=0, workers=2, state_path=path)
+    room_code = before.allocate()
+    before.record_moved([room_code], 1)
+
+    after = RoomCodeAllocator(key="shared", worker_id=0, workers=2, state_path=path)
+    assert after.moved_to(room_code) == 1
+    assert not after.claim(room_code)
+    router = RoomRouter(after, ["http://w0", "http://w1"])
+    assert router._owner(room_code) == 1
+
+    after.moved[room_code] = (1, 0.0)
+    assert after.moved_to(room_code) is None
+    assert router._owner(room_code) == 0
+
+
+def test_migrated_in_codes_are_left_to_their_owner():
+    owner = RoomCodeAllocator(key="shared", worker_id=0, workers=2)
+    peer = RoomCodeAllocator(key="shared", worker_id=1, workers=2, cooldown=0)
+    room_code = owner.allocate()
+    assert peer.claim(room_code)
+    peer.release(room_code)
+    assert room_code not in {peer.allocate() for _ in range(100)}
+
+
+def test_codes_handed_out_for_another_worker():
+    workers = [
+        RoomCodeAllocator(key="shared", worker_id=i, workers=2) for i in range(2)
+    ]
+    for_peer = {workers[0].allocate_for(1) for _ in range(2_000)}
+    assert {workers[0].worker_for_code(code) for code in for_peer} == {1}
+    # The peer's own codes never collide with those
+    assert not for_peer & {workers[1].allocate() for _ in range(2_000)}
+    assert not for_peer & {workers[0].allocate() for _ in range(2_000)}
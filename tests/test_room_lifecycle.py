@@ -0,0 +1,126 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.controllers.game import manager as game_manager
+from app.controllers.game.game_manager import GameManager
+from app.controllers.room_codes import manager as room_code_manager
+from app.controllers.rooms import controller as room_controller
+from app.main import app
+from app.models.game import GameStatus
+
+
+def receive_until(websocket, message_type):
+    while True:
+        message = websocket.receive_json()
+        if message["type"] == message_type:
+            return message
+
+
+def play_room(client, room_code, names):
+    """Open a room, seat two players, start a game and leave, return the room code"""
+    with client.websocket_connect(
+        f"/ws/room/{room_code}?player_name={names[0]}&create=true"
+    ) as first:
+        room_code = receive_until(first, "room_joined")["room_code"]
+        with client.websocket_connect(
+            f"/ws/room/{room_code}?player_name={names[1]}"
+        ) as second:
+            receive_until(second, "room_joined")
+            for websocket in (first, second):
+                websocket.send_text(json.dumps({"type": "ready", "ready": True}))
+            state = receive_until(second, "game_state")["state"]
+            assert {p["name"] for p in state["players"]} == set(names)
+            assert game_manager.get_game(room_code) is not None
+    return room_code
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(room_code_manager, "cooldown", 0)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_game_leaves_with_the_last_player(client):
+    room_code = play_room(client, "new", ["ann", "bob"])
+    assert game_manager.get_game(room_code) is None
+    assert not room_controller.is_local_room(room_code)
+
+
+def test_recycled_code_starts_a_fresh_game(client):
+    first = play_room(client, "new", ["ann", "bob"])
+    second = play_room(client, "new", ["cat", "dan"])
+    assert second == first
+
+
+def test_create_game_replaces_only_finished_games():
+    manager = GameManager()
+    players = [{"id": "a", "name": "A"}, {"id": "b", "name": "B"}]
+    game = manager.create_game("ROOM", players)
+    assert manager.create_game("ROOM", players) is game
+
+    # A game in progress stays, even when asked for with another roster
+    manager.start_game("ROOM")
+    others = [{"id": "c", "name": "C"}, {"id": "d", "name": "D"}, {"id": "e"}]
+    assert manager.create_game("ROOM", others) is game
+    assert len(game.players) == 2
+
+    game.status = GameStatus.FINISHED
+    rematch = manager.create_game("ROOM", players)
+    assert rematch is not game
+    assert manager.get_coup_game("ROOM").game_state is rematch
+
+
+def test_a_game_is_dealt_once():
+    manager = GameManager()
+    players = [{"id": "a", "name": "A"}, {"id": "b", "name": "B"}]
+    game = manager.create_game("ROOM", players)
+    manager.start_game("ROOM")
+    hands = [list(p.cards) for p in game.players]
+    deck, version = list(game.deck), game.version
+
+    manager.start_game("ROOM")
+    assert [p.cards for p in game.players] == hands
+    assert game.deck == deck
+    assert game.version == version
+    assert len(game.deck) + sum(len(p.cards) for p in game.players) == 15
+
+
+def test_nobody_joins_or_readies_a_game_in_progress(client):
+    with client.websocket_connect("/ws/room/new?player_name=ann&create=true") as ann:
+        room_code = receive_until(ann, "room_joined")["room_code"]
+        with client.websocket_connect(f"/ws/room/{room_code}?player_name=bob") as bob:
+            receive_until(bob, "room_joined")
+            for websocket in (ann, bob):
+                websocket.send_text(json.dumps({"type": "ready", "ready": True}))
+            receive_until(bob, "game_state")
+            game = game_manager.get_game(room_code)
+
+            with pytest.raises(WebSocketDisconnect) as closed:
+                with client.websocket_connect(
+                    f"/ws/room/{room_code}?player_name=cat"
+                ) as cat:
+                    cat.receive_json()
+            assert closed.value.code == 4003
+
+            ann.send_text(json.dumps({"type": "ready", "ready": True}))
+            assert receive_until(ann, "error")["message"] == "Game already in progress"
+            assert game_manager.get_game(room_code) is game
+            assert len(game.players) == 2
+
+
+def test_archive_failure_does_not_break_the_game_over(monkeypatch):
+    from app.controllers.records import manager as archive_manager
+
+    def broken_append(game_state, finished_at=None):
+        raise KeyError("character")
+
+    monkeypatch.setattr(archive_manager, "submit", broken_append)
+    game_manager.create_game("DONE", [{"id": "a", "name": "A"}])
+    try:
+        room_controller.mark_room_finished("DONE")
+    finally:
+        game_manager.remove_game("DONE")
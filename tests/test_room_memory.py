@@ -0,0 +1,23 @@
+from app.controllers.game import manager as game_manager
+from app.controllers.memory import manager as memory_manager
+from app.controllers.websockets import manager as ws_manager
+
+
+def test_game_without_connections_is_an_orphan():
+    players = [{"id": "a", "name": "A"}, {"id": "b", "name": "B"}]
+    game_manager.create_game("LOST", players)
+    try:
+        assert "LOST" not in ws_manager.active_rooms
+        assert "LOST" not in memory_manager.live_rooms()
+
+        report = memory_manager.report()
+        assert "LOST" not in [room["room_code"] for room in report["rooms"]]
+        orphans = {room["room_code"]: room for room in report["orphaned_rooms"]}
+        assert orphans["LOST"]["game"] > 0
+        assert report["orphaned_room_count"] >= 1
+        managers = {entry["name"]: entry for entry in report["managers"]}
+        assert "LOST" in managers["games.games"]["orphan_keys"]
+    finally:
+        game_manager.remove_game("LOST")
+
+    assert "LOST" not in memory_manager.orphaned_rooms()
@@ -0,0 +1,135 @@
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.controllers.room_codes import manager as room_code_manager
+from app.controllers.websockets import spectator_manager
+from app.main import app
+
+DELAY = 0.3
+
+
+def receive_until(websocket, message_type):
+    while True:
+        message = websocket.receive_json()
+        if message["type"] == message_type:
+            return message
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(room_code_manager, "cooldown", 0)
+    monkeypatch.setattr(spectator_manager, "delay", DELAY)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_http_readers_without_a_seat_are_delayed(client):
+    with client.websocket_connect("/ws/room/new?player_name=ann&create=true") as ann:
+        room_code = receive_until(ann, "room_joined")["room_code"]
+        with client.websocket_connect(f"/ws/room/{room_code}?player_name=bob") as bob:
+            receive_until(bob, "room_joined")
+            for websocket in (ann, bob):
+                websocket.send_text(json.dumps({"type": "ready", "ready": True}))
+            state = receive_until(bob, "game_state")["state"]
+
+            # The game just started, nothing of it may be shown yet
+            assert client.get(f"/room/{room_code}/state").status_code == 404
+
+            time.sleep(DELAY + 0.05)
+            response = client.get(f"/room/{room_code}/state")
+            assert response.status_code == 200
+            assert response.json()["version"] == state["version"]
+
+            # A long poll past the current version waits for the next one, then the delay
+            start = time.monotonic()
+            response = client.get(
+                f"/room/{room_code}/state",
+                params={"after_version": state["version"], "timeout": 0.2},
+            )
+            assert time.monotonic() - start >= 0.2
+            assert response.json()["version"] == state["version"]
+
+
+def test_spectator_chat_is_delayed(client):
+    with client.websocket_connect("/ws/room/new?player_name=ann&create=true") as ann:
+        room_code = receive_until(ann, "room_joined")["room_code"]
+        ann.send_text(json.dumps({"type": "chat", "message": "early"}))
+        receive_until(ann, "chat")
+        time.sleep(DELAY + 0.05)
+        ann.send_text(json.dumps({"type": "chat", "message": "late"}))
+        receive_until(ann, "chat")
+
+        with client.websocket_connect(f"/ws/room/{room_code}/spectate") as spectator:
+            receive_until(spectator, "spectator_joined")
+            history = receive_until(spectator, "chat_history")
+            assert [m["message"] for m in history["messages"]] == ["early"]
+            # Said before the spectator came, due after
+            assert receive_until(spectator, "chat")["message"] == "late"
+
+            ann.send_text(json.dumps({"type": "chat", "message": "live"}))
+            receive_until(ann, "chat")
+            sent_at = time.monotonic()
+            assert receive_until(spectator, "chat")["message"] == "live"
+            assert time.monotonic() - sent_at >= DELAY - 0.05
+
+
+def test_spectators_only_get_public_frames():
+    from app.controllers.websockets.connection_manager import ConnectionManager
+
+    frame = ConnectionManager._spectator_frame
+    assert frame({"type": "error", "message": "Player not found"}) is None
+    assert frame({"type": "room_joined", "player_token": "secret"}) is None
+    chat = {"type": "chat", "player": "ann", "message": "hi", "sent_at": 0}
+    assert frame(chat) is chat
+
+    result = {
+        "type": "game_action_result",
+        "action_type": "pass_challenge",
+        "player": "bob",
+        "result": {
+            "success": True,
+            "action_result": {"state": "exchange", "cards": ["duke", "captain"]},
+        },
+        "extra": "for players",
+    }
+    public = frame(result)
+    assert public["result"] == {"success": True, "action_result": {"state": "exchange"}}
+    assert "extra" not in public
+
+
+def test_only_watched_rooms_are_buffered(client):
+    with client.websocket_connect("/ws/room/new?player_name=ann&create=true") as ann:
+        room_code = receive_until(ann, "room_joined")["room_code"]
+        with client.websocket_connect(f"/ws/room/{room_code}?player_name=bob") as bob:
+            receive_until(bob, "room_joined")
+            for websocket in (ann, bob):
+                websocket.send_text(json.dumps({"type": "ready", "ready": True}))
+            receive_until(bob, "game_state")
+            ann.send_text(json.dumps({"type": "chat", "message": "unwatched"}))
+            receive_until(ann, "chat")
+
+            # Nobody watches, so nothing is held back
+            assert room_code not in spectator_manager.buffers
+            assert room_code not in spectator_manager.drain_tasks
+            assert room_code not in spectator_manager.delayed_states
+
+            with client.websocket_connect(
+                f"/ws/room/{room_code}/spectate"
+            ) as spectator:
+                receive_until(spectator, "spectator_joined")
+                # What was played and said before, from the moment they came
+                assert receive_until(spectator, "chat")["message"] == "unwatched"
+                receive_until(spectator, "game_state")
+                ann.send_text(json.dumps({"type": "chat", "message": "watched"}))
+                receive_until(ann, "chat")
+                assert room_code in spectator_manager.buffers
+
+            # The last spectator left, the buffer goes with them
+            ann.send_text(json.dumps({"type": "chat", "message": "again"}))
+            receive_until(ann, "chat")
+            assert room_code not in spectator_manager.buffers
+            assert room_code not in spectator_manager.drain_tasks
+            assert room_code not in spectator_manager.delayed_states
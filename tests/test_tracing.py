@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+from app.controllers.tracing import JsonFileExporter, OtlpJsonFileExporter, SpanExporter
+from app.controllers.tracing.tracer import Tracer
+
+
+def test_exporters_must_implement_export():
+    with pytest.raises(TypeError):
+        SpanExporter()
+
+
+@pytest.mark.parametrize("exporter_type", [JsonFileExporter, OtlpJsonFileExporter])
+def test_file_exporters_write_from_their_thread(tmp_path, exporter_type):
+    path = tmp_path / "traces.jsonl"
+    exporter = exporter_type(str(path), flush_interval=60)
+    tracer = Tracer(sample_rate=1.0, exporters=[exporter])
+    tracer.start()
+
+    with tracer.span("process_message", room_code="ABCD"):
+        with tracer.span("perform_action"):
+            pass
+    # Only queued, the writer hasn't woken up yet
+    assert len(exporter.pending) == 1
+
+    tracer.stop()
+    assert not exporter.pending
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    if exporter_type is JsonFileExporter:
+        assert [span["name"] for span in lines] == ["perform_action", "process_message"]
+    else:
+        spans = lines[0]["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert [span["name"] for span in spans] == ["perform_action", "process_message"]
@@ -0,0 +1,69 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.controllers.room_codes.allocator import RoomCodeAllocator
+from app.controllers.room_codes.routing import RoomRouter
+from app.controllers.rooms import controller as room_controller
+from app.main import app
+from app.routers import matchmaking as matchmaking_router
+
+URLS = ["{scheme}://{host}:9000", "{scheme}://{host}:9001"]
+
+
+def worker(worker_id: int) -> RoomCodeAllocator:
+    return RoomCodeAllocator(key="shared", worker_id=worker_id, workers=2)
+
+
+@pytest.fixture
+def as_worker(monkeypatch):
+    """Run the app as one of two workers"""
+
+    def run_as(worker_id: int) -> None:
+        router = RoomRouter(worker(worker_id), URLS)
+        monkeypatch.setattr(room_controller, "room_router", router)
+        monkeypatch.setattr(matchmaking_router, "room_router", router)
+
+    return run_as
+
+
+def test_room_requests_go_to_the_owning_worker(as_worker):
+    as_worker(0)
+    room_code = worker(1).allocate()
+    with TestClient(app) as client:
+        response = client.get(
+            f"/room/{room_code}/state?after_version=3", follow_redirects=False
+        )
+    assert response.status_code == 307
+    assert response.headers["location"] == (
+        f"http://testserver:9001/room/{room_code}/state?after_version=3"
+    )
+
+
+def test_own_rooms_are_served_here(as_worker):
+    as_worker(1)
+    room_code = worker(1).allocate()
+    with TestClient(app) as client:
+        response = client.get(f"/room/{room_code}/state", follow_redirects=False)
+    # Not redirected, there just is no such game
+    assert response.status_code == 404
+
+
+def test_matchmaking_is_pinned_to_one_worker(as_worker):
+    as_worker(1)
+    with TestClient(app) as client:
+        response = client.post(
+            "/matchmaking/queue", json={"player_name": "ann"}, follow_redirects=False
+        )
+        assert response.status_code == 307
+        assert (
+            response.headers["location"] == "http://testserver:9000/matchmaking/queue"
+        )
+
+        ticket = client.get("/matchmaking/queue/abc", follow_redirects=False)
+        assert ticket.status_code == 307
+
+    as_worker(0)
+    with TestClient(app) as client:
+        response = client.post("/matchmaking/queue", json={"player_name": "ann"})
+        assert response.status_code == 200
+        client.delete(f"/matchmaking/queue/{response.json()['id']}")